@@ -1,12 +1,14 @@
 import datetime
-from typing import List, Dict, Any
-from recipe_ai import generate_meal_suggestions, generate_chat_reply, generate_creative_recipes
+import os
+from typing import List, Dict, Any, NamedTuple, Optional
+import intent_router
+import metrics
+import recipe_ai
+from recipe_index import RecipeIndex
+from text_norm import fold
 
-CULINARY_KEYWORDS = [
-    'reteta','rețetă','rețete','ingrediente','fridge','frigider', 
-    'ce pot gati','ce pot găti','ce gătesc','mic dejun','cina','cină','prânz','pranz',
-    'gatit','meniu','micul dejun','cina','meniu','propuneri','sugestii','idee de cina','idee de pranz'
-]
+# 1 = după potrivirea locală, Gemini formulează răspunsul pe baza rețetelor găsite
+COOK_NOW_EMBELLISH = os.getenv("COOK_NOW_EMBELLISH", "0") == "1"
 
 # -------------------- TOOLS --------------------
 class FridgeTool:
@@ -19,8 +21,8 @@ class FridgeTool:
         return ', '.join([f"{i['name']} ({i['quantity']} {i['unit']})" for i in self.items])
 
     def how_many(self, name: str) -> str:
-        name_l = (name or '').lower()
-        found = next((x for x in self.items if name_l in x['name'].lower()), None)
+        name_l = fold(name)
+        found = next((x for x in self.items if name_l in fold(x['name'])), None)
         if found:
             return f"Ai {found['quantity']} {found['unit']} de {found['name']}."
         return f"Nu am găsit '{name}' în frigiderul tău."
@@ -30,8 +32,34 @@ class FridgeTool:
 
 
 class RecipesTool:
-    def __init__(self, recipes_db: List[Dict[str, Any]]):
+    def __init__(self, recipes_db: List[Dict[str, Any]], index: RecipeIndex = None):
         self.recipes = recipes_db or []
+        self.index = index
+
+    def _ensure_index(self) -> RecipeIndex:
+        if self.index is None:
+            self.index = RecipeIndex([dict(r, id=r.get('id', i)) for i, r in enumerate(self.recipes)])
+        return self.index
+
+    def relevant(self, fridge_names: List[str]) -> List[Dict[str, Any]]:
+        """Doar rețetele relevante pentru frigider, în limita bugetului de tokeni din prompt."""
+        return self._ensure_index().select_for_prompt(fridge_names)
+
+    def cook_now(self, fridge_names: List[str], limit: int = 5):
+        """Potrivire locală frigider ↔ rețete salvate: (text, potriviri)."""
+        if not self.recipes:
+            return "Nu ai rețete salvate încă, deci nu am ce potrivi cu frigiderul.", []
+        matches = self._ensure_index().match(fridge_names, k=limit)
+        if not matches:
+            return "Nu găsesc nicio rețetă salvată pe care s-o poți face acum cu ce ai în frigider.", []
+        lines = ["Din rețetele tale, poți găti acum:"]
+        for m in matches:
+            name = m['recipe'].get('name', 'Rețetă')
+            if m['missing']:
+                lines.append(f"• {name} — îți lipsește: {', '.join(m['missing'])}")
+            else:
+                lines.append(f"• {name} — ai tot ce trebuie ✅")
+        return '\n'.join(lines), matches
 
     def list_all_names(self, limit: int = 12) -> str:
         if not self.recipes:
@@ -42,71 +70,115 @@ class RecipesTool:
 
 
 # -------------------- AGENT --------------------
-class ChefAgent:
-    def __init__(self, recipes_db: List[Dict[str, Any]] = None):
-        self.recipes_tool = RecipesTool(recipes_db or [])
+class LLMCall(NamedTuple):
+    """Apel Gemini decis de rutare; executat sincron (get_reply) sau async (aget_reply)."""
+    fn: str
+    args: tuple
+    kwargs: Dict[str, Any]
+    on_error: str  # mesaj returnat dacă apelul eșuează; poate conține {e}
+
 
-    def get_reply(self, message: str, fridge_items: List[Dict[str, Any]], time_of_day: int = None) -> str:
-        msg = (message or '').lower().strip()
+class ChefAgent:
+    def __init__(self, recipes_db: List[Dict[str, Any]] = None, recipe_index: RecipeIndex = None):
+        self.recipes_tool = RecipesTool(recipes_db or [], recipe_index)
+
+    def get_reply(self, message: str, fridge_items: List[Dict[str, Any]], time_of_day: int = None,
+                  history: Dict[str, Any] = None) -> str:
+        action = self._route(message, fridge_items, time_of_day, history)
+        if isinstance(action, str):
+            return action
+        try:
+            return getattr(recipe_ai, action.fn)(*action.args, **action.kwargs)
+        except Exception as e:
+            return action.on_error.format(e=e)
+
+    async def aget_reply(self, message: str, fridge_items: List[Dict[str, Any]], time_of_day: int = None,
+                         history: Dict[str, Any] = None) -> str:
+        import recipe_ai_async
+        action = self._route(message, fridge_items, time_of_day, history)
+        if isinstance(action, str):
+            return action
+        try:
+            return await getattr(recipe_ai_async, action.fn)(*action.args, **action.kwargs)
+        except Exception as e:
+            return action.on_error.format(e=e)
+
+    def stream_reply(self, message: str, fridge_items: List[Dict[str, Any]], time_of_day: int = None,
+                     history: Dict[str, Any] = None):
+        """Ca get_reply, dar produce răspunsul bucată cu bucată (pentru /assistant/stream)."""
+        action = self._route(message, fridge_items, time_of_day, history)
+        if isinstance(action, str):
+            yield action
+            return
+        sent = False
+        try:
+            for chunk in recipe_ai.stream_generate(action.fn, *action.args, **action.kwargs):
+                sent = True
+                yield chunk
+        except Exception as e:
+            # după primul chunk nu mai putem înlocui răspunsul, doar semnalăm întreruperea
+            yield ("\n\n" if sent else "") + action.on_error.format(e=e)
+
+    def _route(self, message: str, fridge_items: List[Dict[str, Any]], time_of_day: Optional[int] = None,
+               history: Dict[str, Any] = None):
+        """
+        Întoarce fie răspunsul gata (str), fie apelul LLM de făcut (LLMCall).
+        `history` (contextul limitat din chat_store) ajunge doar la apelurile conversaționale.
+        """
+        with metrics.span("intent"):
+            route = intent_router.route(message)
+        intent = route.best
         time_of_day = time_of_day if time_of_day is not None else datetime.datetime.now().hour
-        meal_hint = self._infer_meal(time_of_day, msg)
+        meal_hint = self._infer_meal(time_of_day, route.groups)
 
         fridge = FridgeTool(fridge_items)
+
+        # Intent: ce pot găti acum din rețetele salvate (potrivire locală, sub o milisecundă)
+        if intent.intent == 'cook_now':
+            text, matches = self.recipes_tool.cook_now(fridge.names())
+            if COOK_NOW_EMBELLISH and matches:
+                fallback = text.replace('{', '{{').replace('}', '}}')
+                return LLMCall('generate_meal_suggestions', (fridge.names(), [m['recipe'] for m in matches], meal_hint), {},
+                               fallback)
+            return text
+
         # Intent: counts ("cate X am")
-        import re
-        how_many_match = re.search(r"cate ([a-zăîâșț]+) am", msg)
-        if how_many_match:
-            return fridge.how_many(how_many_match.group(1))
+        if intent.intent == 'how_many':
+            return fridge.how_many(intent.captures[0])
 
         # If user asks to cook with what's in fridge, prioritize generation
-        has_fridge_hint = ('cu ce am' in msg) or ('din frigider' in msg) or ('frigider' in msg)
-        cook_keywords = ['reteta','rețetă','gati','găti','gatesc','gătesc','pot face','fa-mi','fă-mi','pregateste','pregătește']
-        meal_keywords = ['mic dejun','breakfast','pranz','prânz','cina','cină','masa','pranzul','cina']
-        if has_fridge_hint and (any(k in msg for k in cook_keywords) or any(k in msg for k in meal_keywords)):
-            try:
-                return generate_meal_suggestions(fridge.names(), self.recipes_tool.recipes, meal_hint)
-            except Exception as e:
-                return f"A apărut o problemă la generarea rețetelor cu Gemini. Detalii: {e}"
-
-        # Creative/specific recipe queries (do NOT use inventory)
-        recipe_triggers = [
-            'cum fac', 'reteta ', 'rețeta ', 'retete', 'rețete', 'o reteta cu', 'o rețetă cu',
-            'idee de cina', 'idee de pranz', 'idee de cină', 'idee de prânz',
-            'vreau reteta', 'vreau o reteta', 'vreau doua retete', 'vreau două rețete', 'doua retete', 'două rețete', 'retete de', 'rețete de', 'reteta de', 'rețeta de'
-        ]
-        if any(k in msg for k in recipe_triggers):
-            try:
-                return generate_creative_recipes(message, k=2)
-            except Exception as e:
-                return f"Nu am putut genera răspunsul cu Gemini acum. Detalii: {e}"
+        if intent.intent == 'fridge_cook':
+            return LLMCall('generate_meal_suggestions', (fridge.names(), self.recipes_tool.relevant(fridge.names()), meal_hint), {},
+                           "A apărut o problemă la generarea rețetelor cu Gemini. Detalii: {e}")
 
         # Intent: explicit list of all recipes
-        if any(k in msg for k in ['toate rețetele', 'toate retetele', 'lista rețete', 'lista retete', 'arată rețetele', 'arata retetele']):
+        if intent.intent == 'list_recipes':
             return self.recipes_tool.list_all_names()
 
+        # Creative/specific recipe queries (do NOT use inventory)
+        if intent.intent == 'creative_recipe':
+            return LLMCall('generate_creative_recipes', (message,), {'k': 2, 'history': history},
+                           "Nu am putut genera răspunsul cu Gemini acum. Detalii: {e}")
+
         # Intent: list fridge
-        if any(k in msg for k in ['ce am in frigider', 'ce am în frigider', 'lista frigider', 'ce am in frigider?']):
+        if intent.intent == 'list_fridge':
             return "Iată ce ai: " + fridge.list_items()
 
         # Conversational agent for NON-culinary topics
-        if not any(k in msg for k in CULINARY_KEYWORDS):
-            try:
-                return generate_chat_reply(message)
-            except Exception:
-                return "Bună! Spune-mi orice dorești, discutăm!"
+        if intent.intent == 'chat':
+            return LLMCall('generate_chat_reply', (message,), {'history': history},
+                           "Bună! Spune-mi orice dorești, discutăm!")
 
         # Culinary/gastronomic requests
-        try:
-            return generate_meal_suggestions(fridge.names(), self.recipes_tool.recipes, meal_hint)
-        except Exception as e:
-            return f"Serverul AI este ocupat sau a apărut o eroare. Detalii: {e}"
+        return LLMCall('generate_meal_suggestions', (fridge.names(), self.recipes_tool.relevant(fridge.names()), meal_hint), {},
+                       "Serverul AI este ocupat sau a apărut o eroare. Detalii: {e}")
 
-    def _infer_meal(self, hour: int, msg: str) -> str:
-        if any(k in msg for k in ['mic dejun','breakfast','diminea']):
+    def _infer_meal(self, hour: int, groups=frozenset()) -> str:
+        if 'breakfast' in groups:
             return 'mic dejun'
-        if any(k in msg for k in ['pranz','prânz','lunch']):
+        if 'lunch' in groups:
             return 'prânz'
-        if any(k in msg for k in ['cina','cină','dinner','seara']):
+        if 'dinner' in groups:
             return 'cină'
         if 5 <= hour < 11:
             return 'mic dejun'
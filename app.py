@@ -1,22 +1,47 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from fridge_vision import detect_ingredients
-from recipe_ai import generate_recipes
-from voice_assistant import speak
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, send_file, abort, g
+from fridge_vision import decode_image, save_thumbnail, warmup as warmup_detector
+from recipe_ai import warmup_model_selection, llm_stats, summarize_conversation
+from voice_assistant import get_service as get_tts
+from pipeline import get_pipeline, StageFull
+from vision_cache import get_cache as get_detection_cache
 import os
 from datetime import datetime
-import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_bcrypt import Bcrypt
 import json
 from agent import ChefAgent
+import recipe_index
+import recipe_store
+import recipe_library
+import user_snapshots
+import chat_store
+import db
+import metrics
+import llm_cache
+import throttle
+import time
 
 app = Flask(__name__)
 
 UPLOAD_FOLDER = "static/uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Încarcă modelul YOLO în fundal la pornire, ca primul /upload să nu plătească încărcarea
+if os.getenv("YOLO_PRELOAD", "1") == "1":
+    threading.Thread(target=warmup_detector, daemon=True).start()
+# Selecția modelului Gemini (cache / probe paralel) tot în fundal, nu la import
+warmup_model_selection()
+
+# Miniaturile upload-urilor se scriu pe disc în fundal; KEEP_UPLOADS=0 nu mai scrie nimic
+KEEP_UPLOADS = os.getenv("KEEP_UPLOADS", "1") == "1"
+_thumbnail_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbs")
+# Cât așteaptă formularul HTML jobul de upload; clienții JSON nu așteaptă deloc
+UPLOAD_WAIT_S = float(os.getenv("UPLOAD_WAIT", "60"))
+
 app.config['SECRET_KEY'] = 'chef-gpt-secret'  # inlocuieste pentru productie
-DB = 'chef_gpt.db'
 bcrypt = Bcrypt(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -30,55 +55,70 @@ class User(UserMixin):
 
     @staticmethod
     def get(user_id):
-        conn = sqlite3.connect(DB)
-        cur = conn.cursor()
-        cur.execute('SELECT id, username, password FROM users WHERE id=?', (user_id,))
-        row = cur.fetchone()
-        conn.close()
+        row = db.fetchone('SELECT id, username, password FROM users WHERE id=?', (user_id,))
         return User(*row) if row else None
 
     @staticmethod
     def find_by_username(username):
-        conn = sqlite3.connect(DB)
-        cur = conn.cursor()
-        cur.execute('SELECT id, username, password FROM users WHERE username=?', (username,))
-        row = cur.fetchone()
-        conn.close()
+        row = db.fetchone('SELECT id, username, password FROM users WHERE username=?', (username,))
         return User(*row) if row else None
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.get(user_id)
 
+# --- METRICI: durate per etapă (Server-Timing) + /metrics în format Prometheus ---
+@app.before_request
+def _start_timing():
+    g.request_started = time.perf_counter()
+    metrics.start_request()
+
+@app.after_request
+def _timing_headers(response):
+    started = g.get('request_started')
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        metrics.REQUEST_SECONDS.observe(elapsed, request.url_rule.rule if request.url_rule else 'unmatched')
+        if metrics.TIMING_HEADERS:
+            # pentru răspunsurile SSE, doar ce s-a întâmplat înainte de primul byte
+            response.headers['Server-Timing'] = metrics.server_timing_header(elapsed)
+    return response
+
+@metrics.register_collector
+def _collect_stats():
+    # contoarele pe care modulele le țin deja, citite doar la scrape
+    samples = []
+    for name, stats in (('llm', llm_cache.get_cache().stats()), ('vision', get_detection_cache().stats()),
+                        ('snapshot', user_snapshots.get_cache().stats()),
+                        ('recipe_library', recipe_library.get_library().stats())):
+        hits = stats.get('hits', stats.get('hits_memory', 0) + stats.get('hits_sqlite', 0))
+        samples.append(('chef_cache_requests_total', 'counter', 'Căutări în cache-uri', {'cache': name, 'result': 'hit'}, hits))
+        samples.append(('chef_cache_requests_total', 'counter', 'Căutări în cache-uri', {'cache': name, 'result': 'miss'}, stats['misses']))
+    sf = throttle.singleflight.stats()
+    samples.append(('chef_llm_coalesced_total', 'counter', 'Apeluri LLM identice comasate (single-flight)', {}, sf['coalesced']))
+    lim = throttle.limiter.stats()
+    samples.append(('chef_llm_shed_total', 'counter', 'Cereri refuzate de limita locală RPM/TPM', {}, lim['shed']))
+    for key, st in llm_stats()['router'].items():
+        samples.append(('chef_llm_circuit_open', 'gauge', 'Circuit deschis (1) pentru model', {'model': key}, int(st.get('state') == 'open')))
+    for stage, st in get_pipeline().stats()['stages'].items():
+        samples.append(('chef_pipeline_in_flight', 'gauge', 'Joburi în lucru sau în așteptare per etapă', {'stage': stage}, st['in_flight']))
+        samples.append(('chef_pipeline_rejected_total', 'counter', 'Joburi refuzate (etapă plină)', {'stage': stage}, st['rejected']))
+    tts = get_tts().stats()
+    samples.append(('chef_tts_renders_total', 'counter', 'Fraze randate de TTS', {'result': 'ok'}, tts['rendered']))
+    samples.append(('chef_tts_renders_total', 'counter', 'Fraze randate de TTS', {'result': 'failed'}, tts['failed']))
+    samples.append(('chef_tts_cache_hits_total', 'counter', 'Fraze servite din fișierele deja randate', {}, tts['hits']))
+    pool = db.get_pool().stats()
+    samples.append(('chef_db_connections_opened_total', 'counter', 'Conexiuni SQLite deschise', {}, pool['opened']))
+    return samples
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # --- INIT DB ---
+# schema și indexurile sunt în migrările din db.py (CHEF_DB alege fișierul)
 def init_db():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL
-                )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS ingredients (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    name TEXT NOT NULL,
-                    quantity REAL,
-                    unit TEXT,
-                    FOREIGN KEY(user_id) REFERENCES users(id)
-                )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS recipes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    instructions TEXT,
-                    ingredients_json TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(user_id) REFERENCES users(id)
-                )''')
-    conn.commit()
-    conn.close()
+    db.migrate()
 init_db()
 
 # --- REGISTER (UI NOU) ---
@@ -94,11 +134,7 @@ def register():
             flash('User already exists!', 'error')
             return render_template('register.html')
         pw_hash = bcrypt.generate_password_hash(password).decode('utf-8')
-        conn = sqlite3.connect(DB)
-        cur = conn.cursor()
-        cur.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, pw_hash))
-        conn.commit()
-        conn.close()
+        db.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, pw_hash))
         flash('Account created! You can now log in.', 'success')
         return redirect(url_for('login'))
     return render_template('register.html', active_page='')
@@ -136,149 +172,277 @@ def home():
     return render_template('index.html', active_page='instant')
 
 @app.route('/upload', methods=['POST'])
+@login_required
 def upload():
-    file = request.files['image']
+    file = request.files.get('image')
     if not file:
         return "No file uploaded", 400
 
-    filename = f"fridge_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-    image_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(image_path)
+    # Decodăm o singură dată, direct din stream, la rezoluție redusă
+    try:
+        image = decode_image(file.stream.read())
+    except Exception:
+        return "Invalid image", 400
 
-    # 1️⃣ Detectează ingredientele
-    ingredients = detect_ingredients(image_path)
+    image_path = None
+    if KEEP_UPLOADS:
+        # uuid: două upload-uri în aceeași secundă nu-și mai suprascriu fișierul
+        filename = f"fridge_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.jpg"
+        image_path = os.path.join(UPLOAD_FOLDER, filename)
+        _thumbnail_pool.submit(save_thumbnail, image, image_path)
 
-    # 2️⃣ Generează rețetele (cu handling pentru timeouts/erori)
+    # Detecție, apoi rețete (LLM) și voce (TTS) în paralel, pe pool-urile pipeline-ului
     try:
-        recipes_text = generate_recipes(ingredients)
-    except Exception as e:
-        recipes_text = (
-            "Nu am putut genera rețete acum (serviciul AI a răspuns lent).\n\n"
-            f"Ingrediente detectate: {', '.join(ingredients) if ingredients else '—'}.\n"
-            "Te rog reîncearcă în câteva secunde."
-        )
-
-    # 3️⃣ Creează voce
-    try:
-        audio_path = speak(f"I found {', '.join(ingredients)}. Here are some recipe ideas!")
-    except Exception:
-        audio_path = None
+        job = get_pipeline().submit(image, int(current_user.id))
+    except StageFull:
+        return Response("Serverul e ocupat, reîncearcă în câteva secunde.", 503, headers={'Retry-After': '5'})
 
+    # Clienții JSON primesc imediat id-ul jobului și urmăresc /jobs/<id>
+    if request.accept_mimetypes.best == 'application/json' or request.args.get('async') == '1':
+        return jsonify({
+            'job_id': job.id,
+            'status_url': url_for('job_status', job_id=job.id),
+            'events_url': url_for('job_events', job_id=job.id),
+        }), 202, {'Location': url_for('job_status', job_id=job.id)}
+
+    # Formularul HTML așteaptă rezultatul (detecție + max(LLM, TTS))
+    job.wait(timeout=UPLOAD_WAIT_S)
+    result = _job_payload(job)
     return render_template('result.html',
                            image_path=image_path,
-                           ingredients=ingredients,
-                           recipes=recipes_text,
-                           audio_path=audio_path)
+                           ingredients=result['ingredients'] or [],
+                           recipes=result['recipes'] or "Procesarea durează mai mult decât de obicei. Reîncearcă în câteva secunde.",
+                           audio_path=result['audio_path'])
+
+# --- JOBURI UPLOAD: stare + rezultat (poll) și progres (SSE) ---
+def _job_payload(job):
+    data = job.to_dict()
+    key = data.pop('audio_key')
+    data['audio_path'] = url_for('tts_audio', key=key) if key else None
+    return data
+
+def _own_job(job_id):
+    # 404 și pentru joburile altui utilizator: id-ul nu confirmă nici măcar că jobul există
+    job = get_pipeline().get(job_id)
+    if job is None or job.user_id != int(current_user.id):
+        abort(404)
+    return job
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    return jsonify(_job_payload(_own_job(job_id)))
+
+@app.route('/jobs/<job_id>/events')
+@login_required
+def job_events(job_id):
+    job = _own_job(job_id)
+
+    def events():
+        version = -1
+        while True:
+            # wait întoarce și la timeout: trimitem starea curentă ca heartbeat
+            version = job.wait(since=version, timeout=15)
+            payload = _job_payload(job)
+            yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            if job.finished:
+                break
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/pipeline_stats')
+@login_required
+def pipeline_stats():
+    return jsonify(get_pipeline().stats())
+
+# --- AUDIO TTS (adresat după conținut: fișierul nu se mai schimbă niciodată) ---
+@app.route('/tts/<key>.wav')
+@login_required
+def tts_audio(key):
+    if len(key) != 32 or any(c not in '0123456789abcdef' for c in key):
+        abort(404)
+    path = get_tts().wait(key)  # dacă randarea nu s-a terminat încă, așteptăm (limitat de TTS_WAIT)
+    if path is None:
+        abort(404)
+    return send_file(os.path.abspath(path), mimetype='audio/wav', max_age=365 * 24 * 3600)
+
+# --- STATISTICI CACHE DETECȚII (pentru reglarea pragului Hamming) ---
+@app.route('/api/detection_cache')
+@login_required
+def detection_cache_stats():
+    return jsonify(get_detection_cache().stats())
+
+# --- STATISTICI LLM (cache, coalescing, coadă rate-limit, router) ---
+@app.route('/api/llm_stats')
+@login_required
+def llm_stats_view():
+    return jsonify(llm_stats())
 
 # --- CRUD INVENTAR ---
 @app.route('/fridge', methods=['GET','POST'])
 @login_required
 def fridge():
     user_id = int(current_user.id)
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
     if request.method == 'POST':
         action = request.form.get('action')
-        if action == 'add':
-            name = request.form['name']
-            quantity = request.form['quantity']
-            unit = request.form['unit']
-            cur.execute('INSERT INTO ingredients (user_id, name, quantity, unit) VALUES (?, ?, ?, ?)', (user_id, name, quantity, unit))
-        elif action == 'edit':
-            ing_id = request.form['id']
-            name = request.form['name']
-            quantity = request.form['quantity']
-            unit = request.form['unit']
-            cur.execute('UPDATE ingredients SET name=?, quantity=?, unit=? WHERE id=? AND user_id=?', (name, quantity, unit, ing_id, user_id))
-        elif action == 'delete':
-            ing_id = request.form['id']
-            cur.execute('DELETE FROM ingredients WHERE id=? AND user_id=?', (ing_id, user_id))
-        conn.commit()
-        conn.close()
+        with db.transaction() as conn:
+            if action == 'add':
+                name = request.form['name']
+                quantity = request.form['quantity']
+                unit = request.form['unit']
+                conn.execute('INSERT INTO ingredients (user_id, name, quantity, unit) VALUES (?, ?, ?, ?)', (user_id, name, quantity, unit))
+            elif action == 'edit':
+                ing_id = request.form['id']
+                name = request.form['name']
+                quantity = request.form['quantity']
+                unit = request.form['unit']
+                conn.execute('UPDATE ingredients SET name=?, quantity=?, unit=? WHERE id=? AND user_id=?', (name, quantity, unit, ing_id, user_id))
+            elif action == 'delete':
+                ing_id = request.form['id']
+                conn.execute('DELETE FROM ingredients WHERE id=? AND user_id=?', (ing_id, user_id))
+            user_snapshots.touch(conn, user_id, fridge=True)
         return redirect(url_for('fridge'))
-    cur.execute('SELECT id, name, quantity, unit FROM ingredients WHERE user_id=?', (user_id,))
-    items = [{'id': r[0],'name': r[1],'quantity': r[2],'unit': r[3]} for r in cur.fetchall()]
-    # SELECT RECIPES for this user
-    cur.execute('SELECT id, name, description, instructions, ingredients_json FROM recipes WHERE user_id=? ORDER BY created_at DESC', (user_id,))
-    recipes = [{'id': r[0], 'name': r[1], 'description': r[2], 'instructions': r[3], 'ingredients': json.loads(r[4]) if r[4] else ''} for r in cur.fetchall()]
-    conn.close()
-    return render_template('fridge.html', items=items, recipes=recipes, active_page='fridge')
+    snap = user_snapshots.get_cache().get(user_id)
+    return render_template('fridge.html', items=snap.fridge, recipes=snap.page_recipes, active_page='fridge')
 
 @app.route('/my_recipes', methods=['GET','POST'])
 @login_required
 def my_recipes():
     user_id = int(current_user.id)
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
 
     if request.method == 'POST':
         action = request.form.get('action')
-        if action == 'add':
-            name = request.form['name']
-            description = request.form.get('description','')
-            instructions = request.form.get('instructions','')
-            ingreds = request.form.get('ingredients','')
-            cur.execute('INSERT INTO recipes (user_id, name, description, instructions, ingredients_json) VALUES (?, ?, ?, ?, ?)', (user_id, name, description, instructions, json.dumps(ingreds)))
-        elif action == 'edit':
-            rec_id = request.form['id']
-            name = request.form['name']
-            description = request.form.get('description','')
-            instructions = request.form.get('instructions','')
-            ingreds = request.form.get('ingredients','')
-            cur.execute('UPDATE recipes SET name=?, description=?, instructions=?, ingredients_json=? WHERE id=? AND user_id=?', (name, description, instructions, json.dumps(ingreds), rec_id, user_id))
-        elif action == 'delete':
-            rec_id = request.form['id']
-            cur.execute('DELETE FROM recipes WHERE id=? AND user_id=?', (rec_id, user_id))
-        conn.commit()
-    cur.execute('SELECT id, name, description, instructions, ingredients_json FROM recipes WHERE user_id=? ORDER BY created_at DESC', (user_id,))
-    recipes = [{'id': r[0], 'name': r[1], 'description': r[2], 'instructions': r[3], 'ingredients': json.loads(r[4]) if r[4] else ''} for r in cur.fetchall()]
-    conn.close()
-    return render_template('my_recipes.html', recipes=recipes, active_page='recipes')
+        changed = removed_id = None
+        with db.transaction() as conn:
+            cur = conn.cursor()
+            if action == 'add':
+                name = request.form['name']
+                description = request.form.get('description','')
+                instructions = request.form.get('instructions','')
+                ingreds = request.form.get('ingredients','')
+                cur.execute('INSERT INTO recipes (user_id, name, description, instructions, ingredients_json) VALUES (?, ?, ?, ?, ?)', (user_id, name, description, instructions, json.dumps(ingreds)))
+                recipe_store.save_ingredients(conn, user_id, cur.lastrowid, ingreds)
+                changed = recipe_store.load_recipe(conn, user_id, cur.lastrowid)
+            elif action == 'edit':
+                rec_id = request.form['id']
+                name = request.form['name']
+                description = request.form.get('description','')
+                instructions = request.form.get('instructions','')
+                ingreds = request.form.get('ingredients','')
+                cur.execute('UPDATE recipes SET name=?, description=?, instructions=?, ingredients_json=? WHERE id=? AND user_id=?', (name, description, instructions, json.dumps(ingreds), rec_id, user_id))
+                if cur.rowcount:
+                    recipe_store.save_ingredients(conn, user_id, int(rec_id), ingreds)
+                    changed = recipe_store.load_recipe(conn, user_id, int(rec_id))
+            elif action == 'delete':
+                rec_id = request.form['id']
+                cur.execute('DELETE FROM recipes WHERE id=? AND user_id=?', (rec_id, user_id))
+                if cur.rowcount:
+                    recipe_store.delete_ingredients(conn, int(rec_id))
+                    removed_id = int(rec_id)
+            versions = user_snapshots.touch(conn, user_id, recipes=True) if changed or removed_id else None
+        if versions:
+            # indexul din memorie e actualizat pe loc (upsert/remove), nu reconstruit
+            user_snapshots.get_cache().recipe_changed(user_id, versions, recipe=changed, removed_id=removed_id)
+    snap = user_snapshots.get_cache().get(user_id)
+    return render_template('my_recipes.html', recipes=snap.page_recipes, active_page='recipes')
+
+def _load_assistant_context(user_id):
+    """Snapshot-ul utilizatorului și agentul construit din rețete (refolosit până la următoarea scriere pe rețete)."""
+    snap = user_snapshots.get_cache().get(user_id)
+    recipes = snap.recipe_set
+    agent = recipes.derived('agent', lambda: ChefAgent(recipes_db=recipes.recipes, recipe_index=recipes.index))
+    return snap, agent
+
+def _conversation_id(user_id, fresh=False):
+    """Id-ul conversației din sesiune (singurul lucru din istoric care stă în cookie)."""
+    conv_id = session.get('conversation_id')
+    if fresh:
+        conv_id = chat_store.fresh_conversation(user_id, conv_id)
+    else:
+        conv_id = chat_store.get_or_create(user_id, conv_id)
+    session['conversation_id'] = conv_id
+    return conv_id
 
 @app.route('/assistant', methods=['GET', 'POST'])
 @login_required
-def assistant_chat():
-    if request.method == 'GET':
-        session['chat_history'] = []
-    if 'chat_history' not in session:
-        session['chat_history'] = []
-    chat_history = session['chat_history']
+async def assistant_chat():
     user_id = int(current_user.id)
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute('SELECT name, quantity, unit FROM ingredients WHERE user_id=?', (user_id,))
-    fridge_items = [{'name': r[0], 'quantity': r[1], 'unit': r[2]} for r in cur.fetchall()]
-    # fetch recipes from DB
-    cur.execute('SELECT name, description, instructions, ingredients_json FROM recipes WHERE user_id=?', (user_id,))
-    db_recipes = []
-    for row in cur.fetchall():
-        try:
-            ingred = json.loads(row[3]) if row[3] else []
-            if isinstance(ingred, str):
-                # handle plain text ingredients lists
-                parts = [p.strip() for p in ingred.split(',') if p.strip()]
-                ingred = parts
-        except Exception:
-            ingred = []
-        db_recipes.append({
-            'name': row[0],
-            'description': row[1],
-            'instructions': row[2],
-            'ingredients': ingred
-        })
-    conn.close()
-    agent = ChefAgent(recipes_db=db_recipes)
+    # GET deschide o conversație nouă, ca înainte când se golea istoricul din sesiune
+    conv_id = _conversation_id(user_id, fresh=request.method == 'GET')
+    session.pop('chat_history', None)  # istoricul vechi din cookie
+    snap, agent = _load_assistant_context(user_id)
+    fridge_items = snap.fridge
     if request.method == 'POST':
         user_message = request.form['message']
-        chat_history.append({'role': 'user', 'text': user_message})
+        history = chat_store.context(conv_id)
+        chat_store.append(conv_id, 'user', user_message)
         import datetime
         try:
-            reply = agent.get_reply(user_message, fridge_items, time_of_day=datetime.datetime.now().hour)
+            reply = await agent.aget_reply(user_message, fridge_items, time_of_day=datetime.datetime.now().hour,
+                                           history=history)
         except Exception as e:
             reply = 'A apărut o problemă la generarea răspunsului. Încearcă din nou.'
-        chat_history.append({'role': 'assistant', 'text': reply})
-        session['chat_history'] = chat_history
+        chat_store.append(conv_id, 'assistant', reply)
+        chat_store.schedule_compaction(conv_id, summarize_conversation)
+    chat_history = chat_store.history(conv_id)
     return render_template('assistant.html', chat_history=chat_history, active_page='assistant', fridge_items=fridge_items)
 
+# --- CE POT GĂTI ACUM (potrivire locală, fără LLM) ---
+@app.route('/api/cook_now')
+@login_required
+def cook_now():
+    user_id = int(current_user.id)
+    snap = user_snapshots.get_cache().get(user_id)
+    names = snap.fridge_names
+    k = request.args.get('k', 10, type=int)
+    max_missing = request.args.get('max_missing', recipe_index.COOK_NOW_MAX_MISSING, type=int)
+    matches = snap.index.match(names, k=k, max_missing=max_missing)
+    return jsonify({
+        'fridge': names,
+        'matches': [{
+            'id': m['recipe']['id'],
+            'name': m['recipe']['name'],
+            'coverage': m['coverage'],
+            'have': m['have'],
+            'missing': m['missing'],
+        } for m in matches]
+    })
+
+# --- ASISTENT CU STREAMING (SSE): primele cuvinte ajung în câteva sute de ms ---
+@app.route('/assistant/stream', methods=['POST'])
+@login_required
+def assistant_stream():
+    user_message = request.form.get('message') or (request.get_json(silent=True) or {}).get('message', '')
+    if not user_message:
+        return "Message required", 400
+    user_id = int(current_user.id)
+    snap, agent = _load_assistant_context(user_id)
+    fridge_items = snap.fridge
+    conv_id = _conversation_id(user_id)
+    history = chat_store.context(conv_id)
+    chat_store.append(conv_id, 'user', user_message)
+    hour = datetime.now().hour
+
+    def events():
+        parts = []
+        try:
+            for chunk in agent.stream_reply(user_message, fridge_items, time_of_day=hour, history=history):
+                parts.append(chunk)
+                yield f"data: {json.dumps({'text': chunk}, ensure_ascii=False)}\n\n"
+        except Exception:
+            parts.append('A apărut o problemă la generarea răspunsului. Încearcă din nou.')
+            yield f"data: {json.dumps({'text': parts[-1]}, ensure_ascii=False)}\n\n"
+        finally:
+            # istoricul primește răspunsul complet abia după ce stream-ul s-a terminat
+            # (în SQLite, deci nu contează că cookie-ul de sesiune a plecat deja)
+            chat_store.append(conv_id, 'assistant', ''.join(parts))
+            chat_store.schedule_compaction(conv_id, summarize_conversation)
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == "__main__":
     app.run(debug=True)
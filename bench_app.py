@@ -0,0 +1,284 @@
+"""
+Benchmark end-to-end al rutelor Flask, complet offline: Gemini e fake_gemini,
+baza e un SQLite temporar populat la pornire, utilizatorii sunt thread-uri cu
+propriul test client (sesiune + login).
+
+    python bench_app.py --users 20 --requests 30 --latency lognormal:0.8,0.4
+    python bench_app.py --mix assistant=1 --rate-503 0.2           # doar asistentul, cu 503-uri
+    python bench_app.py --json now.json --baseline before.json     # iese cu 1 la regresii de p95
+
+Raportul are throughput și p50/p95/p99 per rută, etapele jobului de upload
+(detect / llm / tts, din /jobs/<id>) și latențele văzute de serverul Gemini fals.
+/upload are nevoie de modelul YOLO local (YOLO_MODEL); fără el, scoate-l din --mix.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import fake_gemini
+
+MESSAGES = [
+    "Salut! Ce faci?",
+    "Ce pot găti din frigider?",
+    "Vreau o rețetă de sarmale",
+    "Ce pot găti acum?",
+    "Câte ouă am?",
+    "idee de cină ușoară",
+    "Ce mănânc la micul dejun?",
+    "Arată rețetele",
+]
+FRIDGE_ITEMS = ["ouă", "lapte", "făină", "roșii", "ceapă", "usturoi", "cartofi", "brânză", "unt", "orez", "pui", "ardei"]
+PASSWORD = "bench-password"
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def parse_mix(spec: str) -> dict:
+    """„assistant=4,fridge=3” -> {'assistant': 4.0, 'fridge': 3.0}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Rute necunoscute în --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+# ------------------------------------------------------------
+# 🔹 Mediu izolat: fake Gemini + SQLite temporar, configurate înainte de import app
+# ------------------------------------------------------------
+def configure(args, gemini_url: str, workdir: str):
+    os.environ.update({
+        "GEMINI_BASE_URL": gemini_url,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "fake"),
+        "GEMINI_ENDPOINT": "v1",
+        "GEMINI_MODEL": os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+        "GEMINI_REFRESH_INTERVAL": "0",
+        "GEMINI_RPM": "1000000000",
+        "GEMINI_TPM": "1000000000000",
+        "LLM_CACHE": "1" if args.llm_cache else "0",
+        "CHEF_DB": os.path.join(workdir, "bench.db"),
+        "TTS_AUDIO_DIR": os.path.join(workdir, "audio"),
+        "KEEP_UPLOADS": "0",
+        "YOLO_PRELOAD": "0",
+    })
+
+
+def seed(users: int, rows: int, pw_hash: str):
+    import db
+    import recipe_store
+    import user_snapshots
+    rng = random.Random(0)
+    with db.transaction() as conn:
+        for u in range(1, users + 1):
+            conn.execute('INSERT INTO users (id, username, password) VALUES (?, ?, ?)', (u, f'bench{u}', pw_hash))
+            for name in rng.sample(FRIDGE_ITEMS, min(rows, len(FRIDGE_ITEMS))):
+                conn.execute('INSERT INTO ingredients (user_id, name, quantity, unit) VALUES (?, ?, ?, ?)',
+                             (u, name, rng.randint(1, 6), 'buc'))
+            for i in range(rows):
+                ingredients = ', '.join(rng.sample(FRIDGE_ITEMS, 4))
+                cur = conn.execute('INSERT INTO recipes (user_id, name, description, instructions, ingredients_json) '
+                                   'VALUES (?, ?, ?, ?, ?)',
+                                   (u, f'Rețetă {i}', 'descriere', 'pași', json.dumps(ingredients)))
+                recipe_store.save_ingredients(conn, u, cur.lastrowid, ingredients)
+            user_snapshots.touch(conn, u, fridge=True, recipes=True)
+
+
+def sample_image() -> bytes:
+    from PIL import Image
+    rng = random.Random(0)
+    img = Image.new("RGB", (640, 480))
+    img.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(640 * 480)])
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+# ------------------------------------------------------------
+# 🔹 Scenarii: fiecare face o cerere și raportează (rută, ms, ok) prin `record`
+# ------------------------------------------------------------
+def _timed(record, name, fn):
+    t0 = time.perf_counter()
+    resp = fn()
+    record(name, (time.perf_counter() - t0) * 1000, resp.status_code < 400)
+    return resp
+
+
+def run_assistant(client, rng, record, ctx):
+    _timed(record, "POST /assistant", lambda: client.post('/assistant', data={'message': rng.choice(MESSAGES)}))
+
+
+def run_fridge(client, rng, record, ctx):
+    if rng.random() < 0.3:
+        _timed(record, "POST /fridge", lambda: client.post('/fridge', data={
+            'action': 'add', 'name': rng.choice(FRIDGE_ITEMS), 'quantity': rng.randint(1, 5), 'unit': 'buc'}))
+    else:
+        _timed(record, "GET /fridge", lambda: client.get('/fridge'))
+
+
+def run_my_recipes(client, rng, record, ctx):
+    if rng.random() < 0.2:
+        _timed(record, "POST /my_recipes", lambda: client.post('/my_recipes', data={
+            'action': 'add', 'name': 'Rețetă nouă', 'ingredients': ', '.join(rng.sample(FRIDGE_ITEMS, 4))}))
+    else:
+        _timed(record, "GET /my_recipes", lambda: client.get('/my_recipes'))
+
+
+def run_upload(client, rng, record, ctx):
+    t0 = time.perf_counter()
+    resp = _timed(record, "POST /upload", lambda: client.post(
+        '/upload?async=1', data={'image': (io.BytesIO(ctx['image']), 'fridge.jpg')},
+        content_type='multipart/form-data'))
+    if resp.status_code != 202:
+        return
+    status_url = resp.get_json()['status_url']
+    while True:
+        job = client.get(status_url).get_json()
+        if job['state'] in ('done', 'failed'):
+            break
+        time.sleep(0.02)
+    record("upload end-to-end", (time.perf_counter() - t0) * 1000, job['state'] == 'done')
+    for stage, info in job['stages'].items():
+        if 'ms' in info:
+            record(f"  etapa {stage}", info['ms'], info['state'] == 'done')
+
+
+SCENARIOS = {
+    'assistant': run_assistant,
+    'fridge': run_fridge,
+    'my_recipes': run_my_recipes,
+    'upload': run_upload,
+}
+
+
+# ------------------------------------------------------------
+# 🔹 Utilizatori simulați
+# ------------------------------------------------------------
+def simulate(app, args, mix, ctx):
+    results = defaultdict(list)   # rută -> [(ms, ok)]
+    lock = threading.Lock()
+    names, weights = list(mix), list(mix.values())
+
+    def record(name, ms, ok):
+        with lock:
+            results[name].append((ms, ok))
+
+    def user(uid):
+        rng = random.Random(args.seed * 100003 + uid)
+        client = app.test_client()
+        resp = client.post('/login', data={'username': f'bench{uid}', 'password': PASSWORD})
+        if resp.status_code >= 400:
+            record("POST /login", 0, False)
+            return
+        for _ in range(args.requests):
+            SCENARIOS[rng.choices(names, weights)[0]](client, rng, record, ctx)
+            if args.think:
+                time.sleep(rng.expovariate(1 / args.think))
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(1, args.users + 1)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - t0
+
+
+def summarize(results, wall_s) -> dict:
+    summary = {}
+    for name, samples in results.items():
+        ms = [m for m, _ in samples]
+        summary[name] = {
+            'n': len(samples),
+            'errors': sum(1 for _, ok in samples if not ok),
+            'rps': round(len(samples) / wall_s, 2),
+            'p50': round(_percentile(ms, 50), 1),
+            'p95': round(_percentile(ms, 95), 1),
+            'p99': round(_percentile(ms, 99), 1),
+            'mean': round(statistics.mean(ms), 1),
+        }
+    return summary
+
+
+def report(summary, wall_s, gemini_stats):
+    print(f"\n{'rută / etapă':<24}{'n':>6}{'erori':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name in sorted(summary, key=lambda n: (n.startswith(' ') or n.startswith('upload'), n)):
+        s = summary[name]
+        print(f"{name:<24}{s['n']:>6}{s['errors']:>7}{s['rps']:>9.1f}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}")
+    print(f"\ntotal {sum(s['n'] for s in summary.values())} măsurători în {wall_s:.1f}s")
+    print("\nGemini (fake):")
+    for call, s in sorted(gemini_stats.items()):
+        print(f"  {call:<45} status {s['status']}  p50 {s['p50_ms']} ms  p95 {s['p95_ms']} ms  p99 {s['p99_ms']} ms")
+
+
+def compare(summary, baseline_path, tolerance) -> bool:
+    """True dacă nicio rută din baseline nu are p95 mai mare cu peste `tolerance` (fracție)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["routes"]
+    ok = True
+    for name, before in baseline.items():
+        now = summary.get(name)
+        if now is None:
+            continue
+        limit = before['p95'] * (1 + tolerance)
+        if now['p95'] > limit:
+            print(f"  ✗ {name}: p95 {now['p95']:.1f} ms > {before['p95']:.1f} ms (+{tolerance:.0%})")
+            ok = False
+    print(f"comparație cu {baseline_path}: {'ok' if ok else 'REGRESIE'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="utilizatori simulați (thread-uri)")
+    parser.add_argument("--requests", type=int, default=30, help="cereri per utilizator")
+    parser.add_argument("--mix", default="assistant=4,fridge=3,my_recipes=2,upload=1",
+                        help="ponderile scenariilor (assistant, fridge, my_recipes, upload)")
+    parser.add_argument("--think", type=float, default=0.0, help="pauza medie între cereri (s, exponențială)")
+    parser.add_argument("--rows", type=int, default=20, help="rețete per utilizator în baza populată")
+    parser.add_argument("--llm-cache", action="store_true", help="lasă cache-ul LLM pornit (implicit oprit)")
+    parser.add_argument("--json", help="scrie rezultatele în acest fișier")
+    parser.add_argument("--baseline", help="rezultatele unei rulări anterioare (--json), pentru comparație")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="creșterea de p95 acceptată față de baseline")
+    fake_gemini.add_arguments(parser)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    gemini = fake_gemini.start(fake_gemini.config_from_args(args))
+    workdir = tempfile.mkdtemp(prefix="bench_app_")
+    configure(args, gemini.url, workdir)
+
+    from app import app, bcrypt   # după configure: app citește mediul la import
+    t0 = time.perf_counter()
+    seed(args.users, args.rows, bcrypt.generate_password_hash(PASSWORD).decode('utf-8'))
+    print(f"seed: {args.users} utilizatori x {args.rows} rețete în {time.perf_counter() - t0:.1f}s ({workdir})")
+    ctx = {'image': sample_image() if 'upload' in mix else None}
+
+    results, wall_s = simulate(app, args, mix, ctx)
+    summary = summarize(results, wall_s)
+    gemini_stats = gemini.stats()
+    report(summary, wall_s, gemini_stats)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "wall_s": wall_s, "routes": summary, "gemini": gemini_stats},
+                      f, ensure_ascii=False, indent=2)
+    if args.baseline and not compare(summary, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
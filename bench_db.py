@@ -0,0 +1,120 @@
+"""
+Benchmark interogări de pagină: acces SQLite vechi (conexiune nouă per apel, fără
+indexuri) vs db.py (pool, WAL, pragma-uri, indexuri din migrări) vs snapshot-ul
+per utilizator din user_snapshots (doar verificarea versiunii în SQLite).
+
+    python bench_db.py --users 1000 --rows 500 --pages 2000
+
+O „pagină” e ce face /fridge pentru un utilizator autentificat: load_user,
+ingredientele și rețetele lui ordonate după created_at. Rândurile sunt inserate
+intercalat între utilizatori, ca într-o bază folosită de mai mulți oameni odată.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import db
+import recipe_store
+import user_snapshots
+
+USER_SQL = 'SELECT id, username, password FROM users WHERE id=?'
+FRIDGE_SQL = 'SELECT id, name, quantity, unit FROM ingredients WHERE user_id=?'
+RECIPES_SQL = ('SELECT id, name, description, instructions, ingredients_json FROM recipes '
+               'WHERE user_id=? ORDER BY created_at DESC')
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def seed(path, users, rows):
+    db.migrate(path, target=1)   # doar schema, fără indexuri: punctul de plecare
+    with db.transaction(path) as conn:
+        conn.executemany('INSERT INTO users (id, username, password) VALUES (?, ?, ?)',
+                         ((u, f'user{u}', 'x' * 60) for u in range(1, users + 1)))
+        conn.executemany('INSERT INTO ingredients (user_id, name, quantity, unit) VALUES (?, ?, ?, ?)',
+                         ((u, f'ingredient {i}', i % 7, 'buc')
+                          for i in range(rows) for u in range(1, users + 1)))
+        conn.executemany('INSERT INTO recipes (user_id, name, description, instructions, ingredients_json, created_at) '
+                         'VALUES (?, ?, ?, ?, ?, ?)',
+                         ((u, f'Rețetă {i}', 'descriere scurtă', 'pași', '"oua, lapte, faina"',
+                           f'2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}')
+                          for i in range(rows) for u in range(1, users + 1)))
+
+
+def page_legacy(path, user_id):
+    # exact tiparul vechi din app.py: o conexiune nouă pentru fiecare funcție
+    for sql in (USER_SQL, FRIDGE_SQL, RECIPES_SQL):
+        conn = sqlite3.connect(path)
+        cur = conn.cursor()
+        cur.execute(sql, (user_id,))
+        cur.fetchall()
+        conn.close()
+
+
+def page_pooled(path, user_id):
+    db.fetchone(USER_SQL, (user_id,), path=path)
+    with db.connection(path) as conn:
+        conn.execute(FRIDGE_SQL, (user_id,)).fetchall()
+        recipe_store.load_recipes(conn, user_id)
+
+
+def make_page_snapshot(path):
+    cache = user_snapshots.SnapshotCache(max_users=10 ** 6, path=path)
+
+    def page_snapshot(path, user_id):
+        db.fetchone(USER_SQL, (user_id,), path=path)
+        cache.get(user_id).page_recipes
+    return page_snapshot
+
+
+def run(fn, path, user_ids):
+    latencies = []
+    for uid in user_ids:
+        t = time.perf_counter()
+        fn(path, uid)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return latencies
+
+
+def report(name, latencies):
+    print(f"{name:<30} p50 {_percentile(latencies, 50):8.2f} ms   p95 {_percentile(latencies, 95):8.2f} ms   "
+          f"medie {statistics.mean(latencies):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=500, help="rânduri per utilizator în ingredients și în recipes")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--db", help="fișierul de test (implicit unul temporar)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "bench.db")
+    t0 = time.perf_counter()
+    seed(path, args.users, args.rows)
+    print(f"seed: {args.users} utilizatori x {args.rows} rânduri/tabelă în {time.perf_counter() - t0:.1f}s ({path})")
+
+    rng = random.Random(0)
+    user_ids = [rng.randint(1, args.users) for _ in range(args.pages)]
+    report("vechi (fără indexuri)", run(page_legacy, path, user_ids[:max(1, args.pages // 10)]))
+
+    t0 = time.perf_counter()
+    db.migrate(path)
+    print(f"migrări (indexuri, recipe_ingredients): {time.perf_counter() - t0:.1f}s")
+    report("vechi (cu indexuri)", run(page_legacy, path, user_ids))
+    report("db.py + recipe_ingredients", run(page_pooled, path, user_ids))
+    page_snapshot = make_page_snapshot(path)
+    run(page_snapshot, path, user_ids)   # încălzire: fiecare utilizator își încarcă snapshot-ul o dată
+    report("snapshot (cache cald)", run(page_snapshot, path, user_ids))
+    print(f"pool: {db.get_pool(path).stats()}")
+
+
+if __name__ == "__main__":
+    main()
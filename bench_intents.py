@@ -0,0 +1,130 @@
+"""
+Corpus de referință + micro-benchmark pentru intent_router.
+
+    python bench_intents.py                      # verifică corpusul, apoi măsoară
+    python bench_intents.py --extra 2000 --runs 200
+
+Fiecare mesaj din GOLDEN trebuie să ajungă la intentul așteptat; la orice diferență
+scriptul le listează și iese cu cod 1, înainte de benchmark. `--extra` adaugă
+cuvinte cheie sintetice, ca să vedem cum crește costul odată cu regulile: routerul
+compilat face o trecere peste cuvintele mesajului, varianta naivă câte o căutare
+per cuvânt cheie.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+import intent_router
+from text_norm import fold
+
+# (mesaj, intentul așteptat)
+GOLDEN = [
+    # ce pot găti acum din rețetele mele
+    ("Ce pot găti acum?", "cook_now"),
+    ("ce pot gati acum", "cook_now"),
+    ("CE POT FACE ACUM cu ce am?", "cook_now"),
+    ("Din rețetele mele, ce iese?", "cook_now"),
+    ("ce reţete pot găti", "cook_now"),
+    ("Ce pot face din ce am?", "cook_now"),
+    # câte X am
+    ("Câte ouă am?", "how_many"),
+    ("cate rosii am", "how_many"),
+    ("Câte cartofi am în frigider", "how_many"),
+    # gătit cu ce e în frigider
+    ("Ce pot găti din frigider?", "fridge_cook"),
+    ("fă-mi ceva cu ce am", "fridge_cook"),
+    ("Pregătește-mi o cină din frigider", "fridge_cook"),
+    ("ce gătesc la prânz cu ce am în frigider", "fridge_cook"),
+    ("Vreau o rețetă cu ce am", "fridge_cook"),
+    ("mic dejun din frigider", "fridge_cook"),
+    # listări
+    ("Arată rețetele", "list_recipes"),
+    ("toate retetele mele", "list_recipes"),
+    ("Lista rețete", "list_recipes"),
+    ("Ce am în frigider?", "list_fridge"),
+    ("ce am in frigider", "list_fridge"),
+    ("lista frigider", "list_fridge"),
+    # rețete creative (fără inventar)
+    ("Cum fac clătite?", "creative_recipe"),
+    ("Vreau o reţetă de sarmale", "creative_recipe"),
+    ("vreau două rețete de paste", "creative_recipe"),
+    ("Rețeta de cozonac a bunicii", "creative_recipe"),
+    ("idee de cină ușoară", "creative_recipe"),
+    ("Idee de prânz rapid", "creative_recipe"),
+    ("retete vegane", "creative_recipe"),
+    ("vreau reteta", "creative_recipe"),
+    # culinar general -> sugestii de masă
+    ("Ce mănânc la micul dejun?", "culinary"),
+    ("dă-mi niște sugestii", "culinary"),
+    ("un meniu pentru săptămâna asta", "culinary"),
+    ("ce pot gati?", "culinary"),
+    ("am ingrediente pentru ceva dulce?", "culinary"),
+    ("Ce gătesc diseară", "culinary"),
+    # conversație
+    ("Salut! Ce faci?", "chat"),
+    ("Cum e vremea mâine?", "chat"),
+    ("Mergem la piscina?", "chat"),
+    ("", "chat"),
+    ("mulțumesc frumos", "chat"),
+]
+
+
+def check(router):
+    failures = []
+    for msg, expected in GOLDEN:
+        got = router.route(msg).best.intent
+        if got != expected:
+            failures.append((msg, expected, got))
+    for msg, expected, got in failures:
+        print(f"  ✗ {msg!r}: așteptat {expected}, obținut {got}")
+    print(f"corpus: {len(GOLDEN) - len(failures)}/{len(GOLDEN)} corecte")
+    return not failures
+
+
+def naive_groups(keywords, text):
+    # vechiul stil: câte un `k in text` pentru fiecare cuvânt cheie din fiecare grup
+    return {g for g, phrases in keywords.items() if any(k in text for k in phrases)}
+
+
+def bench(fn, messages, runs):
+    timings = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        for m in messages:
+            fn(m)
+        timings.append((time.perf_counter() - t0) / len(messages) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--extra", type=int, default=1000, help="cuvinte cheie sintetice adăugate pentru scalare")
+    args = parser.parse_args()
+
+    if not check(intent_router.IntentRouter()):
+        sys.exit(1)
+
+    messages = [m for m, _ in GOLDEN]
+    keywords = intent_router.KEYWORDS
+    print(f"\n{sum(len(v) for v in keywords.values())} cuvinte cheie:")
+    print(f"  route() compilat        {bench(intent_router.route, messages, args.runs):7.1f} µs/mesaj")
+    print(f"  grupuri naiv (k in msg) {bench(lambda m: naive_groups(keywords, fold(m)), messages, args.runs):7.1f} µs/mesaj")
+
+    if args.extra:
+        rng = random.Random(0)
+        syllables = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ru", "sa", "te", "vi", "zo"]
+        extra = {" ".join("".join(rng.choice(syllables) for _ in range(3)) for _ in range(2)) for _ in range(args.extra)}
+        extended = dict(keywords, extra=sorted(extra))
+        router = intent_router.IntentRouter(extended)
+        if not check(router):
+            sys.exit(1)
+        print(f"\n+{args.extra} cuvinte cheie sintetice:")
+        print(f"  route() compilat        {bench(router.route, messages, args.runs):7.1f} µs/mesaj")
+        print(f"  grupuri naiv (k in msg) {bench(lambda m: naive_groups(extended, fold(m)), messages, args.runs):7.1f} µs/mesaj")
+
+
+if __name__ == "__main__":
+    main()
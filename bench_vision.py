@@ -0,0 +1,143 @@
+"""
+Benchmark backend-uri detector (latență, throughput, acord cu referința).
+
+    python bench_vision.py --images poze_test/ --backends torch,onnx,onnx-int8,openvino --runs 3 --batch 4
+
+Primul backend din listă e referința pentru acord (Jaccard pe setul de clase per imagine).
+Backend-urile exportate trebuie generate înainte: python fridge_vision.py export <backend>.
+
+    python bench_vision.py --check
+
+verifică doar post-procesarea backend-urilor exportate pe un tensor fix (fără model,
+fără imagini): clasele așteptate și, dacă ultralytics e instalat, acordul cu NMS-ul lui.
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from fridge_vision import anchor_classes, decode_image, make_detector
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def _jaccard(a, b):
+    a, b = set(a), set(b)
+    return 1.0 if not a and not b else len(a & b) / len(a | b)
+
+
+# ------------------------------------------------------------
+# 🔹 Paritate post-procesare: ieșire brută fixă (2 imagini, 3 clase, 4 ancore)
+# ------------------------------------------------------------
+def _fixed_output():
+    import numpy as np
+    out = np.zeros((2, 4 + 3, 4), dtype=np.float32)
+    out[:, 0, :] = [40, 120, 200, 280]   # cutii disjuncte (cx, cy, w, h): NMS nu suprimă nimic
+    out[:, 1, :] = 100
+    out[:, 2:4, :] = 50
+    # imaginea 0: ancora 0 -> clasa 0 (0.9), dar clasa 1 are tot acolo 0.5: nu e prezentă
+    out[0, 4:, 0] = [0.9, 0.5, 0.1]
+    out[0, 4:, 1] = [0.2, 0.1, 0.6]
+    out[0, 4:, 2] = [0.1, 0.2, 0.24]   # sub prag
+    # imaginea 1: doar clasa 1 câștigă o ancoră; clasa 2 e peste prag doar ca a doua opțiune
+    out[1, 4:, 1] = [0.3, 0.7, 0.4]
+    out[1, 4:, 3] = [0.05, 0.1, 0.0]
+    return out
+
+
+FIXED_EXPECTED = [[0, 2], [1]]
+
+
+def check_postprocess(conf=0.25):
+    out = _fixed_output()
+    got = anchor_classes(out, conf)
+    ok = got == FIXED_EXPECTED
+    print(f"anchor_classes: {got} (așteptat {FIXED_EXPECTED}) {'OK' if ok else 'DIFERIT'}")
+    try:
+        import torch
+        try:
+            from ultralytics.utils.nms import non_max_suppression
+        except ImportError:
+            from ultralytics.utils.ops import non_max_suppression
+    except ImportError:
+        print("ultralytics nu e instalat: sar peste comparația cu NMS-ul lui")
+        return ok
+    reference = [sorted({int(c) for c in det[:, 5].tolist()})
+                 for det in non_max_suppression(torch.from_numpy(out), conf_thres=conf)]
+    same = got == reference
+    print(f"ultralytics NMS: {reference} {'OK' if same else 'DIFERIT'}")
+    return ok and same
+
+
+def bench_backend(backend, images, runs, batch):
+    t0 = time.perf_counter()
+    detector = make_detector(backend)
+    detector.load()
+    load_s = time.perf_counter() - t0
+
+    latencies = []
+    predictions = None
+    for _ in range(runs):
+        current = []
+        for img in images:
+            t = time.perf_counter()
+            res = detector.predict(img)
+            latencies.append(time.perf_counter() - t)
+            current.append(sorted(set(detector.classes(res[0]))))
+        predictions = current
+
+    t = time.perf_counter()
+    for _ in range(runs):
+        detector.predict_many(images, max_batch=batch)
+    throughput = runs * len(images) / (time.perf_counter() - t)
+
+    return {
+        "backend": backend,
+        "load_s": load_s,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "throughput": throughput,
+        "predictions": predictions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="director cu imagini .jpg/.png")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--check", action="store_true", help="doar verificarea post-procesării pe tensorul fix")
+    args = parser.parse_args()
+
+    if not check_postprocess():
+        raise SystemExit(1)
+    if args.check:
+        return
+    if not args.images:
+        parser.error("--images e obligatoriu fără --check")
+
+    paths = sorted(p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(args.images, ext)))
+    if not paths:
+        raise SystemExit(f"Nu am găsit imagini în {args.images}")
+    images = [decode_image(p) for p in paths]
+
+    results = [bench_backend(b.strip(), images, args.runs, args.batch) for b in args.backends.split(",") if b.strip()]
+    reference = results[0]["predictions"]
+
+    print(f"\n{len(images)} imagini, {args.runs} rulări, batch {args.batch}\n")
+    print(f"{'backend':<15}{'load s':>8}{'p50 ms':>10}{'p95 ms':>10}{'img/s':>10}{'acord':>8}{'identic':>9}")
+    for r in results:
+        agreement = statistics.mean(_jaccard(a, b) for a, b in zip(reference, r["predictions"]))
+        exact = sum(a == b for a, b in zip(reference, r["predictions"])) / len(reference)
+        print(f"{r['backend']:<15}{r['load_s']:>8.2f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['throughput']:>10.1f}{agreement:>8.2f}{exact:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
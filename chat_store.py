@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+
+# ------------------------------------------------------------
+# 🔹 Configurare istoric conversații (override din .env)
+# ------------------------------------------------------------
+CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))     # replici recente trimise modelului
+COMPACT_TOKENS = int(os.getenv("CHAT_COMPACT_TOKENS", "3000"))     # peste atât nerezumat, rezumăm ce iese din fereastră
+DISPLAY_MESSAGES = int(os.getenv("CHAT_DISPLAY_MESSAGES", "50"))   # câte mesaje arată pagina /assistant
+SCAN_LIMIT = 200   # câte mesaje recente citim cel mult pentru fereastra de context
+EMPTY_TTL_S = 3600  # conversațiile fără mesaje mai vechi de atât se șterg (una proaspătă poate fi în alt tab)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+# ------------------------------------------------------------
+# 🔹 Conversații și mesaje (append-only) în SQLite
+#    Sesiunea Flask păstrează doar id-ul conversației, deci cookie-ul rămâne mic.
+# ------------------------------------------------------------
+def new_conversation(user_id) -> str:
+    conv_id = uuid.uuid4().hex
+    now = time.time()
+    db.execute('INSERT INTO conversations (id, user_id, summary, summary_upto, created_at, updated_at) '
+               'VALUES (?, ?, ?, 0, ?, ?)', (conv_id, user_id, '', now, now))
+    return conv_id
+
+
+def get_or_create(user_id, conv_id=None) -> str:
+    """Conversația din sesiune, dacă există și e a utilizatorului; altfel una nouă."""
+    if conv_id and db.fetchone('SELECT 1 FROM conversations WHERE id=? AND user_id=?', (conv_id, user_id)):
+        return conv_id
+    return new_conversation(user_id)
+
+
+def fresh_conversation(user_id, conv_id=None) -> str:
+    """
+    Conversație goală pentru un GET pe /assistant: refolosește conversația din sesiune
+    dacă n-are încă mesaje; altfel deschide una nouă și șterge conversațiile goale
+    vechi ale utilizatorului (reîncărcările paginii nu mai lasă rânduri în urmă).
+    """
+    with db.transaction() as conn:
+        if conv_id and conn.execute(
+                'SELECT 1 FROM conversations c WHERE c.id=? AND c.user_id=? AND NOT EXISTS '
+                '(SELECT 1 FROM chat_messages m WHERE m.conversation_id=c.id)', (conv_id, user_id)).fetchone():
+            return conv_id
+        now = time.time()
+        conn.execute('DELETE FROM conversations WHERE user_id=? AND updated_at<? AND NOT EXISTS '
+                     '(SELECT 1 FROM chat_messages m WHERE m.conversation_id=conversations.id)',
+                     (user_id, now - EMPTY_TTL_S))
+        conv_id = uuid.uuid4().hex
+        conn.execute('INSERT INTO conversations (id, user_id, summary, summary_upto, created_at, updated_at) '
+                     'VALUES (?, ?, ?, 0, ?, ?)', (conv_id, user_id, '', now, now))
+        return conv_id
+
+
+def append(conv_id, role: str, text: str):
+    with db.transaction() as conn:
+        now = time.time()
+        conn.execute('INSERT INTO chat_messages (conversation_id, role, text, tokens, created_at) VALUES (?, ?, ?, ?, ?)',
+                     (conv_id, role, text, estimate_tokens(text), now))
+        conn.execute('UPDATE conversations SET updated_at=? WHERE id=?', (now, conv_id))
+
+
+def history(conv_id, limit: int = DISPLAY_MESSAGES):
+    """Ultimele mesaje, în ordine cronologică, pentru afișare."""
+    rows = db.fetchall('SELECT role, text FROM chat_messages WHERE conversation_id=? ORDER BY id DESC LIMIT ?',
+                       (conv_id, limit))
+    return [{'role': r[0], 'text': r[1]} for r in reversed(rows)]
+
+
+def context(conv_id, budget: int = CONTEXT_TOKENS) -> dict:
+    """
+    Contextul trimis modelului: memoria rezumată + cele mai noi replici care
+    încap în `budget` tokeni. Dimensiunea promptului nu mai crește cu conversația.
+    """
+    with db.connection() as conn:
+        row = conn.execute('SELECT summary, summary_upto FROM conversations WHERE id=?', (conv_id,)).fetchone()
+        if row is None:
+            return {'summary': '', 'turns': []}
+        summary, upto = row
+        rows = conn.execute('SELECT role, text, tokens FROM chat_messages WHERE conversation_id=? AND id>? '
+                            'ORDER BY id DESC LIMIT ?', (conv_id, upto, SCAN_LIMIT)).fetchall()
+    turns, used = [], estimate_tokens(summary) if summary else 0
+    for role, text, tokens in rows:
+        if used + tokens > budget:
+            break
+        turns.append({'role': role, 'text': text})
+        used += tokens
+    turns.reverse()
+    return {'summary': summary, 'turns': turns}
+
+
+# ------------------------------------------------------------
+# 🔹 Compactare: replicile vechi, ieșite din fereastră, intră în rezumat
+# ------------------------------------------------------------
+_compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-compact")
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+
+def compact(conv_id, summarize, budget: int = CONTEXT_TOKENS, threshold: int = COMPACT_TOKENS) -> bool:
+    """
+    Dacă replicile nerezumate depășesc `threshold` tokeni, rezumă tot ce e în afara
+    ferestrei de `budget` tokeni cu `summarize(rezumat_vechi, replici) -> rezumat_nou`.
+    Actualizarea e condiționată de summary_upto, deci două procese nu se calcă pe picioare.
+    """
+    with db.connection() as conn:
+        summary, upto = conn.execute('SELECT summary, summary_upto FROM conversations WHERE id=?', (conv_id,)).fetchone()
+        rows = conn.execute('SELECT id, role, text, tokens FROM chat_messages WHERE conversation_id=? AND id>? '
+                            'ORDER BY id', (conv_id, upto)).fetchall()
+    if sum(r[3] for r in rows) <= threshold:
+        return False
+    kept = 0
+    cut = len(rows)
+    while cut > 0 and kept + rows[cut - 1][3] <= budget:
+        cut -= 1
+        kept += rows[cut][3]
+    old = rows[:cut]
+    if not old:
+        return False
+    new_summary = summarize(summary, [{'role': r[1], 'text': r[2]} for r in old])
+    cur = db.execute('UPDATE conversations SET summary=?, summary_upto=? WHERE id=? AND summary_upto=?',
+                     (new_summary, old[-1][0], conv_id, upto))
+    return cur.rowcount == 1
+
+
+def schedule_compaction(conv_id, summarize):
+    """Compactarea rulează în fundal; răspunsul către utilizator nu o așteaptă."""
+    with _compacting_lock:
+        if conv_id in _compacting:
+            return
+        _compacting.add(conv_id)
+
+    def run():
+        try:
+            compact(conv_id, summarize)
+        except Exception as e:
+            # fără rezumat nou, fereastra rămâne oricum limitată; reîncercăm la următorul mesaj
+            print(f"⚠️ Rezumatul conversației {conv_id} a eșuat: {e}")
+        finally:
+            with _compacting_lock:
+                _compacting.discard(conv_id)
+
+    _compactor.submit(run)
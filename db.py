@@ -0,0 +1,292 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# ------------------------------------------------------------
+# 🔹 Configurare SQLite (override din .env)
+# ------------------------------------------------------------
+DB_PATH = os.getenv("CHEF_DB", "chef_gpt.db")
+POOL_SIZE = int(os.getenv("CHEF_DB_POOL", "16"))                  # conexiuni inactive păstrate per fișier
+BUSY_TIMEOUT_S = float(os.getenv("CHEF_DB_TIMEOUT", "5"))
+SYNCHRONOUS = os.getenv("CHEF_DB_SYNCHRONOUS", "NORMAL")          # în WAL, NORMAL e sigur la crash-ul aplicației
+CACHE_SIZE_KB = int(os.getenv("CHEF_DB_CACHE_KB", "8192"))        # page cache per conexiune
+MMAP_SIZE = int(os.getenv("CHEF_DB_MMAP", str(64 * 1024 * 1024)))
+STATEMENT_CACHE = int(os.getenv("CHEF_DB_STATEMENTS", "128"))     # statement-uri compilate păstrate per conexiune
+
+
+def _open(path: str) -> sqlite3.Connection:
+    # check_same_thread=False: conexiunea trece între thread-uri prin pool, dar e folosită de unul singur odată
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE)
+    conn.execute('PRAGMA journal_mode=WAL')   # cititorii nu mai blochează scriitorul (și invers)
+    conn.execute(f'PRAGMA synchronous={SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+# ------------------------------------------------------------
+# 🔹 Pool de conexiuni per fișier
+# ------------------------------------------------------------
+class ConnectionPool:
+    """
+    Conexiunile deschise rămân în pool între cereri, cu pragma-urile setate și
+    cu statement-urile deja compilate (cache-ul `cached_statements` al sqlite3
+    e per conexiune). Serverul de dezvoltare Flask pornește câte un thread per
+    cerere, așa că o conexiune per thread nu s-ar refolosi niciodată; pool-ul da.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = []   # LIFO: cea mai recent folosită are cache-ul cald
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+            self.opened += 1
+        return _open(self.path)
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"opened": self.opened, "reused": self.reused, "idle": len(self._idle)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str = None) -> ConnectionPool:
+    path = path or DB_PATH
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, ConnectionPool(path))
+    return pool
+
+
+@contextmanager
+def connection(path: str = None):
+    """Împrumută o conexiune din pool; tranzacțiile necomise sunt anulate la returnare."""
+    pool = get_pool(path)
+    t0 = time.perf_counter()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+        metrics.record("db", time.perf_counter() - t0)
+
+
+@contextmanager
+def transaction(path: str = None):
+    """Conexiune într-o tranzacție: commit la ieșire, rollback la excepție."""
+    with connection(path) as conn:
+        with conn:
+            yield conn
+
+
+def fetchall(sql: str, params=(), path: str = None):
+    with connection(path) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def fetchone(sql: str, params=(), path: str = None):
+    with connection(path) as conn:
+        return conn.execute(sql, params).fetchone()
+
+
+def execute(sql: str, params=(), path: str = None) -> sqlite3.Cursor:
+    """O singură scriere, comisă imediat; cursorul păstrează lastrowid / rowcount."""
+    with transaction(path) as conn:
+        return conn.execute(sql, params)
+
+
+# ------------------------------------------------------------
+# 🔹 Migrări (versiunea schemei în PRAGMA user_version)
+# ------------------------------------------------------------
+def _m001_schema(conn):
+    # schema inițială din app.py; IF NOT EXISTS pentru bazele create înainte de migrări
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS ingredients (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    quantity REAL,
+                    unit TEXT,
+                    FOREIGN KEY(user_id) REFERENCES users(id)
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS recipes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    instructions TEXT,
+                    ingredients_json TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY(user_id) REFERENCES users(id)
+                )''')
+
+
+def _m002_user_indexes(conn):
+    # fiecare pagină filtrează după user_id; rețetele sunt listate după created_at DESC
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ingredients_user ON ingredients(user_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recipes_user_created ON recipes(user_id, created_at)')
+
+
+def _m003_recipe_ingredients(conn):
+    # ingredientele rețetelor ca rânduri; user_id e denormalizat ca să filtrăm fără JOIN
+    from recipe_store import backfill
+    conn.execute('''CREATE TABLE IF NOT EXISTS recipe_ingredients (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipe_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    canonical_name TEXT NOT NULL,
+                    qty REAL,
+                    unit TEXT,
+                    FOREIGN KEY(recipe_id) REFERENCES recipes(id) ON DELETE CASCADE
+                )''')
+    backfill(conn)   # înainte de indexuri: inserarea în masă e mai rapidă fără ele
+    # indexuri acoperitoare: textul ingredientelor se citește doar din index, fără acces la tabelă
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe '
+                 'ON recipe_ingredients(recipe_id, position, name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_user '
+                 'ON recipe_ingredients(user_id, recipe_id, position, name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_user_name '
+                 'ON recipe_ingredients(user_id, canonical_name)')
+
+
+def _m004_user_versions(conn):
+    # contor incrementat la fiecare scriere a datelor unui utilizator (vezi user_snapshots)
+    conn.execute('''CREATE TABLE IF NOT EXISTS user_versions (
+                    user_id INTEGER PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )''')
+
+
+def _m005_chat(conn):
+    # istoricul asistentului pe server (vezi chat_store); sesiunea păstrează doar id-ul conversației
+    conn.execute('''CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    summary_upto INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    FOREIGN KEY(user_id) REFERENCES users(id)
+                )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS chat_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    FOREIGN KEY(conversation_id) REFERENCES conversations(id)
+                )''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chat_messages_conv ON chat_messages(conversation_id, id)')
+
+
+def _m006_generated_recipes(conn):
+    # biblioteca de rețete generate structurat (vezi recipe_library), comună tuturor utilizatorilor
+    conn.execute('''CREATE TABLE IF NOT EXISTS generated_recipes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ingredient_key TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    recipe_json TEXT NOT NULL,
+                    model TEXT,
+                    created_at REAL NOT NULL,
+                    UNIQUE (ingredient_key, title)
+                )''')
+
+
+def _m007_generated_recipe_ingredients(conn):
+    # ingredientele canonice ale rețetelor din bibliotecă: căutare după ce e în frigider, nu după setul exact
+    from recipe_library import backfill
+    conn.execute('''CREATE TABLE IF NOT EXISTS generated_recipe_ingredients (
+                    recipe_id INTEGER NOT NULL REFERENCES generated_recipes(id) ON DELETE CASCADE,
+                    name TEXT NOT NULL,
+                    PRIMARY KEY (recipe_id, name)
+                ) WITHOUT ROWID''')
+    backfill(conn)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_generated_recipe_ingredients_name '
+                 'ON generated_recipe_ingredients(name, recipe_id)')
+
+
+def _m008_split_user_versions(conn):
+    # versiuni separate: o schimbare în frigider nu mai invalidează rețetele (index, agent)
+    conn.execute('ALTER TABLE user_versions RENAME COLUMN version TO fridge_version')
+    conn.execute('ALTER TABLE user_versions ADD COLUMN recipes_version INTEGER NOT NULL DEFAULT 0')
+    conn.execute('UPDATE user_versions SET recipes_version = fridge_version')
+
+
+def _m009_keep_unparsed_ingredients(conn):
+    # rândurile fără ingredient canonic erau omise, iar editarea rețetei le pierdea; le refacem din ingredients_json
+    from recipe_store import backfill
+    backfill(conn)
+    conn.execute('UPDATE user_versions SET recipes_version = recipes_version + 1')
+
+
+MIGRATIONS = [
+    (1, _m001_schema),
+    (2, _m002_user_indexes),
+    (3, _m003_recipe_ingredients),
+    (4, _m004_user_versions),
+    (5, _m005_chat),
+    (6, _m006_generated_recipes),
+    (7, _m007_generated_recipe_ingredients),
+    (8, _m008_split_user_versions),
+    (9, _m009_keep_unparsed_ingredients),
+]
+
+
+def migrate(path: str = None, target: int = None) -> int:
+    """Aplică migrările lipsă (până la `target`, implicit toate) și întoarce versiunea schemei."""
+    with connection(path) as conn:
+        # BEGIN IMMEDIATE: două procese care pornesc simultan nu aplică aceeași migrare de două ori
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for v, step in MIGRATIONS:
+                if v <= version or (target is not None and v > target):
+                    continue
+                step(conn)
+                conn.execute(f'PRAGMA user_version={v}')
+                version = v
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.execute('PRAGMA optimize')
+    return version
@@ -0,0 +1,312 @@
+"""
+Server local care imită API-ul generativelanguage (generateContent și
+streamGenerateContent), pentru benchmark-uri și teste de încărcare fără rețea.
+
+    python fake_gemini.py --port 8089 --latency lognormal:0.8,0.4 --rate-429 0.05
+    GEMINI_BASE_URL=http://127.0.0.1:8089 python app.py
+
+Latența vine dintr-o distribuție (`fixed:0.5`, `uniform:0.2,1.5`,
+`lognormal:MEDIANA,SIGMA`, `normal:MEDIE,DEV`); 429/503 se injectează cu o
+probabilitate globală sau per model (`--model-error gemini-2.5-pro=503:1`).
+Răspunsurile au aproximativ `--tokens` tokeni și includ usageMetadata; cu
+generationConfig.responseMimeType = application/json se întorc rețete JSON.
+Statistici: GET /_fake/stats.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+_PATH = re.compile(r'^/(?P<endpoint>v1(?:beta)?)/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$')
+_WORDS = ("ou", "ceapă", "roșii", "usturoi", "ulei", "sare", "piper", "se", "amestecă", "apoi", "adaugă",
+          "tigaie", "minute", "foc", "mediu", "servește", "cald", "cu", "și", "la", "până", "devine", "auriu")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+# ------------------------------------------------------------
+# 🔹 Distribuții de latență
+# ------------------------------------------------------------
+class Latency:
+    """`spec`: „0.5”, „fixed:0.5”, „uniform:A,B”, „lognormal:MEDIANA,SIGMA”, „normal:MEDIE,DEV” (secunde)."""
+
+    def __init__(self, spec: str = "fixed:0.5", seed: int = None):
+        kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "lognormal", "normal"):
+            raise ValueError(f"Distribuție necunoscută: {kind}")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        p = self.params
+        with self._lock:
+            if self.kind == "fixed":
+                return p[0]
+            if self.kind == "uniform":
+                return self._rng.uniform(p[0], p[1])
+            if self.kind == "lognormal":
+                return self._rng.lognormvariate(math.log(p[0]), p[1])
+            return max(0.0, self._rng.gauss(p[0], p[1]))
+
+
+class FakeConfig:
+    def __init__(self, latency: str = "fixed:0.5", tokens: int = 300, rate_429: float = 0.0, rate_503: float = 0.0,
+                 model_errors: dict = None, chunks: int = 8, seed: int = None):
+        self.latency = Latency(latency, seed)
+        self.tokens = tokens
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.model_errors = model_errors or {}   # model -> (status, probabilitate)
+        self.chunks = max(1, chunks)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def error_for(self, model: str):
+        with self._lock:
+            if model in self.model_errors:
+                status, rate = self.model_errors[model]
+                if self._rng.random() < rate:
+                    return status
+            roll = self._rng.random()
+        if roll < self.rate_429:
+            return 429
+        if roll < self.rate_429 + self.rate_503:
+            return 503
+        return None
+
+
+def fake_text(prompt: str, tokens: int) -> str:
+    """Text Markdown de ~`tokens` tokeni, determinist per prompt (cache-urile se comportă realist)."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    rng = random.Random(digest)
+    lines = [f"## Rețetă {digest.hex()[:6]}", ""]
+    size = sum(len(l) + 1 for l in lines)
+    step = 1
+    while size < tokens * 4:
+        line = f"{step}. " + " ".join(rng.choice(_WORDS) for _ in range(12)) + "."
+        lines.append(line)
+        size += len(line) + 1
+        step += 1
+    return "\n".join(lines)
+
+
+def _prompt_ingredients(prompt: str):
+    # ca modelul real: doar ingredientele cerute în prompt (+ sare), ca biblioteca să le poată regăsi
+    found = re.search(r"ingrediente: (.+?),?\s*\n", prompt)
+    names = [n.strip() for n in found.group(1).split(",") if n.strip()] if found else []
+    return names + ["sare"] if names else list(_WORDS[:7])
+
+
+def fake_recipes_json(prompt: str, count: int = 3) -> str:
+    """Rețete în forma din recipe_library.RESPONSE_SCHEMA, deterministe per prompt."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    rng = random.Random(digest)
+    names = _prompt_ingredients(prompt)
+    recipes = [{
+        "title": f"Rețetă {digest.hex()[:6]}-{i + 1}",
+        "description": " ".join(rng.choice(_WORDS) for _ in range(8)),
+        "time_minutes": rng.choice((15, 20, 30, 45)),
+        "difficulty": rng.choice(("ușor", "mediu", "dificil")),
+        "calories": rng.randrange(250, 700, 10),
+        "ingredients": [{"name": w, "quantity": rng.randint(1, 4), "unit": "buc"}
+                        for w in rng.sample(names, min(4, len(names)))],
+        "steps": [" ".join(rng.choice(_WORDS) for _ in range(10)) for _ in range(4)],
+        "serving": "cald",
+    } for i in range(count)]
+    return json.dumps({"recipes": recipes}, ensure_ascii=False)
+
+
+# ------------------------------------------------------------
+# 🔹 Server HTTP
+# ------------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, ca API-ul real
+    server: "_Server"
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/_fake/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        m = _PATH.match(urlsplit(self.path).path)
+        if m is None:
+            self._send_json(404, {"error": {"code": 404, "message": "not found"}})
+            return
+        model, method = m.group("model"), m.group("method")
+        config = self.server.config
+        t0 = time.perf_counter()
+        latency = config.latency.sample()
+
+        status = config.error_for(model)
+        if status is not None:
+            # erorile vin repede, ca la API-ul real (fără generare)
+            time.sleep(min(latency, 0.05))
+            self._send_json(status, {"error": {"code": status, "message": "injected by fake_gemini",
+                                               "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"}})
+            self.server.record(model, method, status, time.perf_counter() - t0)
+            return
+
+        try:
+            payload = json.loads(body or b"{}")
+            prompt = "".join(p.get("text", "") for c in payload.get("contents", []) for p in c.get("parts", []))
+        except (ValueError, AttributeError):
+            self._send_json(400, {"error": {"code": 400, "message": "invalid JSON payload"}})
+            self.server.record(model, method, 400, time.perf_counter() - t0)
+            return
+        structured = (payload.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+        text = fake_recipes_json(prompt) if structured else fake_text(prompt, config.tokens)
+        usage = {"promptTokenCount": estimate_tokens(prompt), "candidatesTokenCount": estimate_tokens(text)}
+        usage["totalTokenCount"] = usage["promptTokenCount"] + usage["candidatesTokenCount"]
+
+        if method == "generateContent":
+            time.sleep(latency)
+            self._send_json(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                                  "finishReason": "STOP"}],
+                                  "usageMetadata": usage, "modelVersion": model})
+        else:
+            self._stream(text, usage, latency, model)
+        self.server.record(model, method, 200, time.perf_counter() - t0)
+
+    def _stream(self, text: str, usage: dict, latency: float, model: str):
+        # SSE în bucăți egale; latența totală se împarte între bucăți (prima sosește după o fracțiune)
+        n = self.server.config.chunks
+        size = math.ceil(len(text) / n)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(n):
+            time.sleep(latency / n)
+            event = {"candidates": [{"content": {"parts": [{"text": text[i * size:(i + 1) * size]}], "role": "model"}}],
+                     "modelVersion": model}
+            if i == n - 1:
+                event["candidates"][0]["finishReason"] = "STOP"
+                event["usageMetadata"] = usage
+            data = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_json(self, status: int, obj: dict):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 1024  # backlog-ul implicit (5) respinge conexiunile simultane
+    daemon_threads = True
+
+    def __init__(self, address, config: FakeConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self._lock = threading.Lock()
+        self._calls = {}   # (model, metodă) -> {'status': {cod: n}, 'latencies': [s]}
+
+    def record(self, model: str, method: str, status: int, seconds: float):
+        with self._lock:
+            entry = self._calls.setdefault((model, method), {"status": {}, "latencies": []})
+            entry["status"][status] = entry["status"].get(status, 0) + 1
+            if status == 200:
+                entry["latencies"].append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for (model, method), entry in self._calls.items():
+                lat = sorted(entry["latencies"])
+                pick = (lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 1)) if lat else (lambda q: None)
+                out[f"{model}:{method}"] = {"status": dict(entry["status"]),
+                                            "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+            return out
+
+
+class FakeGemini:
+    """Serverul pornit în fundal: `url` merge direct în GEMINI_BASE_URL."""
+
+    def __init__(self, config: FakeConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self._server = _Server((host, port), self.config)
+        self.url = f"http://{host}:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-gemini", daemon=True)
+
+    def start(self) -> "FakeGemini":
+        self._thread.start()
+        return self
+
+    def stats(self) -> dict:
+        return self._server.stats()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def start(config: FakeConfig = None, host: str = "127.0.0.1", port: int = 0) -> FakeGemini:
+    return FakeGemini(config, host, port).start()
+
+
+def parse_model_errors(values) -> dict:
+    """[„model=STATUS:RATĂ”] -> {model: (status, rată)}"""
+    out = {}
+    for value in values or ():
+        model, _, rule = value.partition("=")
+        status, _, rate = rule.partition(":")
+        out[model] = (int(status), float(rate or 1))
+    return out
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Opțiunile serverului, refolosite de scripturile de benchmark."""
+    parser.add_argument("--latency", default="fixed:0.5",
+                        help="distribuția latenței: fixed:S | uniform:A,B | lognormal:MEDIANA,SIGMA | normal:MEDIE,DEV")
+    parser.add_argument("--tokens", type=int, default=300, help="dimensiunea aproximativă a răspunsului")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probabilitatea unui 429")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="probabilitatea unui 503")
+    parser.add_argument("--model-error", action="append", metavar="MODEL=STATUS:RATĂ",
+                        help="erori pentru un singur model (repetabil)")
+    parser.add_argument("--chunks", type=int, default=8, help="bucăți SSE pentru streamGenerateContent")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args) -> FakeConfig:
+    return FakeConfig(latency=args.latency, tokens=args.tokens, rate_429=args.rate_429, rate_503=args.rate_503,
+                      model_errors=parse_model_errors(args.model_error), chunks=args.chunks, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = _Server((args.host, args.port), config_from_args(args))
+    print(f"fake Gemini pe http://{args.host}:{args.port} (latență {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
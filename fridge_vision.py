@@ -1,21 +1,429 @@
-from ultralytics import YOLO
-from PIL import Image
+from PIL import Image, ImageOps
+from concurrent.futures import Future
+import glob
+import io
+import json
 import os
+import queue
+import threading
+import time
 
-def detect_ingredients(image_path):
-    # Încarcă modelul YOLO pre-antrenat (pe COCO)
-    model = YOLO("yolov8n.pt")
+from vision_cache import dhash, get_cache
+import metrics
 
-    # Rulează predicția
-    results = model(image_path, verbose=False)
+# ------------------------------------------------------------
+# 🔹 Configurare detector (override din .env)
+# ------------------------------------------------------------
+MODEL_PATH = os.getenv("YOLO_MODEL", "yolov8n.pt")
+# Backend de inferență: torch (ultralytics) | onnx | onnx-int8 | openvino | openvino-int8
+# (backend-urile exportate cer: pip install -r requirements-accel.txt)
+BACKEND = os.getenv("YOLO_BACKEND", "torch")
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+CONF_THRESHOLD = float(os.getenv("YOLO_CONF", "0.25"))
+CPU_THREADS = int(os.getenv("YOLO_THREADS", "0")) or (os.cpu_count() or 1)
+WARMUP_SIZE = 640
+MAX_BATCH = int(os.getenv("YOLO_MAX_BATCH", "8"))
+# Fereastră de micro-batching (ms): cât așteaptă un upload ca alte upload-uri
+# concurente să i se alăture în același forward pass. 0 = dezactivat.
+BATCH_WINDOW_MS = float(os.getenv("YOLO_BATCH_WINDOW_MS", "0"))
+# Latura maximă la care decodăm imaginile (YOLO redimensionează oricum la 640 px)
+DECODE_SIZE = int(os.getenv("YOLO_DECODE_SIZE", "640"))
+# Cache după hash perceptual în fața detecției (vezi vision_cache.py)
+DETECTION_CACHE = os.getenv("DETECTION_CACHE", "1") == "1"
 
-    # Extrage denumirile obiectelor detectate
-    detected_classes = []
-    for box in results[0].boxes.cls:
-        cls_id = int(box)
-        detected_classes.append(model.names[cls_id])
+
+# ------------------------------------------------------------
+# 🔹 Detector rezident: modelul se încarcă o singură dată per proces
+# ------------------------------------------------------------
+class Detector:
+    """
+    Ține modelul YOLO încărcat în memorie pe toată durata procesului.
+    Încărcarea e leneșă (la primul apel) sau explicită prin `load()` la startup,
+    urmată de o inferență de încălzire. Predicțiile sunt serializate cu un lock,
+    pentru că predictorul ultralytics nu e sigur la apeluri din mai multe thread-uri Flask.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, threads: int = CPU_THREADS):
+        self.model_path = model_path
+        self.threads = threads
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._infer_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                import torch
+                from ultralytics import YOLO
+                torch.set_num_threads(self.threads)
+                model = YOLO(self.model_path)
+                # Încălzire: prima inferență construiește graful și alocă bufferele
+                model(Image.new("RGB", (WARMUP_SIZE, WARMUP_SIZE)), verbose=False)
+                print(f"[INFO] Model YOLO încărcat: {self.model_path} ({self.threads} thread-uri CPU)")
+                self._model = model
+        return self._model
+
+    @property
+    def names(self):
+        return self.load().names
+
+    def predict(self, source):
+        model = self.load()
+        with self._infer_lock:
+            return model(source, verbose=False)
+
+    def predict_many(self, sources, max_batch: int = MAX_BATCH):
+        """Rulează imaginile ca tensori batch de cel mult `max_batch` imagini."""
+        if max_batch < 1:
+            raise ValueError(f"max_batch trebuie să fie cel puțin 1, nu {max_batch}")
+        results = []
+        for i in range(0, len(sources), max_batch):
+            results.extend(self.predict(list(sources[i:i + max_batch])))
+        return results
+
+    def classes(self, result):
+        names = self.names
+        return [names[int(c)] for c in result.boxes.cls]
+
+
+# ------------------------------------------------------------
+# 🔹 Backend-uri CPU exportate (ONNX Runtime / OpenVINO), fără torch
+# ------------------------------------------------------------
+def artifact_path(backend: str, model_path: str = MODEL_PATH) -> str:
+    stem = os.path.splitext(model_path)[0]
+    return {
+        "onnx": f"{stem}.onnx",
+        "onnx-int8": f"{stem}.int8.onnx",
+        "openvino": f"{stem}_openvino_model",
+        "openvino-int8": f"{stem}_int8_openvino_model",
+    }[backend]
+
+
+def anchor_classes(out, conf: float = CONF_THRESHOLD):
+    """
+    Clasele prezente în ieșirea brută YOLO (N, 4 + nr_clase, ancore), ca în NMS-ul
+    ultralytics: fiecare ancoră votează doar pentru clasa ei cea mai probabilă și
+    doar dacă scorul acesteia e peste prag.
+    """
+    import numpy as np
+    cls_scores = out[:, 4:, :]
+    best = cls_scores.argmax(axis=1)     # (N, ancore)
+    best_conf = cls_scores.max(axis=1)
+    return [sorted(int(c) for c in np.unique(b[s > conf])) for b, s in zip(best, best_conf)]
+
+
+def _names_path(artifact: str) -> str:
+    if os.path.isdir(artifact):
+        return os.path.join(artifact, "names.json")
+    return artifact + ".names.json"
+
+
+def export_model(backend: str, model_path: str = MODEL_PATH) -> str:
+    """
+    Exportă o singură dată `yolov8n.pt` în formatul backend-ului (cu batch dinamic).
+    int8: OpenVINO folosește calibrarea NNCF din ultralytics; pentru ONNX aplicăm
+    cuantizare dinamică a greutăților cu onnxruntime. Lângă artefact scriem
+    numele claselor, ca runtime-ul să nu aibă nevoie de ultralytics.
+    """
+    from ultralytics import YOLO
+    model = YOLO(model_path)
+    target = artifact_path(backend, model_path)
+    if backend.startswith("onnx"):
+        exported = model.export(format="onnx", dynamic=True, imgsz=WARMUP_SIZE)
+        if backend == "onnx-int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+    elif backend.startswith("openvino"):
+        exported = model.export(format="openvino", dynamic=True, imgsz=WARMUP_SIZE, int8=backend.endswith("int8"))
+        if os.path.abspath(exported) != os.path.abspath(target):
+            os.replace(exported, target)
+    else:
+        raise ValueError(f"Backend fără export: {backend}")
+    with open(_names_path(target), "w", encoding="utf-8") as f:
+        json.dump({int(k): v for k, v in model.names.items()}, f)
+    print(f"✅ Model exportat pentru '{backend}': {target}")
+    return target
+
+
+def _letterbox(image: Image.Image, size: int = WARMUP_SIZE) -> Image.Image:
+    # Aceeași preprocesare ca ultralytics: resize cu aspect păstrat + padding gri 114
+    scale = min(size / image.width, size / image.height)
+    w, h = round(image.width * scale), round(image.height * scale)
+    canvas = Image.new("RGB", (size, size), (114, 114, 114))
+    canvas.paste(image.convert("RGB").resize((w, h), Image.BILINEAR), ((size - w) // 2, (size - h) // 2))
+    return canvas
+
+
+class RuntimeDetector(Detector):
+    """
+    Detector peste un model exportat, rulat cu ONNX Runtime sau OpenVINO pe CPU.
+    Nu importă torch / ultralytics. Pentru că ne interesează doar setul de clase
+    (nu cutiile), NMS nu e necesar: o clasă e prezentă dacă e clasa cea mai
+    probabilă a cel puțin unei ancore cu scor peste prag, exact ce rămâne și
+    după NMS-ul ultralytics (vezi anchor_classes).
+    """
+
+    def __init__(self, backend: str, artifact: str = None, threads: int = CPU_THREADS,
+                 conf: float = CONF_THRESHOLD, imgsz: int = WARMUP_SIZE):
+        super().__init__(artifact or artifact_path(backend), threads)
+        self.backend = backend
+        self.conf = conf
+        self.imgsz = imgsz
+        self._names = None
+
+    def load(self):
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                with open(_names_path(self.model_path), encoding="utf-8") as f:
+                    self._names = {int(k): v for k, v in json.load(f).items()}
+                if self.backend.startswith("onnx"):
+                    import onnxruntime as ort
+                    opts = ort.SessionOptions()
+                    opts.intra_op_num_threads = self.threads
+                    sess = ort.InferenceSession(self.model_path, opts, providers=["CPUExecutionProvider"])
+                    input_name = sess.get_inputs()[0].name
+                    run = lambda batch: sess.run(None, {input_name: batch})[0]
+                else:
+                    import openvino as ov
+                    xml = glob.glob(os.path.join(self.model_path, "*.xml"))[0]
+                    compiled = ov.Core().compile_model(xml, "CPU", {"INFERENCE_NUM_THREADS": self.threads})
+                    run = lambda batch: compiled(batch)[0]
+                run(self._preprocess([Image.new("RGB", (self.imgsz, self.imgsz))]))
+                print(f"[INFO] Model YOLO încărcat: {self.model_path} ({self.backend}, {self.threads} thread-uri CPU)")
+                self._model = run
+        return self._model
+
+    @property
+    def names(self):
+        self.load()
+        return self._names
+
+    def _preprocess(self, images):
+        import numpy as np
+        arrays = []
+        for img in images:
+            if isinstance(img, str):
+                img = Image.open(img)
+            elif not isinstance(img, Image.Image):
+                img = Image.fromarray(img)
+            arrays.append(np.asarray(_letterbox(img, self.imgsz), dtype=np.float32))
+        batch = np.stack(arrays).transpose(0, 3, 1, 2) / 255.0
+        return np.ascontiguousarray(batch, dtype=np.float32)
+
+    def predict(self, source):
+        run = self.load()
+        sources = source if isinstance(source, list) else [source]
+        batch = self._preprocess(sources)
+        with self._infer_lock:
+            out = run(batch)  # (N, 4 + nr_clase, ancore)
+        return anchor_classes(out, self.conf)
+
+    def classes(self, result):
+        names = self.names
+        return [names[c] for c in result]
+
+
+def make_detector(backend: str = BACKEND) -> Detector:
+    if backend not in BACKENDS:
+        raise ValueError(f"YOLO_BACKEND necunoscut: {backend} (opțiuni: {', '.join(BACKENDS)})")
+    if backend == "torch":
+        return Detector()
+    if not os.path.exists(_names_path(artifact_path(backend))):
+        print(f"⚠️ Lipsește modelul exportat pentru '{backend}'. Rulează: python fridge_vision.py export {backend}. "
+              "Folosesc backend-ul torch.")
+        return Detector()
+    return RuntimeDetector(backend)
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector() -> Detector:
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = make_detector()
+    return _detector
+
+
+# ------------------------------------------------------------
+# 🔹 Micro-batching: upload-uri concurente împart un singur forward pass
+# ------------------------------------------------------------
+class MicroBatcher:
+    """
+    Adună cererile venite în fereastra `window_ms` (până la `max_batch`) și le
+    trimite împreună către detector. Fiecare apelant primește un Future cu
+    lista de clase detectate în imaginea lui.
+    """
+
+    def __init__(self, detector: Detector, max_batch: int = MAX_BATCH, window_ms: float = BATCH_WINDOW_MS):
+        self.detector = detector
+        self.max_batch = max(1, max_batch)
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, source) -> Future:
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((source, fut))
+        return fut
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.detector.predict([src for src, _ in batch])
+                for (_, fut), res in zip(batch, results):
+                    fut.set_result(self.detector.classes(res))
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        detector = get_detector()
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(detector)
+    return _batcher
+
+
+def warmup():
+    """Încarcă și încălzește modelul (apelat opțional la pornirea aplicației)."""
+    get_detector().load()
+
+
+# ------------------------------------------------------------
+# 🔹 Decodare în memorie (fără drum dus-întors pe disc)
+# ------------------------------------------------------------
+def decode_image(data, max_side: int = DECODE_SIZE) -> Image.Image:
+    """
+    Decodează o imagine din bytes / buffer direct la dimensiune redusă.
+    Pentru JPEG, `draft` cere decoderului un factor de scalare DCT (1/2, 1/4, 1/8),
+    deci o poză de 12 MP nu mai e decodată niciodată la rezoluție completă.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = io.BytesIO(data)
+    img = Image.open(data)
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGB")
+    img.thumbnail((max_side, max_side))
+    return img
+
+
+def save_thumbnail(image: Image.Image, path: str, max_side: int = 480, quality: int = 80):
+    """Salvează o miniatură JPEG comprimată (pentru afișare în result.html)."""
+    thumb = image.copy()
+    thumb.thumbnail((max_side, max_side))
+    thumb.save(path, "JPEG", quality=quality, optimize=True)
+    return path
+
+
+def _as_source(image):
+    """Acceptă cale pe disc, bytes / buffer în memorie, imagine PIL sau array."""
+    if isinstance(image, (bytes, bytearray, memoryview)) or hasattr(image, "read"):
+        return decode_image(image)
+    if isinstance(image, os.PathLike):
+        return os.fspath(image)
+    return image
+
+
+@metrics.span("detect")
+def detect_ingredients(image_path, use_cache: bool = True):
+    detector = get_detector()
+    source = _as_source(image_path)
+    if isinstance(source, str):
+        source = decode_image(source)
+
+    # Poze aproape identice re-încărcate -> rezultatul din cache, fără inferență
+    phash = None
+    if use_cache and DETECTION_CACHE and isinstance(source, Image.Image):
+        phash = dhash(source)
+        cached = get_cache().get(phash)
+        if cached is not None:
+            print(f"[INFO] Ingrediente din cache: {cached}")
+            return cached
+
+    if BATCH_WINDOW_MS > 0:
+        # Așteaptă în fereastra de micro-batching, împreună cu alte upload-uri
+        detected_classes = get_batcher().submit(source).result()
+    else:
+        # Rulează predicția pe modelul deja încărcat
+        results = detector.predict(source)
+        detected_classes = detector.classes(results[0])
 
     # Elimină duplicatele
     ingredients = list(set(detected_classes))
     print(f"[INFO] Ingrediente detectate: {ingredients}")
+    if phash is not None:
+        get_cache().put(phash, ingredients)
     return ingredients
+
+
+def detect_ingredients_batch(images, max_batch: int = MAX_BATCH):
+    """
+    Detectează ingredientele din mai multe imagini (ex.: frigider, congelator, cămară)
+    într-un singur forward pass batch. Întoarce ingredientele per imagine și
+    setul unificat, fără duplicate, în ordinea primei apariții.
+    """
+    detector = get_detector()
+    sources = [_as_source(img) for img in images]
+    if not sources:
+        return {"per_image": [], "merged": []}
+
+    results = detector.predict_many(sources, max_batch=max_batch)
+    per_image = [list(dict.fromkeys(detector.classes(res))) for res in results]
+    merged = list(dict.fromkeys(name for names in per_image for name in names))
+    print(f"[INFO] Ingrediente detectate în {len(sources)} imagini: {merged}")
+    return {"per_image": per_image, "merged": merged}
+
+
+# ------------------------------------------------------------
+# 🔹 Export din linia de comandă: python fridge_vision.py export onnx-int8
+# ------------------------------------------------------------
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 3 and sys.argv[1] == "export":
+        export_model(sys.argv[2])
+    else:
+        print(f"Utilizare: python fridge_vision.py export <{'|'.join(BACKENDS[1:])}>")
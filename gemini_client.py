@@ -0,0 +1,94 @@
+import os
+import threading
+import weakref
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+# ------------------------------------------------------------
+# 🔹 Client HTTP comun pentru Gemini (conexiuni keep-alive reutilizate)
+# ------------------------------------------------------------
+load_dotenv()
+API_KEY = os.getenv("GOOGLE_API_KEY")
+BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+POOL_SIZE = int(os.getenv("GEMINI_POOL_SIZE", "10"))      # conexiuni per worker
+CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", "30"))
+# un singur event loop multiplexează multe cereri, deci pool-ul async e mai mare
+ASYNC_POOL_SIZE = int(os.getenv("GEMINI_ASYNC_POOL_SIZE", "100"))
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+
+
+def model_url(endpoint: str, model: str, method: str = "generateContent") -> str:
+    """Singurul loc în care se construiesc URL-urile API-ului."""
+    return f"{BASE_URL}/{endpoint}/models/{model}:{method}"
+
+
+def _headers() -> dict:
+    return {
+        "Content-Type": "application/json",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+        "x-goog-api-key": API_KEY or "",
+    }
+
+
+def get_session() -> requests.Session:
+    """
+    Session partajat de toate thread-urile procesului: TCP + TLS se negociază
+    o singură dată per conexiune, apoi conexiunile din pool sunt refolosite.
+    Cheia API merge în header (nu în query string), deci nu ajunge în loguri.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                s.headers.update(_headers())
+                _session = s
+    return _session
+
+
+def post(endpoint: str, model: str, payload: dict, read_timeout: float = READ_TIMEOUT,
+         method: str = "generateContent", **kwargs) -> requests.Response:
+    return get_session().post(
+        model_url(endpoint, model, method),
+        json=payload,
+        timeout=(CONNECT_TIMEOUT, read_timeout),
+        **kwargs,
+    )
+
+
+# ------------------------------------------------------------
+# 🔹 Varianta asyncio (httpx): un client cu pool propriu per event loop
+# ------------------------------------------------------------
+def get_async_client():
+    import asyncio
+    import httpx
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers=_headers(),
+            limits=httpx.Limits(max_connections=ASYNC_POOL_SIZE, max_keepalive_connections=ASYNC_POOL_SIZE),
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def apost(endpoint: str, model: str, payload: dict, read_timeout: float = READ_TIMEOUT,
+                method: str = "generateContent"):
+    import httpx
+    return await get_async_client().post(
+        model_url(endpoint, model, method),
+        json=payload,
+        timeout=httpx.Timeout(read_timeout, connect=CONNECT_TIMEOUT),
+    )
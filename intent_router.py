@@ -0,0 +1,154 @@
+import re
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from text_norm import fold
+
+# ------------------------------------------------------------
+# 🔹 Cuvinte cheie, grupate pe sens (scrise o singură dată, fără diacritice:
+#    mesajul și cuvintele trec prin fold(), deci „rețetă”, „reţetă”, „RETETA” sunt la fel)
+#    Un cuvânt cheie se potrivește doar la început de cuvânt: „cina” nu prinde „piscina”.
+#    Spațiul final cere sfârșit de cuvânt: „reteta ” nu prinde „retetele”.
+# ------------------------------------------------------------
+KEYWORDS: Dict[str, List[str]] = {
+    'cook_now': ['ce pot gati acum', 'ce pot face acum', 'din retetele mele', 'ce retete pot face',
+                 'ce retete pot gati', 'ce pot gati din ce am', 'ce pot face din ce am'],
+    'fridge_hint': ['cu ce am', 'frigider'],
+    'cook': ['reteta', 'gati', 'gatesc', 'pot face', 'fa-mi', 'pregat'],
+    'meal': ['mic dejun', 'micul dejun', 'breakfast', 'pranz', 'cina', 'masa'],
+    'creative': ['cum fac', 'reteta ', 'retete', 'vreau reteta', 'idee de cina', 'idee de pranz'],
+    'list_recipes': ['toate retetele', 'lista retete', 'arata retetele'],
+    'list_fridge': ['ce am in frigider', 'lista frigider'],
+    'culinary': ['reteta', 'retete', 'ingrediente', 'fridge', 'frigider', 'ce pot gati', 'ce gatesc',
+                 'mic dejun', 'micul dejun', 'cina', 'pranz', 'gatit', 'meniu', 'propuneri', 'sugestii'],
+    # doar pentru masa sugerată, nu decid singure un intent
+    'breakfast': ['mic dejun', 'micul dejun', 'breakfast', 'diminea'],
+    'lunch': ['pranz', 'lunch'],
+    'dinner': ['cina', 'dinner', 'seara'],
+}
+
+
+class Rule(NamedTuple):
+    """
+    Regula unui intent. `all_of`: grupuri care trebuie să apară toate (un tuplu
+    în interior înseamnă „oricare dintre”); `none_of`: grupuri care exclud
+    intentul; `pattern`: regex peste textul normalizat, pentru capturi.
+    """
+    intent: str
+    priority: int
+    all_of: Tuple = ()
+    none_of: Tuple[str, ...] = ()
+    pattern: Optional[str] = None
+
+
+# Ordinea e cea din vechiul lanț de if-uri din ChefAgent._route, cu o excepție: listarea
+# rețetelor e înaintea cererilor creative („toate retetele” conține „retete”, deci altfel nu ajungea la listare)
+RULES: List[Rule] = [
+    Rule('cook_now', 100, all_of=('cook_now',)),
+    Rule('how_many', 90, pattern=r'\bcate ([a-z-]+) am\b'),
+    Rule('fridge_cook', 80, all_of=('fridge_hint', ('cook', 'meal'))),
+    Rule('list_recipes', 75, all_of=('list_recipes',)),
+    Rule('creative_recipe', 70, all_of=('creative',)),
+    Rule('list_fridge', 50, all_of=('list_fridge',)),
+    Rule('culinary', 10, all_of=('culinary',)),
+    Rule('chat', 0, none_of=('culinary',)),
+]
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    priority: int
+    captures: Tuple[str, ...] = ()
+
+
+class RouteResult(NamedTuple):
+    text: str                       # mesajul normalizat
+    groups: FrozenSet[str]          # grupurile de cuvinte cheie găsite
+    matches: List[IntentMatch]      # toate intenturile potrivite, descrescător după prioritate
+
+    @property
+    def best(self) -> Optional[IntentMatch]:
+        return self.matches[0] if self.matches else None
+
+
+# ------------------------------------------------------------
+# 🔹 Router compilat: o singură trecere peste începuturile de cuvânt din mesaj
+# ------------------------------------------------------------
+_WORD_START = re.compile(r'\b\w')
+HEAD_LEN = 4   # cuvintele cheie sunt grupate după primele (până la) 4 caractere
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == '_'
+
+
+class IntentRouter:
+    """
+    Cuvintele cheie încep mereu la început de cuvânt, așa că nu e nevoie de un
+    automat pe caractere: pentru fiecare început de cuvânt din mesaj se caută în
+    dicționar doar cuvintele cheie cu același început (primele HEAD_LEN caractere)
+    și se verifică cu startswith. Costul crește cu numărul de cuvinte din mesaj,
+    nu cu numărul de reguli; o alternanță `re` uriașă le-ar încerca pe toate la
+    fiecare poziție.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]] = None, rules: List[Rule] = None):
+        keywords = KEYWORDS if keywords is None else keywords
+        self.rules = sorted(RULES if rules is None else rules, key=lambda r: -r.priority)
+        groups_of = defaultdict(set)   # (cuvânt normalizat, sfârșit de cuvânt) -> grupuri
+        for group, phrases in keywords.items():
+            for phrase in phrases:
+                groups_of[(fold(phrase), phrase.endswith(' '))].add(group)
+        buckets = defaultdict(list)
+        for (literal, word_end), groups in groups_of.items():
+            buckets[literal[:HEAD_LEN]].append((literal, word_end, frozenset(groups)))
+        self._buckets = dict(buckets)
+        self._head_lens = sorted({len(h) for h in buckets}, reverse=True)
+        # regulile precompilate: fiecare condiție all_of devine un set „oricare dintre”
+        self._compiled = [(rule,
+                           [frozenset(g) if isinstance(g, tuple) else frozenset((g,)) for g in rule.all_of],
+                           frozenset(rule.none_of),
+                           re.compile(rule.pattern) if rule.pattern else None)
+                          for rule in self.rules]
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        groups = set()
+        buckets, n = self._buckets, len(text)
+        for m in _WORD_START.finditer(text):
+            pos = m.start()
+            for size in self._head_lens:
+                for literal, word_end, kw_groups in buckets.get(text[pos:pos + size], ()):
+                    if not text.startswith(literal, pos):
+                        continue
+                    end = pos + len(literal)
+                    if word_end and end < n and _is_word_char(text[end]):
+                        continue
+                    groups |= kw_groups
+        return frozenset(groups)
+
+    def route(self, message: str) -> RouteResult:
+        text = fold(message)
+        groups = self.scan(text)
+        matches = []
+        for rule, required, excluded, pattern in self._compiled:
+            if not excluded.isdisjoint(groups):
+                continue
+            for any_of in required:
+                if any_of.isdisjoint(groups):
+                    break
+            else:
+                captures = ()
+                if pattern is not None:
+                    m = pattern.search(text)
+                    if m is None:
+                        continue
+                    captures = m.groups()
+                matches.append(IntentMatch(rule.intent, rule.priority, captures))
+        return RouteResult(text, groups, matches)
+
+
+_router = IntentRouter()
+
+
+def route(message: str) -> RouteResult:
+    return _router.route(message)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import db
+
+# ------------------------------------------------------------
+# 🔹 Configurare cache răspunsuri LLM (override din .env)
+# ------------------------------------------------------------
+DB_PATH = db.DB_PATH
+ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+TTL_S = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_SIZE", "256"))
+USE_SQLITE = os.getenv("LLM_CACHE_SQLITE", "1") == "1"
+SQLITE_MAX_BYTES = int(os.getenv("LLM_CACHE_SQLITE_BYTES", str(50 * 1024 * 1024)))
+CLEANUP_EVERY = 50  # la câte scrieri rulăm evicția în SQLite
+
+
+def make_key(fn: str, model: str, **inputs) -> str:
+    """
+    Cheie stabilă: funcția + modelul + intrarea deja canonicalizată de apelant
+    (seturi sortate, text normalizat). Serializarea JSON cu chei sortate face
+    cheia independentă de ordinea argumentelor.
+    """
+    raw = json.dumps({"fn": fn, "model": model, "input": inputs}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ------------------------------------------------------------
+# 🔹 LRU în memorie + nivel SQLite cu TTL și evicție după dimensiune
+# ------------------------------------------------------------
+class LLMCache:
+    def __init__(self, db_path: str = DB_PATH, ttl_s: float = TTL_S,
+                 max_entries: int = MAX_ENTRIES, use_sqlite: bool = USE_SQLITE):
+        self.db_path = db_path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.use_sqlite = use_sqlite
+        self._lru = OrderedDict()  # key -> (text, expires_at)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits_memory = 0
+        self.hits_sqlite = 0
+        self.misses = 0
+        if self.use_sqlite:
+            self._init_table()
+
+    # --- SQLite (conexiuni din pool-ul db.py) ---
+    def _init_table(self):
+        with db.transaction(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS llm_cache (
+                            key TEXT PRIMARY KEY,
+                            value TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            created_at REAL NOT NULL,
+                            expires_at REAL NOT NULL
+                        )''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)')
+
+    def _sqlite_get(self, key: str, now: float):
+        return db.fetchone('SELECT value, expires_at FROM llm_cache WHERE key=? AND expires_at>?', (key, now),
+                           path=self.db_path)
+
+    def _sqlite_put(self, key: str, value: str, now: float):
+        with self._lock:
+            self._writes += 1
+            cleanup = self._writes % CLEANUP_EVERY == 0
+        with db.transaction(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute('INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                        (key, value, len(value.encode("utf-8")), now, now + self.ttl_s))
+            if cleanup:
+                cur.execute('DELETE FROM llm_cache WHERE expires_at<=?', (now,))
+                # păstrăm cele mai noi intrări până la SQLITE_MAX_BYTES
+                cur.execute('''DELETE FROM llm_cache WHERE key IN (
+                                  SELECT key FROM (
+                                      SELECT key, SUM(size) OVER (ORDER BY created_at DESC) AS running FROM llm_cache
+                                  ) WHERE running > ?)''', (SQLITE_MAX_BYTES,))
+
+    # --- API ---
+    def _memory_put(self, key: str, value: str, expires_at: float):
+        self._lru[key] = (value, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry and entry[1] > now:
+                self._lru.move_to_end(key)
+                self.hits_memory += 1
+                return entry[0]
+            if entry:
+                del self._lru[key]
+        if self.use_sqlite:
+            try:
+                row = self._sqlite_get(key, now)
+            except sqlite3.Error:
+                row = None
+            if row:
+                with self._lock:
+                    self._memory_put(key, row[0], row[1])
+                    self.hits_sqlite += 1
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, value, now + self.ttl_s)
+        if self.use_sqlite:
+            try:
+                self._sqlite_put(key, value, now)
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_sqlite + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_sqlite": self.hits_sqlite,
+                "misses": self.misses,
+                "hit_rate": round((self.hits_memory + self.hits_sqlite) / lookups, 4) if lookups else 0.0,
+                "entries_memory": len(self._lru),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
@@ -0,0 +1,88 @@
+"""
+Load test: client Gemini sincron (thread pool) vs asyncio, contra unui server local.
+
+    python loadtest_async.py --requests 400 --threads 8 --concurrency 200 --latency 0.5
+
+Serverul e fake_gemini cu o latență fixă, deci diferența de throughput vine doar
+din câte cereri pot aștepta simultan: N thread-uri vs sute de corutine.
+
+Înainte de măsurare, verifică decodarea stream-ului SSE: textul primit pe bucăți
+(cu diacritice, fără charset în Content-Type) trebuie să fie identic cu răspunsul
+întreg. La diferență scriptul iese cu cod 1.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_gemini
+
+
+def check_stream_text(recipe_ai):
+    prompt = "verificare diacritice în stream"
+    streamed = "".join(recipe_ai.stream_generate("generate_chat_reply", prompt, use_cache=False))
+    whole = recipe_ai.generate_chat_reply(prompt)
+    if streamed != whole or "ț" not in streamed:
+        print(f"❌ Stream decodat greșit:\n  stream: {streamed[:60]!r}\n  întreg: {whole[:60]!r}")
+        return False
+    print(f"✅ Stream UTF-8: {streamed.splitlines()[0]!r}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8, help="thread-uri pentru clientul sincron (≈ worker Flask)")
+    parser.add_argument("--concurrency", type=int, default=200, help="corutine simultane pentru clientul async")
+    parser.add_argument("--latency", type=float, default=0.5, help="latența serverului fals (s)")
+    args = parser.parse_args()
+
+    # Configurăm clientul înainte de import: fără rețea reală, fără cache, fără limite locale
+    os.environ.update({
+        "GEMINI_BASE_URL": fake_gemini.start(fake_gemini.FakeConfig(latency=f"fixed:{args.latency}", tokens=5)).url,
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "stub"),
+        "GEMINI_ENDPOINT": "v1",
+        "GEMINI_MODEL": "gemini-2.5-flash",
+        "GEMINI_REFRESH_INTERVAL": "0",
+        "GEMINI_POOL_SIZE": str(args.threads),
+        "GEMINI_ASYNC_POOL_SIZE": str(args.concurrency),
+        "GEMINI_RPM": "1000000000",
+        "GEMINI_TPM": "1000000000000",
+        "LLM_CACHE": "0",
+    })
+    import recipe_ai
+    import recipe_ai_async
+
+    if not check_stream_text(recipe_ai):
+        sys.exit(1)
+
+    # mesaje diferite, ca single-flight să nu le comaseze
+    messages = [f"mesaj de test {i}" for i in range(args.requests)]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(recipe_ai.generate_chat_reply, messages))
+    sync_s = time.perf_counter() - t0
+
+    async def run_async():
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(msg):
+            async with sem:
+                return await recipe_ai_async.generate_chat_reply(msg)
+
+        await asyncio.gather(*(one(m) for m in messages))
+
+    t0 = time.perf_counter()
+    asyncio.run(run_async())
+    async_s = time.perf_counter() - t0
+
+    print(f"\n{args.requests} cereri, latență fake_gemini {args.latency}s")
+    print(f"sync  ({args.threads} thread-uri):   {sync_s:6.2f}s  {args.requests / sync_s:8.1f} req/s")
+    print(f"async ({args.concurrency} corutine):  {async_s:6.2f}s  {args.requests / async_s:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
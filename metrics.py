@@ -0,0 +1,228 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# ------------------------------------------------------------
+# 🔹 Configurare metrici (override din .env)
+# ------------------------------------------------------------
+ENABLED = os.getenv("METRICS", "1") == "1"
+TIMING_HEADERS = os.getenv("METRICS_TIMING_HEADERS", "1") == "1"   # Server-Timing pe fiecare răspuns
+# limitele histogramelor de latență (secunde): de la interogări SQLite la apeluri LLM lente
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+# ------------------------------------------------------------
+# 🔹 Contoare și histograme (formatul text Prometheus, fără dependențe)
+# ------------------------------------------------------------
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}   # tuplu de etichete -> valoare
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Histogram:
+    """
+    observe() e o căutare binară și trei adunări sub un lock: câteva sute de
+    nanosecunde, neglijabil lângă orice etapă pe care o măsurăm.
+    """
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # tuplu de etichete -> [numărători per bucket (+inf la final), sumă, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        if not ENABLED:
+            return
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        names = self.label_names + ("le",)
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {count}"
+
+
+_metrics = []
+_collectors = []
+
+
+def counter(name: str, help: str, labels=()) -> Counter:
+    metric = Counter(name, help, labels)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, labels, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(fn):
+    """
+    `fn()` întoarce [(nume, tip, help, {etichete}, valoare)], citite la fiecare scrape.
+    Pentru contoarele pe care modulele le țin deja (stats()), fără cost pe drumul cald.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    seen = set()
+    for fn in _collectors:
+        try:
+            samples = fn()
+        except Exception as e:
+            print(f"⚠️ Colectorul de metrici {getattr(fn, '__name__', fn)} a eșuat: {e}")
+            continue
+        for name, kind, help, labels, value in samples:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------------------------------------
+# 🔹 Metricile aplicației
+# ------------------------------------------------------------
+REQUEST_SECONDS = histogram("chef_request_seconds", "Durata cererilor HTTP, per rută", ("route",))
+STAGE_SECONDS = histogram("chef_stage_seconds", "Durata etapelor (detect, llm, db, tts, intent, model_select)",
+                          ("stage",))
+LLM_ATTEMPT_SECONDS = histogram("chef_llm_attempt_seconds", "Durata fiecărei încercări către Gemini, per model",
+                                ("model", "outcome"))
+LLM_FALLBACKS = counter("chef_llm_fallbacks_total", "Încercări trecute pe alt model după un 429/503/timeout",
+                        ("model",))
+LLM_HEDGES = counter("chef_llm_hedges_total", "Cereri hedge lansate către al doilea model", ("model",))
+LLM_TOKENS = counter("chef_llm_tokens_total", "Tokeni raportați de Gemini în usageMetadata", ("model", "kind"))
+
+
+# ------------------------------------------------------------
+# 🔹 Span-uri: histograma etapei + Server-Timing pentru cererea curentă
+# ------------------------------------------------------------
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request():
+    """
+    Începe colectarea duratelor pentru cererea curentă. Ajung aici span-urile din
+    thread-ul cererii și din munca pornită cu contextul ei copiat (asyncio.to_thread,
+    etapele pipeline.Stage); un thread sau executor obișnuit pornește cu context gol,
+    deci duratele lui apar doar în histograme.
+    """
+    _request_timings.set([])
+
+
+def request_timings():
+    """{etapă: (durata totală în ms, apeluri)} pentru cererea curentă."""
+    totals = {}
+    for stage, seconds in _request_timings.get() or ():
+        ms, n = totals.get(stage, (0.0, 0))
+        totals[stage] = (ms + seconds * 1000, n + 1)
+    return totals
+
+
+def server_timing_header(total_s: float = None) -> str:
+    parts = [f'{stage};dur={ms:.1f};desc="{n}x"' for stage, (ms, n) in request_timings().items()]
+    if total_s is not None:
+        parts.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def record(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+class span:
+    """`with metrics.span('db'):` sau `@metrics.span('detect')` pe o funcție."""
+    __slots__ = ("stage", "_t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self._t0)
+        return False
+
+    def __call__(self, fn):
+        import functools
+        stage = self.stage
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - t0)
+        return wrapper
+
+
+def record_usage(model: str, data: dict):
+    """Tokenii din usageMetadata (răspuns complet sau ultimul chunk dintr-un stream)."""
+    usage = data.get("usageMetadata") if isinstance(data, dict) else None
+    if not usage:
+        return
+    for kind, field in (("prompt", "promptTokenCount"), ("candidates", "candidatesTokenCount"),
+                        ("thoughts", "thoughtsTokenCount")):
+        if usage.get(field):
+            LLM_TOKENS.inc(usage[field], model, kind)
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import threading
+import time
+
+import db
+
+# ------------------------------------------------------------
+# 🔹 Configurare stare comună a modelelor (override din .env)
+# ------------------------------------------------------------
+DB_PATH = db.DB_PATH
+SYNC_S = float(os.getenv("MODEL_HEALTH_SYNC", "1"))                 # cât de des citește un worker starea comună
+LATENCY_DELTA = float(os.getenv("MODEL_HEALTH_LATENCY_DELTA", "0.1"))   # schimbare relativă a EWMA care merită scrisă
+ERROR_DELTA = float(os.getenv("MODEL_HEALTH_ERROR_DELTA", "0.05"))
+FLUSH_S = float(os.getenv("MODEL_HEALTH_FLUSH", "30"))              # contoarele se scriu cel puțin atât de des
+
+
+class HealthRow:
+    __slots__ = ("state", "opened_at", "ewma_latency", "ewma_error", "successes", "failures", "updated_at")
+
+    def __init__(self, state, opened_at, ewma_latency, ewma_error, successes, failures, updated_at):
+        self.state = state
+        self.opened_at = opened_at
+        self.ewma_latency = ewma_latency
+        self.ewma_error = ewma_error
+        self.successes = successes
+        self.failures = failures
+        self.updated_at = updated_at
+
+
+# ------------------------------------------------------------
+# 🔹 Modelul selectat + sănătatea fiecărui (endpoint, model), comune tuturor workerilor
+# ------------------------------------------------------------
+class HealthStore:
+    """
+    Înlocuiește .gemini_model_cache.json: fișierul era rescris după fiecare
+    răspuns reușit, din fiecare worker. Aici fiecare scriere e o tranzacție
+    SQLite (atomică între procese) și are loc doar când ceva chiar s-a schimbat:
+    UPSERT-urile au condiții WHERE, deci o valoare identică nu produce scriere.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._init_table()
+
+    def _init_table(self):
+        with db.transaction(self.db_path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS model_selection (
+                            id INTEGER PRIMARY KEY CHECK (id = 1),
+                            endpoint TEXT NOT NULL,
+                            model TEXT NOT NULL,
+                            updated_at REAL NOT NULL
+                        )''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS model_health (
+                            endpoint TEXT NOT NULL,
+                            model TEXT NOT NULL,
+                            state TEXT NOT NULL DEFAULT 'closed',
+                            opened_at REAL NOT NULL DEFAULT 0,
+                            ewma_latency REAL,
+                            ewma_error REAL NOT NULL DEFAULT 0,
+                            successes INTEGER NOT NULL DEFAULT 0,
+                            failures INTEGER NOT NULL DEFAULT 0,
+                            updated_at REAL NOT NULL,
+                            PRIMARY KEY (endpoint, model)
+                        )''')
+
+    # --- modelul selectat ---
+    def load_selection(self):
+        """(endpoint, model, updated_at) sau None dacă nu s-a selectat încă nimic."""
+        return db.fetchone('SELECT endpoint, model, updated_at FROM model_selection WHERE id=1', path=self.db_path)
+
+    def save_selection(self, endpoint: str, model: str, touch: bool = False) -> bool:
+        """
+        Scrie doar dacă modelul diferă; `touch` actualizează și updated_at (o probă
+        nouă a confirmat același model), ca alți workeri să nu mai repete proba.
+        """
+        cur = db.execute('''INSERT INTO model_selection (id, endpoint, model, updated_at) VALUES (1, ?, ?, ?)
+                            ON CONFLICT(id) DO UPDATE SET endpoint=excluded.endpoint, model=excluded.model,
+                                                          updated_at=excluded.updated_at
+                            WHERE model_selection.endpoint != excluded.endpoint
+                               OR model_selection.model != excluded.model OR ?''',
+                         (endpoint, model, time.time(), int(touch)), path=self.db_path)
+        return cur.rowcount == 1
+
+    # --- circuit breaker ---
+    def set_circuit(self, key, state: str, opened_at: float) -> bool:
+        cur = db.execute('''INSERT INTO model_health (endpoint, model, state, opened_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(endpoint, model) DO UPDATE SET state=excluded.state,
+                                opened_at=excluded.opened_at, updated_at=excluded.updated_at
+                            WHERE model_health.state != excluded.state OR model_health.opened_at != excluded.opened_at''',
+                         (key[0], key[1], state, opened_at, time.time()), path=self.db_path)
+        return cur.rowcount == 1
+
+    # --- statistici ---
+    def publish(self, updates):
+        """`updates`: [(key, ewma_latency, ewma_error, succese noi, eșecuri noi)], într-o singură tranzacție."""
+        now = time.time()
+        with db.transaction(self.db_path) as conn:
+            conn.executemany('''INSERT INTO model_health (endpoint, model, ewma_latency, ewma_error, successes, failures, updated_at)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)
+                                ON CONFLICT(endpoint, model) DO UPDATE SET ewma_latency=excluded.ewma_latency,
+                                    ewma_error=excluded.ewma_error, successes=successes + excluded.successes,
+                                    failures=failures + excluded.failures, updated_at=excluded.updated_at''',
+                             [(key[0], key[1], lat, err, ok, failed, now) for key, lat, err, ok, failed in updates])
+        return now
+
+    def load(self) -> dict:
+        rows = db.fetchall('SELECT endpoint, model, state, opened_at, ewma_latency, ewma_error, successes, failures, '
+                           'updated_at FROM model_health', path=self.db_path)
+        return {(r[0], r[1]): HealthRow(*r[2:]) for r in rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> HealthStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HealthStore()
+    return _store
+
+
+def safe(fn, *args, default=None):
+    """Starea comună e o optimizare: dacă SQLite e blocat, routerul merge mai departe cu starea locală."""
+    try:
+        return fn(*args)
+    except sqlite3.Error as e:
+        print(f"⚠️ Starea comună a modelelor nu e disponibilă: {e}")
+        return default
@@ -0,0 +1,456 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+import model_health
+
+# ------------------------------------------------------------
+# 🔹 Configurare router (override din .env)
+# ------------------------------------------------------------
+EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.3"))
+FAILURE_THRESHOLD = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3"))   # eșecuri consecutive -> circuit deschis
+COOLDOWN_S = float(os.getenv("ROUTER_COOLDOWN", "30"))                # cât stă circuitul deschis
+PRIOR_LATENCY_S = float(os.getenv("ROUTER_PRIOR_LATENCY", "5"))       # estimare pentru modele neîncercate
+HEDGE = os.getenv("GEMINI_HEDGE", "0") == "1"
+HEDGE_MIN_DELAY_S = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "1.5"))
+HEDGE_DEFAULT_DELAY_S = float(os.getenv("GEMINI_HEDGE_DEFAULT_DELAY", "8"))
+HEDGE_WORKERS = int(os.getenv("GEMINI_HEDGE_WORKERS", "16"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class RetryableError(Exception):
+    """Eroare după care merită încercat alt model (429, 503, timeout, conexiune)."""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class NotSent(RetryableError):
+    """Cererea nu a plecat spre model (limită locală, probă deja în curs): alt candidat, fără eșec înregistrat."""
+
+
+class AllModelsUnavailable(Exception):
+    pass
+
+
+# ------------------------------------------------------------
+# 🔹 Statistici per (endpoint, model): EWMA latență/erori + circuit breaker
+# ------------------------------------------------------------
+class ModelStats:
+    def __init__(self):
+        self.ewma_latency = None
+        self.ewma_error = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False   # în HALF_OPEN, proba e deja trimisă de altă cerere
+        self.latencies = deque(maxlen=50)
+        self.successes = 0
+        self.failures = 0
+        # ce s-a scris ultima dată în starea comună (model_health)
+        self.published_latency = None
+        self.published_error = 0.0
+        self.published_at = 0.0
+        self.pending_successes = 0
+        self.pending_failures = 0
+
+    def needs_publish(self, now: float) -> bool:
+        """Scriem doar dacă EWMA s-a mișcat vizibil (sau contoarele așteaptă de prea mult)."""
+        if not (self.pending_successes or self.pending_failures):
+            return False
+        if now - self.published_at >= model_health.FLUSH_S:
+            return True
+        if abs(self.ewma_error - self.published_error) > model_health.ERROR_DELTA:
+            return True
+        if self.ewma_latency is None:
+            return False
+        if self.published_latency is None:
+            return True
+        return abs(self.ewma_latency - self.published_latency) > model_health.LATENCY_DELTA * self.published_latency
+
+    def current_state(self, now: float) -> str:
+        if self.state == OPEN and now - self.opened_at >= COOLDOWN_S:
+            self.state = HALF_OPEN  # o cerere de probă e permisă
+        return self.state
+
+    def score(self) -> float:
+        latency = self.ewma_latency if self.ewma_latency is not None else PRIOR_LATENCY_S
+        return latency * (1 + 4 * self.ewma_error)
+
+    def p95(self):
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def as_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "ewma_latency": self.ewma_latency,
+            "ewma_error": round(self.ewma_error, 4),
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "p95": self.p95(),
+        }
+
+
+class ModelRouter:
+    """
+    Trimite fiecare cerere la cel mai bun (endpoint, model) după latența EWMA
+    ponderată cu rata de erori. Modelele care eșuează repetat sunt scoase din
+    rotație (circuit deschis) pentru COOLDOWN_S, fără `sleep` în thread-ul cererii:
+    la 429/503 se trece imediat la următorul candidat. După cooldown, o singură
+    cerere de probă ajunge la model; restul îl ocolesc până se termină proba.
+
+    Cu hedging activ, dacă primul model nu răspunde în p95-ul lui istoric,
+    se trimite o a doua cerere la următorul candidat și câștigă primul răspuns.
+
+    Cu un `store` (model_health.HealthStore), workerii își împart starea printr-un
+    thread de fundal: deschiderea/închiderea unui circuit se scrie imediat ce apare,
+    EWMA-urile doar când se schimbă vizibil, iar starea celorlalți e citită o dată
+    la SYNC_S. Cererile (inclusiv cele din event loop-ul asyncio) ating doar
+    starea din memorie, niciodată SQLite.
+    """
+
+    def __init__(self, candidates, hedge: bool = HEDGE, store=None, on_sync=None):
+        self.candidates = list(dict.fromkeys(candidates))
+        self.hedge = hedge
+        self.store = store
+        self.on_sync = on_sync          # rulează în thread-ul de sincronizare, după fiecare sync()
+        self._stats = {key: ModelStats() for key in self.candidates}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._sync_lock = threading.Lock()
+        self._circuit_writes = {}       # key -> (stare, opened_at), încă nescrise în store
+        self._wake = threading.Event()
+        self._closed = False
+        if store is not None:
+            threading.Thread(target=self._sync_loop, name="model-health", daemon=True).start()
+
+    # --- stare ---
+    def set_candidates(self, candidates):
+        """Schimbă lista de candidați păstrând statisticile modelelor deja cunoscute."""
+        with self._lock:
+            self.candidates = list(dict.fromkeys(candidates))
+            for key in self.candidates:
+                self._stats.setdefault(key, ModelStats())
+
+    def ranked(self):
+        now = time.time()
+        with self._lock:
+            available = []
+            for order, key in enumerate(self.candidates):
+                st = self._stats[key]
+                state = st.current_state(now)
+                if state == OPEN or (state == HALF_OPEN and st.trial_in_flight):
+                    continue
+                available.append((state == HALF_OPEN, st.score(), order, key))
+        return [key for *_, key in sorted(available)]
+
+    def claim_trial(self, key) -> bool:
+        """
+        Un model HALF_OPEN primește o singură cerere de probă; până se termină,
+        celelalte cereri trec la următorul candidat. True dacă apelantul a luat proba.
+        """
+        with self._lock:
+            st = self._stats[key]
+            if st.current_state(time.time()) != HALF_OPEN:
+                return False
+            if st.trial_in_flight:
+                raise NotSent(f"{key[0]}/{key[1]}: proba după circuit deschis e deja în curs")
+            st.trial_in_flight = True
+            return True
+
+    def end_trial(self, key):
+        with self._lock:
+            self._stats[key].trial_in_flight = False
+
+    def record_success(self, key, latency: float):
+        with self._lock:
+            st = self._stats[key]
+            st.ewma_latency = latency if st.ewma_latency is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * st.ewma_latency
+            st.ewma_error = (1 - EWMA_ALPHA) * st.ewma_error
+            st.latencies.append(latency)
+            st.consecutive_failures = 0
+            recovered = st.state != CLOSED
+            st.state = CLOSED
+            st.successes += 1
+            st.pending_successes += 1
+            if recovered and self.store is not None:
+                self._circuit_writes[key] = (CLOSED, 0.0)
+        if recovered:
+            self._wake.set()
+
+    def record_failure(self, key):
+        with self._lock:
+            st = self._stats[key]
+            st.ewma_error = EWMA_ALPHA + (1 - EWMA_ALPHA) * st.ewma_error
+            st.consecutive_failures += 1
+            st.failures += 1
+            st.pending_failures += 1
+            opened_at = None
+            if st.state == HALF_OPEN or st.consecutive_failures >= FAILURE_THRESHOLD:
+                if st.state != OPEN:
+                    print(f"⛔ Circuit deschis pentru {key[0]}/{key[1]} ({st.consecutive_failures} eșecuri)")
+                    opened_at = time.time()
+                    st.opened_at = opened_at
+                    # doar tranziția se scrie; un eșec pe un circuit deja deschis nu schimbă nimic în store
+                    if self.store is not None:
+                        self._circuit_writes[key] = (OPEN, opened_at)
+                st.state = OPEN
+        if opened_at is not None:
+            self._wake.set()
+
+    # --- sincronizare cu ceilalți workeri (doar din thread-ul de fundal) ---
+    def _sync_loop(self):
+        while not self._closed:
+            # trezit imediat la o tranziție de circuit, altfel o dată la SYNC_S
+            self._wake.wait(model_health.SYNC_S)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.sync()
+                if self.on_sync is not None:
+                    self.on_sync()
+            except Exception as e:
+                print(f"⚠️ Sincronizarea stării modelelor a eșuat: {e}")
+
+    def close(self):
+        """Oprește thread-ul de sincronizare (routerul rămâne utilizabil, doar local)."""
+        self._closed = True
+        self._wake.set()
+
+    def sync(self):
+        """Publică schimbările locale și preia starea scrisă de ceilalți workeri."""
+        if not self._sync_lock.acquire(blocking=False):
+            return   # alt thread sincronizează deja
+        try:
+            with self._lock:
+                circuits, self._circuit_writes = self._circuit_writes, {}
+            for key, (state, opened_at) in circuits.items():
+                if model_health.safe(self.store.set_circuit, key, state, opened_at) is None:
+                    with self._lock:
+                        self._circuit_writes.setdefault(key, (state, opened_at))   # reîncercăm la următorul sync
+            now = time.time()
+            with self._lock:
+                updates = []
+                for key, st in self._stats.items():
+                    if st.needs_publish(now):
+                        updates.append((key, st.ewma_latency, st.ewma_error, st.pending_successes, st.pending_failures))
+                        st.pending_successes = st.pending_failures = 0
+                        st.published_latency, st.published_error = st.ewma_latency, st.ewma_error
+            if updates:
+                published_at = model_health.safe(self.store.publish, updates)
+                if published_at is not None:
+                    with self._lock:
+                        for key, *_ in updates:
+                            self._stats[key].published_at = published_at
+            shared = model_health.safe(self.store.load, default={})
+            with self._lock:
+                for key, row in shared.items():
+                    st = self._stats.get(key)
+                    if st is None:
+                        continue
+                    if row.state == OPEN and row.opened_at > st.opened_at:
+                        st.state, st.opened_at = OPEN, row.opened_at            # deschis de alt worker
+                    elif row.state == CLOSED and st.state != CLOSED and row.updated_at > st.opened_at:
+                        st.state, st.consecutive_failures = CLOSED, 0            # alt worker l-a văzut revenind
+                    if row.ewma_latency is not None and row.updated_at > st.published_at:
+                        # EWMA scrisă de alt worker după ultima noastră publicare
+                        st.ewma_latency, st.ewma_error = row.ewma_latency, row.ewma_error
+                        st.published_latency, st.published_error = row.ewma_latency, row.ewma_error
+                        st.published_at = row.updated_at
+        finally:
+            self._sync_lock.release()
+
+    def hedge_delay(self, key) -> float:
+        with self._lock:
+            p95 = self._stats[key].p95()
+        return max(HEDGE_MIN_DELAY_S, p95 if p95 is not None else HEDGE_DEFAULT_DELAY_S)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {f"{ep}/{md}": st.as_dict() for (ep, md), st in self._stats.items() if (ep, md) in self.candidates}
+
+    # --- execuție ---
+    def _admit(self, admit, key):
+        # așteptarea la limita locală nu e latența modelului: nu intră în EWMA / p95 / hedge
+        t0 = time.perf_counter()
+        try:
+            admit(*key)
+        except NotSent:
+            self._observe(key, t0, "shed")
+            raise
+
+    def _attempt(self, send, key, admit=None):
+        if admit is not None:
+            self._admit(admit, key)
+        trial = self.claim_trial(key)
+        t0 = time.perf_counter()
+        try:
+            result = send(*key)
+        except NotSent:
+            self._observe(key, t0, "shed")
+            raise
+        except RetryableError:
+            self.record_failure(key)
+            self._observe(key, t0, "retryable")
+            raise
+        except Exception:
+            self._observe(key, t0, "error")
+            raise
+        else:
+            self.record_success(key, time.perf_counter() - t0)
+            self._observe(key, t0, "ok")
+        finally:
+            if trial:
+                self.end_trial(key)
+        return result
+
+    @staticmethod
+    def _observe(key, t0, outcome):
+        metrics.LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - t0, key[1], outcome)
+        if outcome == "retryable":
+            metrics.LLM_FALLBACKS.inc(1, key[1])
+
+    def call(self, send, hedge: bool = None, admit=None):
+        """
+        `send(endpoint, model)` întoarce textul sau aruncă RetryableError
+        (→ următorul candidat) ori altă excepție (→ propagată imediat).
+        `admit(endpoint, model)`, opțional, rulează înainte de cronometrare (ex.:
+        coada limitei locale); dacă aruncă NotSent, se trece la următorul candidat.
+        """
+        queue = self.ranked()
+        if not queue:
+            raise AllModelsUnavailable("Toate modelele sunt ocupate momentan (429/503). Încearcă din nou mai târziu.")
+        hedge = self.hedge if hedge is None else hedge
+        if not hedge or len(queue) < 2:
+            return self._call_sequential(send, queue, admit)
+        return self._call_hedged(send, queue, admit)
+
+    def _call_sequential(self, send, queue, admit=None):
+        last = None
+        for key in queue:
+            try:
+                return self._attempt(send, key, admit)
+            except RetryableError as e:
+                last = e
+        raise AllModelsUnavailable(f"Toate modelele sunt ocupate momentan (429/503). Încearcă din nou mai târziu. ({last})")
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="gemini-hedge")
+        return self._pool
+
+    def _call_hedged(self, send, queue, admit=None):
+        pool = self._executor()
+        pending = list(queue)
+        inflight = {}
+        last = None
+
+        def launch():
+            key = pending.pop(0)
+            inflight[pool.submit(self._attempt, send, key, admit)] = key
+
+        launch()
+        while inflight:
+            # cât timp mai avem candidați și un singur request în zbor, așteptăm doar până la p95
+            timeout = self.hedge_delay(next(iter(inflight.values()))) if pending and len(inflight) == 1 else None
+            done, _ = wait(list(inflight), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                metrics.LLM_HEDGES.inc(1, pending[0][1])
+                launch()  # hedge: al doilea request către următorul model
+                continue
+            for fut in done:
+                inflight.pop(fut)
+                try:
+                    return fut.result()
+                except RetryableError as e:
+                    last = e
+                    if pending and len(inflight) < 2:
+                        launch()
+        raise AllModelsUnavailable(f"Toate modelele sunt ocupate momentan (429/503). Încearcă din nou mai târziu. ({last})")
+
+    # --- execuție asyncio (aceleași statistici, fără thread-uri) ---
+    async def _aadmit(self, admit, key):
+        t0 = time.perf_counter()
+        try:
+            await admit(*key)
+        except NotSent:
+            self._observe(key, t0, "shed")
+            raise
+
+    async def _aattempt(self, send, key, admit=None):
+        if admit is not None:
+            await self._aadmit(admit, key)
+        trial = self.claim_trial(key)
+        t0 = time.perf_counter()
+        try:
+            result = await send(*key)
+        except NotSent:
+            self._observe(key, t0, "shed")
+            raise
+        except RetryableError:
+            self.record_failure(key)
+            self._observe(key, t0, "retryable")
+            raise
+        except Exception:
+            self._observe(key, t0, "error")
+            raise
+        else:
+            self.record_success(key, time.perf_counter() - t0)
+            self._observe(key, t0, "ok")
+        finally:
+            # și la anulare (hedge pierzător), altfel modelul ar rămâne fără probă
+            if trial:
+                self.end_trial(key)
+        return result
+
+    async def acall(self, send, hedge: bool = None, admit=None):
+        """Ca `call`, dar `send(endpoint, model)` și `admit(endpoint, model)` sunt corutine."""
+        pending = self.ranked()
+        if not pending:
+            raise AllModelsUnavailable("Toate modelele sunt ocupate momentan (429/503). Încearcă din nou mai târziu.")
+        hedge = self.hedge if hedge is None else hedge
+        max_parallel = 2 if hedge else 1
+        inflight = {}
+        last = None
+
+        def launch():
+            key = pending.pop(0)
+            inflight[asyncio.ensure_future(self._aattempt(send, key, admit))] = key
+
+        launch()
+        try:
+            while inflight:
+                timeout = None
+                if hedge and pending and len(inflight) == 1:
+                    timeout = self.hedge_delay(next(iter(inflight.values())))
+                done, _ = await asyncio.wait(list(inflight), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    metrics.LLM_HEDGES.inc(1, pending[0][1])
+                    launch()
+                    continue
+                for task in done:
+                    inflight.pop(task)
+                    try:
+                        return task.result()
+                    except RetryableError as e:
+                        last = e
+                        if pending and len(inflight) < max_parallel:
+                            launch()
+        finally:
+            # hedge-ul pierzător nu mai e necesar
+            for task in inflight:
+                task.cancel()
+        raise AllModelsUnavailable(f"Toate modelele sunt ocupate momentan (429/503). Încearcă din nou mai târziu. ({last})")
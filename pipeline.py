@@ -0,0 +1,284 @@
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fridge_vision import detect_ingredients
+from recipe_ai import generate_recipes
+from voice_assistant import get_service as get_tts
+
+# ------------------------------------------------------------
+# 🔹 Configurare pipeline /upload (override din .env)
+#    Fiecare etapă are workeri proprii și o capacitate (în lucru + în așteptare).
+# ------------------------------------------------------------
+DETECT_WORKERS = int(os.getenv("PIPELINE_DETECT_WORKERS", "2"))
+DETECT_CAPACITY = int(os.getenv("PIPELINE_DETECT_CAPACITY", "8"))   # peste, /upload răspunde 503
+LLM_WORKERS = int(os.getenv("PIPELINE_LLM_WORKERS", "8"))
+LLM_CAPACITY = int(os.getenv("PIPELINE_LLM_CAPACITY", "32"))
+TTS_WORKERS = int(os.getenv("PIPELINE_TTS_WORKERS", "2"))
+TTS_CAPACITY = int(os.getenv("PIPELINE_TTS_CAPACITY", "32"))
+HANDOFF_WAIT_S = float(os.getenv("PIPELINE_HANDOFF_WAIT", "30"))   # cât așteaptă detecția loc în etapele următoare
+JOB_TTL_S = float(os.getenv("PIPELINE_JOB_TTL", "600"))            # cât păstrăm un job terminat pentru /jobs/<id>
+MAX_JOBS = int(os.getenv("PIPELINE_MAX_JOBS", "1000"))
+
+LLM_FALLBACK = (
+    "Nu am putut genera rețete acum (serviciul AI a răspuns lent).\n\n"
+    "Ingrediente detectate: {ingredients}.\n"
+    "Te rog reîncearcă în câteva secunde."
+)
+
+
+class StageFull(Exception):
+    """Etapa nu mai are loc; cererea trebuie refuzată sau reîncercată mai târziu."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Etapa „{stage}” e plină")
+        self.stage = stage
+
+
+# ------------------------------------------------------------
+# 🔹 Etapă: pool de workeri + semafor pentru capacitate (backpressure)
+# ------------------------------------------------------------
+class Stage:
+    """
+    Semaforul numără joburile în lucru și în așteptare; executorul singur ar avea
+    o coadă nelimitată. Intrarea în pipeline nu așteaptă (refuză imediat), iar
+    trecerea între etape așteaptă loc cel mult HANDOFF_WAIT_S, deci o etapă lentă
+    încetinește detecția din amonte în loc să adune joburi în memorie.
+    """
+
+    def __init__(self, name: str, workers: int, capacity: int):
+        self.name = name
+        self.capacity = max(capacity, workers)
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"pipe-{name}")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, wait_s: float = 0):
+        acquired = self._slots.acquire(timeout=wait_s) if wait_s > 0 else self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise StageFull(self.name)
+        with self._lock:
+            self.in_flight += 1
+        # contextul cererii (metrics: durate pentru Server-Timing) merge cu jobul în worker
+        future = self._pool.submit(contextvars.copy_context().run, fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": self.in_flight, "capacity": self.capacity,
+                    "completed": self.completed, "rejected": self.rejected}
+
+
+# ------------------------------------------------------------
+# 🔹 Job: starea unui upload, observabilă din /jobs/<id> (poll sau SSE)
+# ------------------------------------------------------------
+class Job:
+    def __init__(self, job_id: str, user_id: int = None):
+        self.id = job_id
+        self.user_id = user_id        # doar proprietarul vede jobul în /jobs/<id>
+        self.state = 'queued'         # queued -> detecting -> generating -> done | failed
+        self.stages = {}              # etapă -> {'state', 'ms'}
+        self.ingredients = None
+        self.recipes = None
+        self.audio_key = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.version = 0              # crește la fiecare schimbare; SSE trimite doar stări noi
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('done', 'failed')
+
+    def update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            if self.finished and self.finished_at is None:
+                self.finished_at = time.time()
+            self.version += 1
+            self._changed.notify_all()
+
+    def stage(self, name: str, state: str, started: float = None):
+        with self._changed:
+            entry = self.stages.setdefault(name, {})
+            entry['state'] = state
+            if started is not None:
+                entry['ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, since: int = None, timeout: float = None) -> int:
+        """Așteaptă o versiune mai nouă decât `since` (implicit: până se termină jobul)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while not self.finished and (since is None or self.version <= since):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return self.version
+
+    def to_dict(self) -> dict:
+        with self._changed:
+            end = self.finished_at or time.time()
+            return {
+                'id': self.id,
+                'state': self.state,
+                'stages': {k: dict(v) for k, v in self.stages.items()},
+                'ingredients': self.ingredients,
+                'recipes': self.recipes,
+                'audio_key': self.audio_key,
+                'error': self.error,
+                'elapsed_ms': round((end - self.created_at) * 1000, 1),
+                'version': self.version,
+            }
+
+
+# ------------------------------------------------------------
+# 🔹 Pipeline: detecție -> (rețete LLM ‖ voce TTS)
+#    Ambele depind doar de ingrediente, deci latența devine detecție + max(LLM, TTS).
+# ------------------------------------------------------------
+class UploadPipeline:
+    """
+    Joburile trăiesc în memoria procesului (imaginea decodată e oricum aici), deci
+    /jobs/<id> trebuie să ajungă la același worker care a primit upload-ul.
+    """
+
+    def __init__(self):
+        self.detect = Stage('detect', DETECT_WORKERS, DETECT_CAPACITY)
+        self.llm = Stage('llm', LLM_WORKERS, LLM_CAPACITY)
+        self.tts = Stage('tts', TTS_WORKERS, TTS_CAPACITY)
+        self._jobs = OrderedDict()   # id -> Job, în ordinea creării
+        self._lock = threading.Lock()
+
+    def submit(self, image, user_id: int = None) -> Job:
+        """Pornește un job; ridică StageFull dacă detecția e deja la capacitate."""
+        job = Job(uuid.uuid4().hex, user_id)
+        self.detect.submit(self._detect, job, image)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._expire()
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        """
+        Scoate doar joburi terminate: pe cele mai vechi de JOB_TTL_S și, peste
+        MAX_JOBS, pe cele mai vechi. Un job în lucru rămâne mereu, altfel clientul
+        care îl urmărește ar primi 404 în mijlocul procesării.
+        """
+        now = time.time()
+        over = len(self._jobs) - MAX_JOBS
+        for job_id, job in list(self._jobs.items()):
+            finished_at = job.finished_at
+            if finished_at is None:
+                continue
+            if over > 0 or now - finished_at > JOB_TTL_S:
+                del self._jobs[job_id]
+                over -= 1
+
+    # --- etape ---
+    def _detect(self, job: Job, image):
+        started = time.perf_counter()
+        job.update(state='detecting')
+        job.stage('detect', 'running')
+        try:
+            ingredients = detect_ingredients(image)
+        except Exception as e:
+            job.stage('detect', 'failed', started)
+            job.update(state='failed', error=f"Detecția a eșuat: {e}")
+            return
+        job.stage('detect', 'done', started)
+        job.update(state='generating', ingredients=ingredients)
+
+        pending = [2]
+        pending_lock = threading.Lock()
+
+        def finished_one():
+            with pending_lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                job.update(state='done')
+
+        for stage, fn in ((self.llm, self._generate), (self.tts, self._speak)):
+            try:
+                stage.submit(fn, job, ingredients, finished_one, wait_s=HANDOFF_WAIT_S)
+            except StageFull:
+                # nu blocăm jobul: partea respectivă lipsește, restul rezultatului rămâne
+                job.stage(stage.name, 'skipped')
+                if stage is self.llm:
+                    job.update(recipes=LLM_FALLBACK.format(ingredients=', '.join(ingredients) or '—'))
+                finished_one()
+
+    def _generate(self, job: Job, ingredients, on_done):
+        started = time.perf_counter()
+        job.stage('llm', 'running')
+        try:
+            job.update(recipes=generate_recipes(ingredients))
+            job.stage('llm', 'done', started)
+        except Exception:
+            job.update(recipes=LLM_FALLBACK.format(ingredients=', '.join(ingredients) or '—'))
+            job.stage('llm', 'failed', started)
+        finally:
+            on_done()
+
+    def _speak(self, job: Job, ingredients, on_done):
+        started = time.perf_counter()
+        job.stage('tts', 'running')
+        try:
+            tts = get_tts()
+            key = tts.submit(f"I found {', '.join(ingredients)}. Here are some recipe ideas!")
+            # jobul e gata abia când fișierul audio există, ca pagina să nu ceară un /tts încă în randare
+            if key is not None and tts.wait(key) is not None:
+                job.update(audio_key=key)
+                job.stage('tts', 'done', started)
+            else:
+                job.stage('tts', 'failed', started)
+        except Exception:
+            job.stage('tts', 'failed', started)
+        finally:
+            on_done()
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            'stages': {s.name: s.stats() for s in (self.detect, self.llm, self.tts)},
+            'jobs': len(jobs),
+            'running': sum(1 for j in jobs if not j.finished),
+        }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> UploadPipeline:
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = UploadPipeline()
+    return _pipeline
@@ -1,6 +1,15 @@
 import os
-import requests
+import threading
 from dotenv import load_dotenv
+import requests
+import gemini_client
+from model_router import ModelRouter, NotSent, RetryableError
+import llm_cache
+import metrics
+import model_health
+import recipe_library
+import throttle
+from text_norm import canonical_ingredients, fold
 
 # ------------------------------------------------------------
 # 🔹 Încărcare cheie API din fișierul .env
@@ -9,7 +18,8 @@ load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 ENV_ENDPOINT = os.getenv("GEMINI_ENDPOINT")  # ex.: v1 / v1beta
 ENV_MODEL = os.getenv("GEMINI_MODEL")        # ex.: gemini-2.5-flash
-CACHE_PATH = os.path.join(os.path.dirname(__file__), ".gemini_model_cache.json")
+PROBE_TIMEOUT_S = float(os.getenv("GEMINI_PROBE_TIMEOUT", "8"))
+REFRESH_INTERVAL_S = float(os.getenv("GEMINI_REFRESH_INTERVAL", "1800"))  # 0 = fără reîmprospătare
 
 if not API_KEY:
     raise Exception("❌ Nu s-a găsit cheia GOOGLE_API_KEY în fișierul .env")
@@ -32,13 +42,28 @@ Scenarii:
 # ------------------------------------------------------------
 # 🔹 Funcție care testează automat ce endpoint și modele merg
 # ------------------------------------------------------------
+def _probe(endpoint: str, model: str):
+    import time
+    # Răspuns de 1 token: verificăm doar că modelul e sănătos, fără să consumăm cotă degeaba
+    payload = {
+        "contents": [{"parts": [{"text": "ping"}]}],
+        "generationConfig": {"maxOutputTokens": 1},
+    }
+    t0 = time.perf_counter()
+    resp = gemini_client.post(endpoint, model, payload, read_timeout=PROBE_TIMEOUT_S)
+    elapsed = time.perf_counter() - t0
+    if resp.status_code != 200:
+        raise Exception(f"status {resp.status_code}")
+    return elapsed, endpoint, model
+
+
 def detect_working_model():
     """
-    Selectează automat modelul cu cea mai mică latență dintre candidați,
-    pe oricare dintre endpoint-urile suportate. Măsoară timpul efectiv al
-    unui request minimal și alege cel mai rapid care răspunde 200.
+    Testează în paralel toate combinațiile endpoint × model și îl alege pe primul
+    care răspunde 200 — primul sosit e și cel cu latența cea mai mică.
+    Durata e deci ≈ un singur round-trip, nu suma tuturor probelor.
     """
-    import time
+    from concurrent.futures import ThreadPoolExecutor, as_completed
     endpoints = ["v1beta", "v1"]  # v1beta e adesea mai liber
     # Preferăm modelele FLASH (mai rapide, mai ieftine). Scoatem PRO din autodetect ca să evităm 404/permisiuni.
     candidates = [
@@ -46,29 +71,23 @@ def detect_working_model():
         "gemini-2.0-flash",
         "gemini-1.5-flash",
     ]
+    pairs = [(ep, md) for ep in endpoints for md in candidates]
 
-    test_payload = {"contents": [{"parts": [{"text": "ping"}]}]}
-    headers = {"Content-Type": "application/json"}
-
-    best = None  # (elapsed, endpoint, model)
-    for endpoint in endpoints:
-        for model in candidates:
+    pool = ThreadPoolExecutor(max_workers=len(pairs), thread_name_prefix="gemini-probe")
+    futures = {pool.submit(_probe, ep, md): (ep, md) for ep, md in pairs}
+    try:
+        for fut in as_completed(futures):
+            endpoint, model = futures[fut]
             try:
-                url = f"https://generativelanguage.googleapis.com/{endpoint}/models/{model}:generateContent?key={API_KEY}"
-                t0 = time.perf_counter()
-                resp = requests.post(url, headers=headers, json=test_payload, timeout=8)
-                elapsed = time.perf_counter() - t0
-                if resp.status_code == 200:
-                    if best is None or elapsed < best[0]:
-                        best = (elapsed, endpoint, model)
-                else:
-                    print(f"↪︎ {endpoint}/{model} status {resp.status_code}")
+                elapsed, endpoint, model = fut.result()
             except Exception as e:
-                print(f"⚠️ Eroare la testarea {endpoint}/{model}: {e}")
-
-    if best:
-        print(f"✅ Aleg cel mai rapid: '{best[2]}' pe '{best[1]}' (≈{best[0]:.2f}s)")
-        return best[1], best[2]
+                print(f"↪︎ {endpoint}/{model}: {e}")
+                continue
+            print(f"✅ Aleg cel mai rapid: '{model}' pe '{endpoint}' (≈{elapsed:.2f}s)")
+            return endpoint, model
+    finally:
+        # nu așteptăm probele rămase; se termină singure în fundal
+        pool.shutdown(wait=False, cancel_futures=True)
     raise Exception("❌ Nu am putut inițializa niciun model Gemini. Verifică GOOGLE_API_KEY și cotele.")
 
 # ------------------------------------------------------------
@@ -76,26 +95,16 @@ def detect_working_model():
 #    Permite override din .env (GEMINI_ENDPOINT, GEMINI_MODEL)
 # ------------------------------------------------------------
 def _load_cached_model():
-    try:
-        import json
-        if os.path.exists(CACHE_PATH):
-            with open(CACHE_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                ep, md = data.get('endpoint'), data.get('model')
-                if ep and md:
-                    print(f"ℹ️ Folosesc modelul din cache: '{md}' pe '{ep}'")
-                    return ep, md
-    except Exception:
-        pass
+    # selecția comună tuturor workerilor (model_health), nu un fișier per proces
+    row = model_health.safe(lambda: model_health.get_store().load_selection())
+    if row:
+        print(f"ℹ️ Folosesc modelul din cache: '{row[1]}' pe '{row[0]}'")
+        return row[0], row[1]
     return None, None
 
 def _save_cached_model(endpoint: str, model: str):
-    try:
-        import json
-        with open(CACHE_PATH, 'w', encoding='utf-8') as f:
-            json.dump({"endpoint": endpoint, "model": model}, f)
-    except Exception:
-        pass
+    # doar la o selecție nouă (probe), niciodată per cerere; touch: proba e proaspătă
+    model_health.safe(lambda: model_health.get_store().save_selection(endpoint, model, touch=True))
 
 def _select_endpoint_and_model():
     # 1) .env override
@@ -107,41 +116,193 @@ def _select_endpoint_and_model():
     if ep and md:
         return ep, md
     # 3) autodetect
-    return detect_working_model()
+    selected = detect_working_model()
+    _save_cached_model(*selected)
+    return selected
+
+# ------------------------------------------------------------
+# 🔹 Selecție leneșă: nimic nu pleacă în rețea la import
+# ------------------------------------------------------------
+_selected = None  # (endpoint, model)
+_selection_lock = threading.Lock()
+_selection_checked = 0.0  # ultima citire a selecției comune (time.monotonic)
+_refresher = None
+
+
+def get_endpoint_and_model():
+    """
+    Întoarce (endpoint, model). Prima apelare face selecția (.env / cache / probe
+    paralel); apoi pornește reîmprospătarea periodică în fundal.
+    """
+    global _selected
+    if _selected is None:
+        with _selection_lock:
+            if _selected is None:
+                _selected = _select_endpoint_and_model()
+                _start_refresher()
+    return _selected
+
+
+def _adopt_shared_selection():
+    """
+    Preia modelul ales de alt worker (o citire după cheia primară, cel mult o dată
+    la SYNC_S). Rulează în thread-ul de sincronizare al routerului, nu pe cereri.
+    """
+    global _selected, _selection_checked
+    import time
+    now = time.monotonic()
+    if _selected is None or (ENV_ENDPOINT and ENV_MODEL) or now - _selection_checked < model_health.SYNC_S:
+        return
+    _selection_checked = now
+    row = model_health.safe(lambda: model_health.get_store().load_selection())
+    if row and (row[0], row[1]) != _selected:
+        print(f"ℹ️ Alt worker a ales '{row[1]}' pe '{row[0]}'")
+        _selected = (row[0], row[1])
 
-ENDPOINT, MODEL = _select_endpoint_and_model()
+
+def warmup_model_selection():
+    """Pentru pornirea aplicației: rulează selecția într-un thread de fundal."""
+    threading.Thread(target=get_endpoint_and_model, name="gemini-select", daemon=True).start()
+
+
+def _start_refresher():
+    global _refresher
+    if _refresher is not None or REFRESH_INTERVAL_S <= 0 or (ENV_ENDPOINT and ENV_MODEL):
+        return
+    _refresher = threading.Thread(target=_refresh_loop, name="gemini-refresh", daemon=True)
+    _refresher.start()
+
+
+def _refresh_loop():
+    global _selected
+    import time
+    while True:
+        time.sleep(REFRESH_INTERVAL_S)
+        # dacă alt worker a refăcut proba de curând, îi folosim rezultatul în loc să repetăm proba
+        row = model_health.safe(lambda: model_health.get_store().load_selection())
+        if row and time.time() - row[2] < REFRESH_INTERVAL_S / 2:
+            _selected = (row[0], row[1])
+            continue
+        try:
+            _selected = detect_working_model()
+            _save_cached_model(*_selected)
+        except Exception as e:
+            print(f"⚠️ Reîmprospătarea modelului a eșuat, păstrez '{_selected[1]}': {e}")
 
 # ------------------------------------------------------------
 # 🔹 Helper comun: trimite prompt către Gemini cu retry + fallback modele
 # ------------------------------------------------------------
-def _generate_with_retries(prompt: str, timeout_s: int = 30) -> str:
-    import time
+FLASH_MODELS = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-1.5-flash"]
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Router-ul procesului; candidații urmăresc selecția curentă (modelul ales primul)."""
+    global _router
+    with metrics.span("model_select"):
+        endpoint, model = get_endpoint_and_model()
+    candidates = [(endpoint, m) for m in dict.fromkeys([model, *FLASH_MODELS]) if m]
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(candidates, store=model_health.safe(model_health.get_store),
+                                  on_sync=_adopt_shared_selection)
+        elif _router.candidates != candidates:
+            _router.set_candidates(candidates)
+    return _router
+
+
+def _send(endpoint: str, model_name: str, payload: dict, timeout_s: float) -> str:
+    try:
+        resp = gemini_client.post(endpoint, model_name, payload, read_timeout=timeout_s)
+    except (requests.Timeout, requests.ConnectionError) as e:
+        raise RetryableError(f"{endpoint}/{model_name}: {type(e).__name__} {e}")
+    return _extract_text(endpoint, model_name, resp.status_code, resp.json if resp.status_code == 200 else None, resp.text)
+
+
+def _extract_text(endpoint: str, model_name: str, status: int, get_json, body: str) -> str:
+    """Interpretarea comună (sync + async) a unui răspuns generateContent."""
+    if status == 200:
+        data = get_json()
+        metrics.record_usage(model_name, data)
+        try:
+            return data["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError):
+            raise Exception(f"⚠️ Format neașteptat al răspunsului API: {data}")
+    if status in (429, 503):
+        # fără sleep: routerul trece imediat la alt model și îl penalizează pe acesta
+        raise RetryableError(f"{endpoint}/{model_name} status {status}", status)
+    # alte erori – propagă imediat
+    raise Exception(f"API error {_current_func_name()}: {status} - {body}")
+
+
+def _generate_with_retries(prompt: str, timeout_s: int = 30, hedge: bool = None,
+                           cache_key: dict = None, use_cache: bool = True, generation_config: dict = None) -> str:
+    """
+    `cache_key`: intrarea canonică a apelantului (fără ea, răspunsul nu se cachează).
+    Cheia finală include și modelul preferat, ca un model nou să nu servească
+    răspunsuri vechi. `generation_config` ajunge neschimbat în payload (ex.: JSON cu schemă).
+    """
+    with metrics.span("llm"):
+        return _generate(prompt, timeout_s, hedge, cache_key, use_cache, generation_config)
 
-    # Ordinea candidaților: modelul curent, apoi alte variante FLASH
-    candidates = [m for m in [MODEL, "gemini-2.5-flash", "gemini-2.0-flash", "gemini-1.5-flash"] if m]
-    headers = {"Content-Type": "application/json"}
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
 
-    for model_name in candidates:
-        url = f"https://generativelanguage.googleapis.com/{ENDPOINT}/models/{model_name}:generateContent?key={API_KEY}"
-        for attempt in range(1, 3):  # două încercări/model
-            resp = requests.post(url, headers=headers, json=payload, timeout=timeout_s)
-            if resp.status_code == 200:
-                data = resp.json()
-                try:
-                    # cachează modelul reușit pentru a fi preferat la startup
-                    _save_cached_model(ENDPOINT, model_name)
-                    return data["candidates"][0]["content"]["parts"][0]["text"]
-                except KeyError:
-                    raise Exception(f"⚠️ Format neașteptat al răspunsului API: {data}")
-            if resp.status_code in (429, 503):
-                # backoff scurt și reîncercare
-                time.sleep(2 * attempt)
-                continue
-            # alte erori – propagă imediat
-            raise Exception(f"API error {_current_func_name()}: {resp.status_code} - {resp.text}")
-        # trecem la următorul model
-    raise Exception("Toate modelele sunt ocupate momentan (429/503). Încearcă din nou mai târziu.")
+def _generate(prompt: str, timeout_s: int, hedge: bool, cache_key: dict, use_cache: bool,
+              generation_config: dict = None) -> str:
+    key = _cache_key(cache_key, use_cache)
+    if key is not None:
+        cached = llm_cache.get_cache().get(key)
+        if cached is not None:
+            return cached
+
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+    est_tokens = throttle.estimate_tokens(prompt)
+
+    def call():
+        # coadă scurtă la limita locală (RPM/TPM), în afara cronometrării; dacă e prea lungă, alt model
+        text = get_router().call(lambda ep, md: _send(ep, md, payload, timeout_s), hedge=hedge,
+                                 admit=lambda ep, md: throttle.limiter.acquire(md, est_tokens))
+        if key is not None:
+            llm_cache.get_cache().put(key, text)
+        return text
+
+    # cereri identice concurente (ex.: dublu submit) așteaptă același apel în zbor
+    return throttle.singleflight.do(_flight_key(key, prompt), call)
+
+
+def _cache_key(cache_key: dict, use_cache: bool):
+    if cache_key is None or not use_cache or not llm_cache.ENABLED:
+        return None
+    return llm_cache.make_key(model=get_endpoint_and_model()[1], **cache_key)
+
+
+def _flight_key(key, prompt: str) -> str:
+    import hashlib
+    return key or hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def llm_stats() -> dict:
+    """Contoare pentru cache, coalescing, coada locală și sănătatea modelelor."""
+    return {
+        "cache": llm_cache.get_cache().stats(),
+        "library": recipe_library.get_library().stats(),
+        "singleflight": throttle.singleflight.stats(),
+        "limiter": throttle.limiter.stats(),
+        "router": _router.snapshot() if _router else {},
+    }
+
+
+def _recipes_fingerprint(user_recipes) -> str:
+    # hash stabil al rețetelor utilizatorului (nume + ingrediente canonice), independent de ordine
+    import hashlib
+    import json
+    canon = sorted(
+        [fold(r.get('name', '')), canonical_ingredients(r.get('ingredients', []))]
+        for r in (user_recipes or [])
+    )
+    return hashlib.sha256(json.dumps(canon, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
 
 def _current_func_name() -> str:
     # mic utilitar pentru mesaje de eroare
@@ -154,11 +315,53 @@ def _current_func_name() -> str:
 # ------------------------------------------------------------
 # 🔹 Funcția principală de generare rețete (moștenită)
 # ------------------------------------------------------------
-def generate_recipes(ingredients):
+def generate_recipes(ingredients, use_cache: bool = True):
     """
     Generează rețete creative folosind Gemini 2.5 / Flash.
-    Dacă modelul principal e supraîncărcat (503), reîncearcă automat.
+    Dacă modelul principal e supraîncărcat (503), routerul trece pe alt model.
+    În modul structurat (RECIPES_STRUCTURED=1, implicit oprit), Markdown-ul e randat local din
+    rețetele validate, iar cele deja generate pentru ce e în frigider vin din biblioteca comună.
+    """
+    if recipe_library.ENABLED:
+        try:
+            return recipe_library.to_markdown(generate_recipes_structured(ingredients, use_cache=use_cache))
+        except recipe_library.InvalidRecipe as e:
+            print(f"⚠️ Răspuns structurat invalid, revin la Markdown: {e}")
+    prompt, cache_key = _recipes_prompt(ingredients)
+    return _generate_with_retries(prompt, timeout_s=30, cache_key=cache_key, use_cache=use_cache)
+
+
+def generate_recipes_structured(ingredients, k: int = recipe_library.RECIPES_PER_REQUEST, use_cache: bool = True):
+    """
+    Rețete ca obiecte validate (titlu, timp, dificultate, ingrediente cu cantități, pași).
+    Dacă biblioteca comună are deja `k` rețete care se pot găti din aceste ingrediente
+    (vezi RecipeLibrary.lookup), nu se mai apelează modelul.
     """
+    library = recipe_library.get_library()
+    if use_cache:
+        found = library.lookup(ingredients, k)
+        if found:
+            return found
+    text = _generate_with_retries(_structured_recipes_prompt(ingredients, k), timeout_s=30,
+                                  generation_config=recipe_library.generation_config())
+    recipes = recipe_library.validate(text)
+    library.store(ingredients, recipes, model=get_endpoint_and_model()[1])
+    return recipes
+
+
+def _structured_recipes_prompt(ingredients, k: int = recipe_library.RECIPES_PER_REQUEST) -> str:
+    # formatul vine din responseSchema; promptul cere doar conținutul
+    return f"""
+    Ești ChefGPT, un asistent culinar inteligent.
+    Având următoarele ingrediente: {', '.join(ingredients)},
+    creează {k} rețete creative, în limba română.
+    Folosește doar aceste ingrediente, plus {', '.join(recipe_library.PANTRY)}.
+    Pentru fiecare: titlu, o descriere de o propoziție, timp total în minute, dificultate,
+    calorii per porție, ingredientele cu cantități, pașii de preparare și o sugestie de servire.
+    """
+
+
+def _recipes_prompt(ingredients):
     prompt = f"""
     Ești ChefGPT, un asistent culinar inteligent.
     Având următoarele ingrediente: {', '.join(ingredients)},
@@ -171,52 +374,23 @@ def generate_recipes(ingredients):
     Răspunde în limba română, frumos formatat în Markdown.
     """
 
-    url = f"https://generativelanguage.googleapis.com/{ENDPOINT}/models/{MODEL}:generateContent?key={API_KEY}"
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    headers = {"Content-Type": "application/json"}
-
-    # 🔁 Reîncercare automată de 3 ori, cu fallback la model mai mic
-    attempts = 0
-    max_attempts = 3
-    fallback_model = "gemini-2.0-flash"
-
-    while attempts < max_attempts:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        data = response.json()
-
-        # ✅ Succes
-        if response.status_code == 200:
-            try:
-                return data["candidates"][0]["content"]["parts"][0]["text"]
-            except KeyError:
-                raise Exception(f"⚠️ Format neașteptat al răspunsului API: {data}")
-
-        # ⚠️ Model supraîncărcat
-        elif response.status_code == 503:
-            attempts += 1
-            print(f"⚠️ Modelul {MODEL} este supraîncărcat ({attempts}/{max_attempts})... reîncerc în 5 secunde.")
-            import time
-            time.sleep(5)
-            if attempts == max_attempts:
-                print("⏳ Trec pe modelul de rezervă:", fallback_model)
-                url = f"https://generativelanguage.googleapis.com/{ENDPOINT}/models/{fallback_model}:generateContent?key={API_KEY}"
-                continue
-
-        # ❌ Altă eroare API
-        else:
-            raise Exception(f"API error generate_recipes: {response.status_code} - {response.text}")
-
-    raise Exception("❌ Toate încercările au eșuat. Încearcă mai târziu.")
+    cache_key = {"fn": "generate_recipes", "ingredients": canonical_ingredients(ingredients)}
+    return prompt, cache_key
 
 # ------------------------------------------------------------
 # 🔹 Funcție nouă: idei adaptate cu frigider + rețete din DB + masa vizată
 # ------------------------------------------------------------
-def generate_meal_suggestions(ingredients, user_recipes=None, meal_hint=None):
+def generate_meal_suggestions(ingredients, user_recipes=None, meal_hint=None, use_cache: bool = True):
     """
     Generează sugestii/meniuri folosind atât ingredientele din frigider, cât și rețetele utilizatorului (DB),
     având opțional o masă vizată (mic dejun / prânz / cină / snack).
     Prompt extins pentru a obține rezultate cât mai generative și utile.
     """
+    prompt, cache_key = _meal_suggestions_prompt(ingredients, user_recipes, meal_hint)
+    return _generate_with_retries(prompt, cache_key=cache_key, use_cache=use_cache)
+
+
+def _meal_suggestions_prompt(ingredients, user_recipes=None, meal_hint=None):
     user_recipes = user_recipes or []
     short_recipes = []
     for r in user_recipes:
@@ -246,18 +420,46 @@ def generate_meal_suggestions(ingredients, user_recipes=None, meal_hint=None):
     4) Încheie întrebând: „Alege o rețetă (1–3) ca să-ți dau cantitățile exacte și pașii detaliați.”
     """
 
-    return _generate_with_retries(prompt)
+    cache_key = {
+        "fn": "generate_meal_suggestions",
+        "ingredients": canonical_ingredients(ingredients),
+        "meal": fold(meal_hint),
+        "recipes": _recipes_fingerprint(user_recipes),
+    }
+    return prompt, cache_key
 
 # ------------------------------------------------------------
 # 🔹 Fără inventar: rețete/idei creative direct din întrebare
 # ------------------------------------------------------------
-def generate_creative_recipes(user_query: str, k: int = 2):
+def generate_creative_recipes(user_query: str, k: int = 2, use_cache: bool = True, history: dict = None):
     """
     Generează idei/retete plecând DOAR de la cererea utilizatorului, fără a apela inventarul.
+    `history` (din chat_store) permite follow-up-uri de tipul „alege rețeta 2”.
     """
+    prompt, cache_key = _creative_recipes_prompt(user_query, k, history)
+    return _generate_with_retries(prompt, cache_key=cache_key, use_cache=use_cache)
+
+
+def _history_block(history: dict) -> str:
+    """Contextul conversației (rezumat + ultimele replici), deja limitat la bugetul de tokeni."""
+    if not history or not (history.get("summary") or history.get("turns")):
+        return ""
+    lines = ["Contextul conversației de până acum (folosește-l pentru referiri ca „rețeta 2”, „mai simplu”):"]
+    if history.get("summary"):
+        lines.append(f"Rezumat: {history['summary']}")
+    for turn in history.get("turns", []):
+        who = "Utilizator" if turn["role"] == "user" else "Asistent"
+        lines.append(f"{who}: {turn['text']}")
+    return "\n".join(lines)
+
+
+def _creative_recipes_prompt(user_query: str, k: int = 2, history: dict = None):
+    context = _history_block(history)
     prompt = f"""
     {BASE_SYSTEM_INSTRUCTION}
 
+    {context}
+
     Cerere utilizator: "{user_query}"
 
     Oferă {k} rețete/idei relevante. Pentru fiecare:
@@ -268,26 +470,155 @@ def generate_creative_recipes(user_query: str, k: int = 2):
     - Variații/înlocuiri dacă e util
     """
 
-    return _generate_with_retries(prompt)
+    # cu istoric, răspunsul depinde de conversație: nu îl punem în cache
+    cache_key = None if context else {"fn": "generate_creative_recipes", "query": fold(user_query).rstrip("?!. "), "k": k}
+    return prompt, cache_key
 
 # ------------------------------------------------------------
 # 🔹 Chat-only generic text (Gemini prompt minimalist)
 # ------------------------------------------------------------
-def generate_chat_reply(message):
+def generate_chat_reply(message, history: dict = None):
     """
     Companion chat: răspunde liber la orice subiect. Dacă utilizatorul aduce mâncarea în discuție,
     oferă idei, dar nu forța subiectul. Ton cald, empatic, scurt, cu eventuală întrebare de follow-up.
     """
+    prompt, _ = _chat_prompt(message, history)
+    return _generate_with_retries(prompt)
+
+
+def _chat_prompt(message, history: dict = None):
     prompt = f"""
     {BASE_SYSTEM_INSTRUCTION}
 
+    {_history_block(history)}
+
     Conversație liberă. Răspunde la mesajul de mai jos ca un companion AI:
 
     „{message}”
 
     Stil: răspuns scurt-mediu, în română, o întrebare de follow-up când are sens. Nu forța subiectul culinar.
     """
-    return _generate_with_retries(prompt)
+    return prompt, None
+
+
+# ------------------------------------------------------------
+# 🔹 Rezumatul conversațiilor lungi (memoria compactă din chat_store)
+# ------------------------------------------------------------
+def summarize_conversation(summary: str, turns):
+    prompt, _ = _summary_prompt(summary, turns)
+    return _generate_with_retries(prompt).strip()
+
+
+def _summary_prompt(summary: str, turns):
+    transcript = "\n".join(f"{'Utilizator' if t['role'] == 'user' else 'Asistent'}: {t['text']}" for t in turns)
+    prompt = f"""
+    Actualizează memoria unei conversații dintre un utilizator și un asistent culinar.
+
+    Memoria de până acum: {summary or "(goală)"}
+
+    Replici noi:
+    {transcript}
+
+    Scrie memoria actualizată în română, maxim 120 de cuvinte: preferințele și restricțiile
+    utilizatorului, ce rețete i s-au propus (cu numerotarea lor) și ce a ales. Fără introducere.
+    """
+    return prompt, None
+
+
+# ------------------------------------------------------------
+# 🔹 Streaming (streamGenerateContent, SSE): textul sosește pe bucăți
+# ------------------------------------------------------------
+_PROMPT_BUILDERS = {
+    "generate_recipes": _recipes_prompt,
+    "generate_meal_suggestions": _meal_suggestions_prompt,
+    "generate_creative_recipes": _creative_recipes_prompt,
+    "generate_chat_reply": _chat_prompt,
+}
+
+
+def stream_generate(fn: str, *args, use_cache: bool = True, timeout_s: int = 30, **kwargs):
+    """
+    Generator cu aceeași semantică precum `fn` (ex.: "generate_meal_suggestions"),
+    dar care produce textul bucată cu bucată. Un răspuns din cache e livrat dintr-o dată.
+    """
+    prompt, cache_key = _PROMPT_BUILDERS[fn](*args, **kwargs)
+    yield from _stream_with_retries(prompt, timeout_s=timeout_s, cache_key=cache_key, use_cache=use_cache)
+
+
+def _iter_sse_text(resp, model_name: str = None):
+    import json
+    # SSE e mereu UTF-8, dar Content-Type vine fără charset: requests ar decoda ca ISO-8859-1
+    resp.encoding = "utf-8"
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = json.loads(line[5:].strip())
+        if model_name:
+            metrics.record_usage(model_name, data)   # usageMetadata vine în ultimul chunk
+        for cand in data.get("candidates", [])[:1]:
+            for part in cand.get("content", {}).get("parts", []):
+                if part.get("text"):
+                    yield part["text"]
+
+
+def _stream_with_retries(prompt: str, timeout_s: int = 30, cache_key: dict = None, use_cache: bool = True):
+    import time
+    key = _cache_key(cache_key, use_cache)
+    if key is not None:
+        cached = llm_cache.get_cache().get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    router = get_router()
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    est_tokens = throttle.estimate_tokens(prompt)
+    last = None
+    # Fallback pe alt model e posibil doar până la primul chunk trimis clientului
+    for endpoint, model_name in router.ranked():
+        try:
+            trial = router.claim_trial((endpoint, model_name))
+        except NotSent as e:
+            last = e   # alt apel face deja proba pe modelul ăsta
+            continue
+        try:
+            try:
+                throttle.limiter.acquire(model_name, est_tokens)
+                t0 = time.perf_counter()   # după coada locală: doar latența modelului
+                resp = gemini_client.post(endpoint, model_name, payload, read_timeout=timeout_s,
+                                          method="streamGenerateContent", params={"alt": "sse"}, stream=True)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                last = RetryableError(f"{endpoint}/{model_name}: {type(e).__name__} {e}")
+                router.record_failure((endpoint, model_name))
+                metrics.LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - t0, model_name, "retryable")
+                metrics.LLM_FALLBACKS.inc(1, model_name)
+                continue
+            except throttle.RateLimited as e:
+                last = e   # limită locală: modelul nu a văzut cererea, nu e un eșec al lui
+                continue
+            with resp:
+                if resp.status_code in (429, 503):
+                    last = RetryableError(f"{endpoint}/{model_name} status {resp.status_code}", resp.status_code)
+                    router.record_failure((endpoint, model_name))
+                    metrics.LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - t0, model_name, "retryable")
+                    metrics.LLM_FALLBACKS.inc(1, model_name)
+                    continue
+                if resp.status_code != 200:
+                    raise Exception(f"API error stream: {resp.status_code} - {resp.text}")
+                parts = []
+                for chunk in _iter_sse_text(resp, model_name):
+                    parts.append(chunk)
+                    yield chunk
+            router.record_success((endpoint, model_name), time.perf_counter() - t0)
+            metrics.LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - t0, model_name, "ok")
+        finally:
+            # și dacă clientul închide stream-ul la jumătate
+            if trial:
+                router.end_trial((endpoint, model_name))
+        if key is not None and parts:
+            llm_cache.get_cache().put(key, "".join(parts))
+        return
+    raise Exception(f"Toate modelele sunt ocupate momentan (429/503). Încearcă din nou mai târziu. ({last})")
 
 
 # ------------------------------------------------------------
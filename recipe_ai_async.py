@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+import httpx
+
+import gemini_client
+import llm_cache
+import metrics
+import recipe_library
+import throttle
+from model_router import RetryableError
+from recipe_ai import (
+    _cache_key,
+    _chat_prompt,
+    _creative_recipes_prompt,
+    _extract_text,
+    _flight_key,
+    _meal_suggestions_prompt,
+    _recipes_prompt,
+    _structured_recipes_prompt,
+    get_endpoint_and_model,
+    get_router,
+)
+
+# ------------------------------------------------------------
+# 🔹 Client Gemini asyncio, cu aceeași interfață ca recipe_ai
+#    (același router, cache, limiter; I/O neblocant prin httpx)
+# ------------------------------------------------------------
+_io_loop = None
+_io_loop_lock = threading.Lock()
+
+
+def get_io_loop() -> asyncio.AbstractEventLoop:
+    """
+    Un singur event loop de fundal pentru tot I/O-ul către Gemini. Flask rulează
+    fiecare view `async` în propriul loop efemer; trimițând corutinele aici,
+    pool-ul httpx și coalescing-ul sunt comune tuturor cererilor procesului.
+    """
+    global _io_loop
+    if _io_loop is None:
+        with _io_loop_lock:
+            if _io_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="gemini-aio", daemon=True).start()
+                _io_loop = loop
+    return _io_loop
+
+
+async def _on_io_loop(coro):
+    loop = get_io_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def _send(endpoint: str, model_name: str, payload: dict, timeout_s: float) -> str:
+    try:
+        resp = await gemini_client.apost(endpoint, model_name, payload, read_timeout=timeout_s)
+    except (httpx.TimeoutException, httpx.TransportError) as e:
+        raise RetryableError(f"{endpoint}/{model_name}: {type(e).__name__} {e}")
+    return _extract_text(endpoint, model_name, resp.status_code, resp.json, resp.text)
+
+
+async def _generate(prompt: str, timeout_s: int = 30, hedge: bool = None,
+                    cache_key: dict = None, use_cache: bool = True, generation_config: dict = None) -> str:
+    key = _cache_key(cache_key, use_cache)
+    if key is not None:
+        # nivelul SQLite poate atinge discul: nu blocăm event loop-ul
+        cached = await asyncio.to_thread(llm_cache.get_cache().get, key)
+        if cached is not None:
+            return cached
+
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+    est_tokens = throttle.estimate_tokens(prompt)
+    router = await asyncio.to_thread(get_router)  # prima apelare poate face selecția modelului
+
+    async def call():
+        text = await router.acall(lambda ep, md: _send(ep, md, payload, timeout_s), hedge=hedge,
+                                  admit=lambda ep, md: throttle.limiter.aacquire(md, est_tokens))
+        if key is not None:
+            await asyncio.to_thread(llm_cache.get_cache().put, key, text)
+        return text
+
+    return await throttle.async_singleflight.do(_flight_key(key, prompt), call)
+
+
+async def _generate_with_retries(prompt: str, **kwargs) -> str:
+    with metrics.span("llm"):
+        return await _on_io_loop(_generate(prompt, **kwargs))
+
+
+# ------------------------------------------------------------
+# 🔹 Interfața publică (oglinda funcțiilor sincrone din recipe_ai)
+# ------------------------------------------------------------
+async def generate_recipes(ingredients, use_cache: bool = True):
+    if recipe_library.ENABLED:
+        try:
+            return recipe_library.to_markdown(await generate_recipes_structured(ingredients, use_cache=use_cache))
+        except recipe_library.InvalidRecipe as e:
+            print(f"⚠️ Răspuns structurat invalid, revin la Markdown: {e}")
+    prompt, cache_key = _recipes_prompt(ingredients)
+    return await _generate_with_retries(prompt, timeout_s=30, cache_key=cache_key, use_cache=use_cache)
+
+
+async def generate_recipes_structured(ingredients, k: int = recipe_library.RECIPES_PER_REQUEST, use_cache: bool = True):
+    library = recipe_library.get_library()
+    if use_cache:
+        # biblioteca e în SQLite: nu blocăm event loop-ul
+        found = await asyncio.to_thread(library.lookup, ingredients, k)
+        if found:
+            return found
+    text = await _generate_with_retries(_structured_recipes_prompt(ingredients, k), timeout_s=30,
+                                        generation_config=recipe_library.generation_config())
+    recipes = recipe_library.validate(text)
+    model = (await asyncio.to_thread(get_endpoint_and_model))[1]
+    await asyncio.to_thread(library.store, ingredients, recipes, model)
+    return recipes
+
+
+async def generate_meal_suggestions(ingredients, user_recipes=None, meal_hint=None, use_cache: bool = True):
+    prompt, cache_key = _meal_suggestions_prompt(ingredients, user_recipes, meal_hint)
+    return await _generate_with_retries(prompt, cache_key=cache_key, use_cache=use_cache)
+
+
+async def generate_creative_recipes(user_query: str, k: int = 2, use_cache: bool = True, history: dict = None):
+    prompt, cache_key = _creative_recipes_prompt(user_query, k, history)
+    return await _generate_with_retries(prompt, cache_key=cache_key, use_cache=use_cache)
+
+
+async def generate_chat_reply(message, history: dict = None):
+    prompt, _ = _chat_prompt(message, history)
+    return await _generate_with_retries(prompt)
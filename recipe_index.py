@@ -0,0 +1,167 @@
+import heapq
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+
+from text_norm import canonical_ingredient
+
+# ------------------------------------------------------------
+# 🔹 Configurare selecție rețete pentru prompt (override din .env)
+# ------------------------------------------------------------
+TOKEN_BUDGET = int(os.getenv("PROMPT_RECIPES_TOKEN_BUDGET", "600"))
+TOP_K = int(os.getenv("PROMPT_RECIPES_TOP_K", "8"))
+COOK_NOW_MAX_MISSING = int(os.getenv("COOK_NOW_MAX_MISSING", "2"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def recipe_line(recipe) -> str:
+    """Linia scurtă din prompt pentru o rețetă (aceeași formă ca în generate_meal_suggestions)."""
+    return f"- {recipe.get('name', 'Rețetă')}: {', '.join(str(x) for x in recipe.get('ingredients', []))}"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+# ------------------------------------------------------------
+# 🔹 Index inversat ingredient -> rețete, per utilizator
+# ------------------------------------------------------------
+class RecipeIndex:
+    """
+    Index inversat de la ingredientul canonic la id-urile rețetelor.
+    Scorul unei rețete față de frigider e BM25 cu tf binar: ingredientele rare
+    (idf mare) contează mai mult, iar rețetele foarte lungi sunt ușor penalizate.
+
+    Fiecare rețetă are și un bitset (int) peste vocabularul de ingrediente, folosit
+    de `match` ca să afle instant ce ingrediente are / îi lipsesc utilizatorului.
+    """
+
+    def __init__(self, recipes=()):
+        self.postings = defaultdict(set)   # ingredient -> {recipe_id}
+        self.docs = {}                     # recipe_id -> (recipe, frozenset(ingrediente))
+        self.masks = {}                    # recipe_id -> bitset peste vocabular
+        self.sizes = {}                    # recipe_id -> nr. ingrediente distincte
+        self.display = {}                  # recipe_id -> {ingredient canonic: text original}
+        self.vocab = {}                    # ingredient canonic -> poziția bitului
+        self.terms = []                    # poziția bitului -> ingredient canonic
+        self._total_len = 0
+        self._lock = threading.Lock()
+        for r in recipes:
+            self.upsert(r)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _bit(self, term: str) -> int:
+        if term not in self.vocab:
+            self.vocab[term] = len(self.terms)
+            self.terms.append(term)
+        return self.vocab[term]
+
+    def upsert(self, recipe):
+        display = {}
+        for x in recipe.get('ingredients', []):
+            key = canonical_ingredient(x)
+            if key:
+                display.setdefault(key, str(x).strip())
+        terms = frozenset(display)
+        with self._lock:
+            self._remove(recipe['id'])
+            self.docs[recipe['id']] = (recipe, terms)
+            self.display[recipe['id']] = display
+            self.masks[recipe['id']] = sum(1 << self._bit(t) for t in terms)
+            self.sizes[recipe['id']] = len(terms)
+            self._total_len += len(terms)
+            for t in terms:
+                self.postings[t].add(recipe['id'])
+
+    def remove(self, recipe_id):
+        with self._lock:
+            self._remove(recipe_id)
+
+    def _remove(self, recipe_id):
+        old = self.docs.pop(recipe_id, None)
+        if old is None:
+            return
+        self.masks.pop(recipe_id, None)
+        self.sizes.pop(recipe_id, None)
+        self.display.pop(recipe_id, None)
+        self._total_len -= len(old[1])
+        for t in old[1]:
+            ids = self.postings.get(t)
+            if ids is not None:
+                ids.discard(recipe_id)
+                if not ids:
+                    del self.postings[t]
+
+    def search(self, fridge, k: int = TOP_K):
+        """Top-k rețete după suprapunerea cu ingredientele din frigider: [(scor, rețetă)]."""
+        query = {q for q in (canonical_ingredient(x) for x in (fridge or [])) if q}
+        with self._lock:
+            n = len(self.docs)
+            if not n or not query:
+                return []
+            avg_len = self._total_len / n or 1
+            scores = defaultdict(float)
+            for t in query:
+                ids = self.postings.get(t)
+                if not ids:
+                    continue
+                idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+                for rid in ids:
+                    dl = len(self.docs[rid][1])
+                    scores[rid] += idf * (BM25_K1 + 1) / (1 + BM25_K1 * (1 - BM25_B + BM25_B * dl / avg_len))
+            ranked = sorted(scores.items(), key=lambda kv: -kv[1])[:k]
+            return [(score, self.docs[rid][0]) for rid, score in ranked]
+
+    def match(self, fridge, k: int = 10, max_missing: int = COOK_NOW_MAX_MISSING):
+        """
+        „Ce pot găti acum?” fără LLM: rețetele ordonate după câte ingrediente lipsesc,
+        apoi după acoperire. Numărarea trece doar prin listele de postări ale
+        ingredientelor din frigider, deci costul nu depinde de rețetele irelevante;
+        bitset-urile dau apoi direct lista ingredientelor lipsă pentru top-k.
+        """
+        have = {q for q in (canonical_ingredient(x) for x in (fridge or [])) if q}
+        with self._lock:
+            fridge_mask = sum(1 << self.vocab[t] for t in have if t in self.vocab)
+            counts = Counter()
+            for t in have:
+                counts.update(self.postings.get(t, ()))
+            sizes = self.sizes
+            candidates = [
+                (sizes[rid] - n_have, -n_have / sizes[rid], rid)
+                for rid, n_have in counts.items()
+                if sizes[rid] - n_have <= max_missing
+            ]
+            results = []
+            for missing, neg_cov, rid in heapq.nsmallest(k, candidates):
+                mask, names = self.masks[rid], self.display[rid]
+                results.append({
+                    'recipe': self.docs[rid][0],
+                    'coverage': round(-neg_cov, 3),
+                    'have': [names[t] for t in self._bits_to_terms(mask & fridge_mask)],
+                    'missing': [names[t] for t in self._bits_to_terms(mask & ~fridge_mask)],
+                })
+            return results
+
+    def _bits_to_terms(self, mask: int):
+        out = []
+        while mask:
+            low = mask & -mask
+            out.append(self.terms[low.bit_length() - 1])
+            mask ^= low
+        return out
+
+    def select_for_prompt(self, fridge, token_budget: int = TOKEN_BUDGET, k: int = TOP_K):
+        """Cele mai relevante rețete care încap în bugetul de tokeni al promptului."""
+        selected, used = [], 0
+        for _, recipe in self.search(fridge, k):
+            cost = estimate_tokens(recipe_line(recipe))
+            if used + cost > token_budget:
+                break
+            selected.append(recipe)
+            used += cost
+        return selected
+
@@ -0,0 +1,294 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import db
+from text_norm import canonical_ingredient, fold
+
+# ------------------------------------------------------------
+# 🔹 Configurare rețete structurate (override din .env)
+# ------------------------------------------------------------
+ENABLED = os.getenv("RECIPES_STRUCTURED", "0") == "1"        # 1 = rețete JSON + bibliotecă (doar generate_recipes)
+RECIPES_PER_REQUEST = int(os.getenv("RECIPES_PER_REQUEST", "3"))
+MAX_MISSING = int(os.getenv("RECIPES_LIBRARY_MAX_MISSING", "0"))   # ingrediente care pot lipsi din frigider
+DIFFICULTIES = ("ușor", "mediu", "dificil")
+# presupuse în orice bucătărie: promptul le permite, iar la căutare nu contează ca lipsă
+PANTRY = ("sare", "piper", "ulei", "apă", "zahăr")
+
+# Schema trimisă în generationConfig.responseSchema (subsetul OpenAPI acceptat de Gemini)
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "recipes": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "title": {"type": "STRING"},
+                    "description": {"type": "STRING"},
+                    "time_minutes": {"type": "INTEGER"},
+                    "difficulty": {"type": "STRING", "enum": list(DIFFICULTIES)},
+                    "calories": {"type": "INTEGER"},
+                    "ingredients": {
+                        "type": "ARRAY",
+                        "items": {
+                            "type": "OBJECT",
+                            "properties": {
+                                "name": {"type": "STRING"},
+                                "quantity": {"type": "NUMBER"},
+                                "unit": {"type": "STRING"},
+                            },
+                            "required": ["name"],
+                        },
+                    },
+                    "steps": {"type": "ARRAY", "items": {"type": "STRING"}},
+                    "serving": {"type": "STRING"},
+                },
+                "required": ["title", "time_minutes", "difficulty", "ingredients", "steps"],
+                "propertyOrdering": ["title", "description", "time_minutes", "difficulty", "calories",
+                                     "ingredients", "steps", "serving"],
+            },
+        },
+    },
+    "required": ["recipes"],
+}
+
+
+def generation_config() -> dict:
+    return {"responseMimeType": "application/json", "responseSchema": RESPONSE_SCHEMA}
+
+
+def ingredient_set(items) -> set:
+    """Setul canonic: „Ouă”, „3 oua”, „eggs” -> „ou”."""
+    return {c for c in (canonical_ingredient(x) for x in (items or [])) if c}
+
+
+def ingredient_set_key(items) -> str:
+    """Setul din care au fost generate rețetele, sortat (deduplicare la salvare)."""
+    return ",".join(sorted(ingredient_set(items)))
+
+
+def recipe_ingredients(recipe) -> set:
+    return ingredient_set(item.get("name") for item in recipe.get("ingredients") or ())
+
+
+def backfill(conn):
+    """Migrarea 7: ingredientele rețetelor deja salvate în bibliotecă."""
+    rows = []
+    for recipe_id, payload in conn.execute('SELECT id, recipe_json FROM generated_recipes').fetchall():
+        rows.extend((recipe_id, name) for name in recipe_ingredients(json.loads(payload)))
+    conn.executemany('INSERT OR IGNORE INTO generated_recipe_ingredients (recipe_id, name) VALUES (?, ?)', rows)
+
+
+# ------------------------------------------------------------
+# 🔹 Validare: din JSON-ul modelului doar rețete complete, cu tipurile corecte
+# ------------------------------------------------------------
+class InvalidRecipe(ValueError):
+    pass
+
+
+def _text(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _positive_int(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        number = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+
+def _recipe(raw) -> dict:
+    if not isinstance(raw, dict):
+        raise InvalidRecipe("rețeta nu e un obiect")
+    title = _text(raw.get("title"))
+    if not title:
+        raise InvalidRecipe("lipsește titlul")
+    time_minutes = _positive_int(raw.get("time_minutes"))
+    if time_minutes is None:
+        raise InvalidRecipe(f"{title}: timp de preparare invalid")
+    difficulty = next((d for d in DIFFICULTIES if fold(d) == fold(raw.get("difficulty"))), None)
+    if difficulty is None:
+        raise InvalidRecipe(f"{title}: dificultate necunoscută {raw.get('difficulty')!r}")
+    ingredients = []
+    for item in raw.get("ingredients") or ():
+        name = _text(item.get("name")) if isinstance(item, dict) else ""
+        if not name:
+            continue
+        quantity = item.get("quantity")
+        if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or quantity <= 0:
+            quantity = None
+        ingredients.append({"name": name, "quantity": quantity and float(quantity), "unit": _text(item.get("unit"))})
+    steps = [s for s in (_text(s) for s in raw.get("steps") or ()) if s]
+    if not ingredients or not steps:
+        raise InvalidRecipe(f"{title}: fără ingrediente sau fără pași")
+    return {
+        "title": title,
+        "description": _text(raw.get("description")),
+        "time_minutes": time_minutes,
+        "difficulty": difficulty,
+        "calories": _positive_int(raw.get("calories")),
+        "ingredients": ingredients,
+        "steps": steps,
+        "serving": _text(raw.get("serving")),
+    }
+
+
+def validate(payload) -> list:
+    """
+    `payload`: textul JSON întors de model (sau obiectul deja parsat). Rețetele
+    invalide sunt eliminate; dacă nu rămâne niciuna, ridică InvalidRecipe.
+    """
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError as e:
+            raise InvalidRecipe(f"JSON invalid: {e}")
+    raw = payload.get("recipes") if isinstance(payload, dict) else payload
+    if not isinstance(raw, list):
+        raise InvalidRecipe("lipsește lista de rețete")
+    recipes, errors = [], []
+    for item in raw:
+        try:
+            recipes.append(_recipe(item))
+        except InvalidRecipe as e:
+            errors.append(str(e))
+    if not recipes:
+        raise InvalidRecipe("; ".join(errors) or "nicio rețetă")
+    return recipes
+
+
+# ------------------------------------------------------------
+# 🔹 Markdown generat local (modelul nu mai plătește tokeni pe formatare)
+# ------------------------------------------------------------
+def _quantity(item) -> str:
+    q = item["quantity"]
+    if q is None:
+        return item["name"]
+    amount = f"{q:g}"
+    return f"{amount} {item['unit']} {item['name']}" if item["unit"] else f"{amount} {item['name']}"
+
+
+def to_markdown(recipes) -> str:
+    blocks = []
+    for i, r in enumerate(recipes, 1):
+        lines = [f"## {i}. {r['title']}"]
+        if r["description"]:
+            lines += ["", r["description"]]
+        facts = [f"⏱️ {r['time_minutes']} min", f"Dificultate: {r['difficulty']}"]
+        if r["calories"]:
+            facts.append(f"~{r['calories']} kcal")
+        lines += ["", " · ".join(facts), "", "**Ingrediente**"]
+        lines += [f"- {_quantity(item)}" for item in r["ingredients"]]
+        lines += ["", "**Preparare**"]
+        lines += [f"{n}. {step}" for n, step in enumerate(r["steps"], 1)]
+        if r["serving"]:
+            lines += ["", f"**Servire:** {r['serving']}"]
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+# ------------------------------------------------------------
+# 🔹 Biblioteca de rețete generate, comună tuturor utilizatorilor și workerilor
+# ------------------------------------------------------------
+class RecipeLibrary:
+    """
+    Rețetele validate se păstrează în generated_recipes (migrarea 6 din db.py),
+    iar ingredientele lor canonice în generated_recipe_ingredients (migrarea 7).
+    O cerere e servită de aici dacă există cel puțin `k` rețete care se pot găti
+    din frigider (plus PANTRY), cu cel mult MAX_MISSING ingrediente lipsă, oricare
+    ar fi fost setul din care au fost generate. Folosită doar de generate_recipes;
+    sugestiile de masă și rețetele creative merg în continuare la model.
+    Biblioteca e o optimizare: dacă SQLite nu răspunde, se generează ca înainte.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def lookup(self, ingredients, k: int = RECIPES_PER_REQUEST, max_missing: int = MAX_MISSING):
+        """
+        Primele `k` rețete care se pot găti din `ingredients`: întâi cele cu mai
+        puține ingrediente lipsă, apoi cele care folosesc mai mult din frigider.
+        None dacă nu sunt cel puțin `k`.
+        """
+        fridge = sorted(ingredient_set(ingredients))
+        available = sorted(set(fridge) | ingredient_set(PANTRY))
+        in_fridge = ",".join("?" * len(fridge))
+        in_available = ",".join("?" * len(available))
+        try:
+            # candidatele au cel puțin un ingredient din frigider (cămara singură nu ajunge)
+            rows = db.fetchall(f'''
+                SELECT r.recipe_json,
+                       COUNT(*) - SUM(i.name IN ({in_available})) AS missing,
+                       SUM(i.name IN ({in_fridge})) AS used
+                FROM generated_recipe_ingredients i JOIN generated_recipes r ON r.id = i.recipe_id
+                WHERE i.recipe_id IN (SELECT recipe_id FROM generated_recipe_ingredients WHERE name IN ({in_fridge}))
+                GROUP BY i.recipe_id
+                HAVING missing <= ?
+                ORDER BY missing, used DESC, r.id
+                LIMIT ?''', (*available, *fridge, *fridge, max_missing, k), path=self.db_path) if fridge else []
+        except sqlite3.Error as e:
+            print(f"⚠️ Biblioteca de rețete nu e disponibilă: {e}")
+            rows = []
+        with self._lock:
+            if len(rows) >= k:
+                self.hits += 1
+                return [json.loads(r[0]) for r in rows]
+            self.misses += 1
+        return None
+
+    def store(self, ingredients, recipes, model: str = None):
+        key = ingredient_set_key(ingredients)
+        if not key:
+            return
+        now = time.time()
+        added = 0
+        try:
+            with db.transaction(self.db_path) as conn:
+                for r in recipes:
+                    # același titlu pentru același set (ex.: doi workeri au generat simultan) se păstrează o dată
+                    cur = conn.execute('INSERT OR IGNORE INTO generated_recipes (ingredient_key, title, recipe_json, '
+                                       'model, created_at) VALUES (?, ?, ?, ?, ?)',
+                                       (key, r["title"], json.dumps(r, ensure_ascii=False), model, now))
+                    if cur.rowcount != 1:
+                        continue
+                    conn.executemany('INSERT INTO generated_recipe_ingredients (recipe_id, name) VALUES (?, ?)',
+                                     [(cur.lastrowid, name) for name in recipe_ingredients(r)])
+                    added += 1
+        except sqlite3.Error as e:
+            print(f"⚠️ Nu am putut salva rețetele în bibliotecă: {e}")
+            return
+        with self._lock:
+            self.stored += added
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stored": self.stored,
+            }
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_library() -> RecipeLibrary:
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = RecipeLibrary()
+    return _library
@@ -0,0 +1,94 @@
+import json
+
+import db
+from text_norm import canonical_ingredient, parse_ingredient
+
+# ------------------------------------------------------------
+# 🔹 Ingredientele rețetelor, normalizate în tabela recipe_ingredients
+#    Fiecare element din formular are un rând, cu textul original; cele fără un
+#    ingredient recunoscut au canonical_name gol și nu intră în potriviri.
+#    (ingredients_json rămâne scris pentru compatibilitate, dar nu mai e citit)
+# ------------------------------------------------------------
+def split_ingredients(ingred):
+    if isinstance(ingred, str):
+        # handle plain text ingredients lists
+        return [p.strip() for p in ingred.split(',') if p.strip()]
+    return ingred or []
+
+
+def ingredient_rows(user_id, recipe_id, ingredients):
+    """Rândurile recipe_ingredients pentru o rețetă: (recipe_id, user_id, position, name, canonic, qty, unit)."""
+    rows = []
+    for pos, text in enumerate(split_ingredients(ingredients)):
+        qty, unit, canonical = parse_ingredient(text)
+        rows.append((recipe_id, user_id, pos, str(text).strip(), canonical or '', qty, unit))
+    return rows
+
+
+def save_ingredients(conn, user_id, recipe_id, ingredients):
+    """Înlocuiește ingredientele rețetei; se apelează în aceeași tranzacție cu INSERT/UPDATE pe recipes."""
+    conn.execute('DELETE FROM recipe_ingredients WHERE recipe_id=?', (recipe_id,))
+    conn.executemany('INSERT INTO recipe_ingredients (recipe_id, user_id, position, name, canonical_name, qty, unit) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', ingredient_rows(user_id, recipe_id, ingredients))
+
+
+def delete_ingredients(conn, recipe_id):
+    conn.execute('DELETE FROM recipe_ingredients WHERE recipe_id=?', (recipe_id,))
+
+
+def backfill(conn):
+    """Reface recipe_ingredients din blob-urile ingredients_json existente (migrările 3 și 9)."""
+    conn.execute('DELETE FROM recipe_ingredients')
+    rows = []
+    for rec_id, user_id, blob in conn.execute('SELECT id, user_id, ingredients_json FROM recipes').fetchall():
+        try:
+            ingred = json.loads(blob) if blob else []
+        except ValueError:
+            ingred = blob   # text salvat direct, nu JSON
+        rows.extend(ingredient_rows(user_id, rec_id, ingred))
+    conn.executemany('INSERT INTO recipe_ingredients (recipe_id, user_id, position, name, canonical_name, qty, unit) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+# ------------------------------------------------------------
+# 🔹 Citiri (fără json.loads / split per rând)
+# ------------------------------------------------------------
+def load_recipes(conn, user_id):
+    """Rețetele utilizatorului, cele mai noi primele, cu ingredientele ca listă (două interogări)."""
+    recipes = {}
+    for rec_id, name, description, instructions in conn.execute(
+            'SELECT id, name, description, instructions FROM recipes WHERE user_id=? ORDER BY created_at DESC',
+            (user_id,)):
+        recipes[rec_id] = {'id': rec_id, 'name': name, 'description': description,
+                           'instructions': instructions, 'ingredients': []}
+    for rec_id, name in conn.execute('SELECT recipe_id, name FROM recipe_ingredients WHERE user_id=? '
+                                     'ORDER BY recipe_id, position', (user_id,)):
+        if rec_id in recipes:
+            recipes[rec_id]['ingredients'].append(name)
+    return list(recipes.values())
+
+
+def load_recipe(conn, user_id, recipe_id):
+    """O singură rețetă, în forma din load_recipes (None dacă nu există sau e a altui utilizator)."""
+    row = conn.execute('SELECT id, name, description, instructions FROM recipes WHERE id=? AND user_id=?',
+                       (recipe_id, user_id)).fetchone()
+    if row is None:
+        return None
+    ingredients = [r[0] for r in conn.execute('SELECT name FROM recipe_ingredients WHERE recipe_id=? ORDER BY position',
+                                              (recipe_id,))]
+    return {'id': row[0], 'name': row[1], 'description': row[2], 'instructions': row[3], 'ingredients': ingredients}
+
+
+def find_recipes_by_ingredients(user_id, ingredients, limit: int = 10, path: str = None):
+    """Rețetele utilizatorului care conțin ingredientele date: [(id, nume, potriviri, total)]."""
+    names = sorted({n for n in (canonical_ingredient(x) for x in ingredients) if n})
+    if not names:
+        return []
+    marks = ','.join('?' * len(names))
+    return db.fetchall(f'''SELECT r.id, r.name, COUNT(*) AS hits,
+                                  (SELECT COUNT(*) FROM recipe_ingredients
+                                   WHERE recipe_id=r.id AND canonical_name != '') AS total
+                           FROM recipe_ingredients ri JOIN recipes r ON r.id = ri.recipe_id
+                           WHERE ri.user_id=? AND ri.canonical_name IN ({marks})
+                           GROUP BY r.id ORDER BY hits DESC, total ASC LIMIT ?''',
+                       (user_id, *names, limit), path=path)
@@ -0,0 +1,121 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# ------------------------------------------------------------
+# 🔹 Normalizare text românesc (diacritice, majuscule, spații)
+# ------------------------------------------------------------
+_WS = re.compile(r"\s+")
+
+
+def fold(text) -> str:
+    """
+    Litere mici, fără diacritice, spații comprimate.
+    NFKD separă atât „ș/ț” (virgulă dedesubt) cât și „ş/ţ” (sedilă) în literă + semn
+    combinat, deci ambele variante ajung la „s/t”.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(text or "").lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _WS.sub(" ", stripped).strip()
+
+
+def canonical_ingredients(items) -> list:
+    """Set de ingrediente independent de ordine, majuscule și diacritice (listă sortată)."""
+    return sorted({f for f in (fold(x) for x in (items or [])) if f})
+
+
+# Cantități și unități de la începutul unui ingredient: „200 g de făină”, „2 linguri ulei”
+_QUANTITY = re.compile(
+    r"^\s*([\d.,/⁄]+)\s*"  # fold() face din „½” -> „1⁄2”
+    r"(kg|g|gr|mg|ml|l|buc|bucati|bucata|lingura|linguri|lingurita|lingurite|cana|cani|pahar|pahare|"
+    r"catel|catei|felie|felii|plic|plicuri|legatura|varf|praf)?\.?\s+(de\s+)?"
+)
+_PARENS = re.compile(r"\([^)]*\)")
+_PUNCT = re.compile(r"[^\w\s-]")
+
+
+def ingredient_key(text) -> str:
+    """Cheia unui ingredient pentru indexare: fără cantitate, unitate, paranteze sau punctuație."""
+    key = _PARENS.sub(" ", fold(text))
+    key = _QUANTITY.sub("", key)
+    key = _PUNCT.sub(" ", key)
+    return _WS.sub(" ", key).strip()
+
+
+# Forme echivalente -> forma canonică (plural, articulat, fără diacritice, etichete YOLO în engleză)
+_SYNONYMS = {
+    "ou": ["oua", "ouale", "oul", "ou de gaina", "oua de gaina", "egg", "eggs"],
+    "cartof": ["cartofi", "cartofii", "cartoful", "potato", "potatoes"],
+    "rosie": ["rosii", "rosiile", "rosia", "tomato", "tomatoes"],
+    "ceapa": ["cepe", "ceapa rosie", "onion", "onions"],
+    "usturoi": ["catei de usturoi", "catel de usturoi", "garlic"],
+    "morcov": ["morcovi", "morcovul", "carrot", "carrots"],
+    "ardei": ["ardei gras", "ardeiul", "bell pepper"],
+    "castravete": ["castraveti", "castravetele", "cucumber"],
+    "ciuperca": ["ciuperci", "ciupercile", "champignon", "mushroom", "mushrooms"],
+    "mar": ["mere", "marul", "apple", "apples"],
+    "banana": ["banane", "bananas"],
+    "portocala": ["portocale", "orange", "oranges"],
+    "lamaie": ["lamai", "lamaia", "lemon", "lemons"],
+    "broccoli": ["brocoli"],
+    "lapte": ["laptele", "milk"],
+    "branza": ["branza telemea", "telemea", "cascaval", "cheese"],
+    "unt": ["untul", "butter"],
+    "smantana": ["smantana grasa", "sour cream"],
+    "iaurt": ["iaurturi", "yogurt", "yoghurt"],
+    "faina": ["faina alba", "flour"],
+    "zahar": ["zaharul", "sugar"],
+    "sare": ["salt"],
+    "piper": ["piper negru", "black pepper"],
+    "ulei": ["ulei de floarea soarelui", "uleiul", "oil"],
+    "ulei de masline": ["olive oil"],
+    "orez": ["rice"],
+    "paste": ["spaghete", "penne", "pasta"],
+    "paine": ["paini", "painea", "bread"],
+    "pui": ["carne de pui", "piept de pui", "pulpe de pui", "chicken"],
+    "porc": ["carne de porc", "pork"],
+    "vita": ["carne de vita", "beef"],
+    "carne tocata": ["tocatura", "minced meat"],
+    "sunca": ["ham"],
+    "carnati": ["carnat", "carnatii", "sausage", "hot dog"],
+    "peste": ["fish"],
+    "pizza": [],
+    "sandwich": ["sandvis"],
+    "prajitura": ["prajituri", "tort", "cake"],
+    "gogoasa": ["gogosi", "donut"],
+}
+_CANONICAL = {alias: canon for canon, aliases in _SYNONYMS.items() for alias in [canon, *aliases]}
+
+
+def canonical_ingredient(text) -> str:
+    """
+    Forma canonică a unui ingredient: „Ouă”, „3 oua”, „ou”, „eggs” -> „ou”.
+    Întâi căutăm în tabela de sinonime; altfel încercăm singularul unui plural
+    regulat (-i / -le / -uri) dacă acela e cunoscut.
+    """
+    key = ingredient_key(text)
+    if key in _CANONICAL:
+        return _CANONICAL[key]
+    for suffix, repl in (("uri", ""), ("ile", "ie"), ("le", ""), ("i", "")):
+        if key.endswith(suffix) and key[: -len(suffix)] + repl in _CANONICAL:
+            return _CANONICAL[key[: -len(suffix)] + repl]
+    return key
+
+
+def _parse_number(raw: str):
+    raw = raw.strip(".,").replace("⁄", "/")
+    try:
+        if "/" in raw:
+            num, den = raw.split("/", 1)
+            return float(num) / float(den)
+        return float(raw.replace(",", "."))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+@lru_cache(maxsize=4096)
+def parse_ingredient(text):
+    """„200 g de făină” -> (200.0, "g", "faina"); fără cantitate -> (None, None, canonic)."""
+    m = _QUANTITY.match(_PARENS.sub(" ", fold(text)))
+    qty, unit = (_parse_number(m.group(1)), m.group(2)) if m else (None, None)
+    return qty, unit, canonical_ingredient(text)
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from model_router import NotSent
+
+# ------------------------------------------------------------
+# 🔹 Configurare limite client (override din .env)
+# ------------------------------------------------------------
+DEFAULT_RPM = float(os.getenv("GEMINI_RPM", "60"))          # cereri / minut / model
+DEFAULT_TPM = float(os.getenv("GEMINI_TPM", "1000000"))     # tokeni / minut / model
+# Limite per model, ex.: {"gemini-2.5-flash": [10, 250000]}
+MODEL_LIMITS = json.loads(os.getenv("GEMINI_LIMITS", "{}"))
+MAX_QUEUE_WAIT_S = float(os.getenv("GEMINI_MAX_QUEUE_WAIT", "2"))
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "800"))
+
+
+def estimate_tokens(prompt: str) -> int:
+    # aproximare ieftină: ~4 caractere / token + răspunsul așteptat
+    return len(prompt) // 4 + EXPECTED_OUTPUT_TOKENS
+
+
+class RateLimited(NotSent):
+    """
+    Cererea ar aștepta prea mult la limita locală: încercăm alt model sau renunțăm.
+    Modelul nu a văzut cererea, deci nu contează ca eșec în router.
+    """
+
+
+# ------------------------------------------------------------
+# 🔹 Single-flight: cereri identice concurente împart un singur apel
+# ------------------------------------------------------------
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn):
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._inflight[key] = fut
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+
+class AsyncSingleFlight(SingleFlight):
+    """Varianta pentru asyncio: apelanții concurenți așteaptă același task."""
+
+    async def do(self, key: str, fn):
+        with self._lock:
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._inflight[key] = task
+                task.add_done_callback(lambda _t: self._forget(key, _t))
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        # shield: anularea unui apelant nu anulează apelul comun
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+
+# ------------------------------------------------------------
+# 🔹 Token bucket: cereri/minut și tokeni/minut per model
+# ------------------------------------------------------------
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Rezervă `amount` (soldul poate deveni negativ) și întoarce cât trebuie așteptat."""
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class ModelLimiter:
+    """
+    Pune cererile la coadă (așteptare <= MAX_QUEUE_WAIT_S) înainte ca API-ul să
+    înceapă să răspundă 429; peste prag, cererea e refuzată local (RateLimited).
+    """
+
+    def __init__(self, max_wait_s: float = MAX_QUEUE_WAIT_S):
+        self.max_wait_s = max_wait_s
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def _buckets_for(self, model: str):
+        if model not in self._buckets:
+            rpm, tpm = MODEL_LIMITS.get(model, (DEFAULT_RPM, DEFAULT_TPM))
+            self._buckets[model] = (TokenBucket(rpm), TokenBucket(tpm))
+        return self._buckets[model]
+
+    def acquire(self, model: str, tokens: int) -> float:
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, model: str, tokens: int) -> float:
+        wait = self.reserve(model, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """Rezervă locul în coadă și întoarce cât trebuie așteptat (fără să aștepte)."""
+        with self._lock:
+            requests_b, tokens_b = self._buckets_for(model)
+            now = time.monotonic()
+            wait = max(requests_b.reserve(1, now), tokens_b.reserve(tokens, now))
+            if wait > self.max_wait_s:
+                requests_b.refund(1)
+                tokens_b.refund(tokens)
+                self.shed += 1
+                raise RateLimited(f"{model}: limită locală atinsă (așteptare estimată {wait:.1f}s)", 429)
+            self.admitted += 1
+            if wait > 0:
+                self.queued += 1
+                self.wait_total_s += wait
+                self.wait_max_s = max(self.wait_max_s, wait)
+        return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "shed": self.shed,
+                "queue_wait_total_s": round(self.wait_total_s, 3),
+                "queue_wait_avg_s": round(self.wait_total_s / self.queued, 3) if self.queued else 0.0,
+                "queue_wait_max_s": round(self.wait_max_s, 3),
+            }
+
+
+singleflight = SingleFlight()
+async_singleflight = AsyncSingleFlight()
+limiter = ModelLimiter()
@@ -0,0 +1,226 @@
+import os
+import threading
+from collections import OrderedDict
+
+import db
+import recipe_store
+from recipe_index import RecipeIndex
+
+# ------------------------------------------------------------
+# 🔹 Configurare cache de snapshot-uri per utilizator (override din .env)
+# ------------------------------------------------------------
+MAX_USERS = int(os.getenv("SNAPSHOT_CACHE_USERS", "1000"))   # câți utilizatori țin snapshot-ul în memorie
+
+
+def touch(conn, user_id, fridge: bool = False, recipes: bool = False):
+    """
+    Marchează frigiderul și/sau rețetele utilizatorului ca modificate și întoarce
+    versiunile noi (fridge_version, recipes_version). Se apelează în aceeași
+    tranzacție cu scrierea, deci orice proces care citește versiunea nouă vede și
+    datele noi; o schimbare în frigider nu invalidează rețetele și invers.
+    """
+    return conn.execute('INSERT INTO user_versions (user_id, fridge_version, recipes_version) VALUES (?, ?, ?) '
+                        'ON CONFLICT(user_id) DO UPDATE SET fridge_version = fridge_version + excluded.fridge_version, '
+                        'recipes_version = recipes_version + excluded.recipes_version '
+                        'RETURNING fridge_version, recipes_version',
+                        (user_id, int(fridge), int(recipes))).fetchone()
+
+
+# ------------------------------------------------------------
+# 🔹 Snapshot: frigiderul și rețetele parsate + structuri derivate, calculate o dată
+# ------------------------------------------------------------
+class _Derived:
+    def __init__(self):
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derived(self, name, factory):
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = factory()
+            return self._derived[name]
+
+
+class RecipeSet(_Derived):
+    """
+    Rețetele unui utilizator la o versiune, cu tot ce se calculează din ele (index,
+    agent, forma pentru pagini). Trece neschimbat de la un snapshot la altul cât
+    timp se schimbă doar frigiderul.
+    """
+
+    def __init__(self, version, recipes):
+        super().__init__()
+        self.version = version
+        self.recipes = recipes    # cele mai noi primele; ingredientele ca listă
+
+    @property
+    def index(self) -> RecipeIndex:
+        return self.derived('index', lambda: RecipeIndex(self.recipes))
+
+    @property
+    def page_recipes(self):
+        """Rețetele în forma din /fridge și /my_recipes (ingredientele ca text)."""
+        return self.derived('page_recipes', lambda: [dict(r, ingredients=', '.join(r['ingredients']))
+                                                     for r in self.recipes])
+
+    def changed(self, version, recipe=None, removed_id=None):
+        """
+        Setul de la `version` după o singură scriere: `recipe` adăugată/editată sau
+        `removed_id` ștearsă. Indexul deja construit e actualizat pe loc (upsert/remove),
+        nu refăcut; structurile mai ieftine se recalculează la nevoie.
+        """
+        if recipe is not None:
+            ids = [r['id'] for r in self.recipes]
+            if recipe['id'] in ids:
+                recipes = [recipe if r['id'] == recipe['id'] else r for r in self.recipes]
+            else:
+                recipes = [recipe] + self.recipes
+        else:
+            recipes = [r for r in self.recipes if r['id'] != removed_id]
+        new = RecipeSet(version, recipes)
+        with self._lock:
+            index = self._derived.pop('index', None)
+        if index is not None:
+            if recipe is not None:
+                index.upsert(recipe)
+            else:
+                index.remove(removed_id)
+            new._derived['index'] = index
+        return new
+
+
+class UserSnapshot(_Derived):
+    """
+    Datele unui utilizator la o anumită versiune. Listele sunt partajate între
+    cereri și nu se modifică; ce depinde de frigider se calculează aici, ce
+    depinde doar de rețete stă în RecipeSet și supraviețuiește schimbărilor din frigider.
+    """
+
+    def __init__(self, user_id, fridge_version, fridge, recipe_set: RecipeSet):
+        super().__init__()
+        self.user_id = user_id
+        self.fridge_version = fridge_version
+        self.fridge = fridge      # [{'id', 'name', 'quantity', 'unit'}]
+        self.recipe_set = recipe_set
+
+    @property
+    def version(self):
+        return self.fridge_version, self.recipe_set.version
+
+    @property
+    def recipes(self):
+        return self.recipe_set.recipes
+
+    @property
+    def index(self) -> RecipeIndex:
+        return self.recipe_set.index
+
+    @property
+    def page_recipes(self):
+        return self.recipe_set.page_recipes
+
+    @property
+    def fridge_names(self):
+        return self.derived('fridge_names', lambda: [i['name'] for i in self.fridge])
+
+
+# ------------------------------------------------------------
+# 🔹 LRU per utilizator, validat la fiecare citire contra versiunii din SQLite
+# ------------------------------------------------------------
+class SnapshotCache:
+    """
+    Validarea e o citire după cheia primară în user_versions, făcută în aceeași
+    tranzacție de citire (snapshot WAL) cu încărcarea datelor: versiunea și
+    datele sunt mereu consistente, iar o scriere din alt proces invalidează
+    snapshot-ul de aici fără niciun mesaj între procese.
+    """
+
+    def __init__(self, max_users: int = MAX_USERS, path: str = None):
+        self.max_users = max_users
+        self.path = path
+        self._lru = OrderedDict()   # user_id -> UserSnapshot
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recipes_reused = 0    # ratări în care doar frigiderul s-a schimbat
+
+    def get(self, user_id) -> UserSnapshot:
+        with db.connection(self.path) as conn:
+            conn.execute('BEGIN')
+            try:
+                row = conn.execute('SELECT fridge_version, recipes_version FROM user_versions WHERE user_id=?',
+                                   (user_id,)).fetchone()
+                fridge_version, recipes_version = row if row else (0, 0)
+                with self._lock:
+                    snap = self._lru.get(user_id)
+                    if snap is not None and snap.version == (fridge_version, recipes_version):
+                        self._lru.move_to_end(user_id)
+                        self.hits += 1
+                        return snap
+                    self.misses += 1
+                    recipe_set = snap.recipe_set if snap is not None else None
+                if recipe_set is None or recipe_set.version != recipes_version:
+                    recipe_set = RecipeSet(recipes_version, recipe_store.load_recipes(conn, user_id))
+                else:
+                    with self._lock:
+                        self.recipes_reused += 1
+                snap = UserSnapshot(user_id, fridge_version, self._load_fridge(conn, user_id), recipe_set)
+            finally:
+                conn.rollback()   # tranzacție doar de citire
+        self._put(snap)
+        return snap
+
+    def _put(self, snap: UserSnapshot):
+        with self._lock:
+            current = self._lru.get(snap.user_id)
+            if current is None or (current.fridge_version <= snap.fridge_version
+                                   and current.recipe_set.version <= snap.recipe_set.version):
+                self._lru[snap.user_id] = snap
+            self._lru.move_to_end(snap.user_id)
+            while len(self._lru) > self.max_users:
+                self._lru.popitem(last=False)
+
+    def recipe_changed(self, user_id, versions, recipe=None, removed_id=None):
+        """
+        După o scriere pe rețete în acest proces (`versions` = ce a întors touch):
+        dacă snapshot-ul din memorie era exact la versiunea anterioară, îl avansăm
+        actualizând indexul pe loc, fără reîncărcare din SQL. Altfel (a mai scris
+        și alt proces între timp) următoarea citire reîncarcă normal.
+        """
+        fridge_version, recipes_version = versions
+        with self._lock:
+            snap = self._lru.get(user_id)
+            if (snap is None or snap.fridge_version != fridge_version
+                    or snap.recipe_set.version != recipes_version - 1):
+                return
+            recipe_set = snap.recipe_set.changed(recipes_version, recipe, removed_id)
+            self._lru[user_id] = UserSnapshot(user_id, fridge_version, snap.fridge, recipe_set)
+
+    @staticmethod
+    def _load_fridge(conn, user_id):
+        return [{'id': r[0], 'name': r[1], 'quantity': r[2], 'unit': r[3]}
+                for r in conn.execute('SELECT id, name, quantity, unit FROM ingredients WHERE user_id=?', (user_id,))]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "recipes_reused": self.recipes_reused,
+                "users": len(self._lru),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SnapshotCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SnapshotCache()
+    return _cache
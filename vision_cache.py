@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+import db
+
+# ------------------------------------------------------------
+# 🔹 Configurare cache detecții (override din .env)
+# ------------------------------------------------------------
+DB_PATH = db.DB_PATH
+MAX_DISTANCE = int(os.getenv("DETECTION_CACHE_DISTANCE", "3"))
+MAX_ENTRIES = int(os.getenv("DETECTION_CACHE_SIZE", "512"))
+USE_SQLITE = os.getenv("DETECTION_CACHE_SQLITE", "1") == "1"
+SQLITE_MAX_ROWS = int(os.getenv("DETECTION_CACHE_SQLITE_ROWS", "20000"))
+CLEANUP_EVERY = 50  # la câte scrieri rulăm evicția în SQLite
+
+HASH_SIZE = 8          # dHash 8x8 -> 64 biți
+BANDS = 4              # 4 benzi x 16 biți pentru căutarea în SQLite
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+# ------------------------------------------------------------
+# 🔹 Hash perceptual (dHash) + distanța Hamming
+# ------------------------------------------------------------
+def dhash(image: Image.Image, size: int = HASH_SIZE) -> int:
+    """
+    Difference hash: imaginea în tonuri de gri, redusă la (size+1) x size,
+    câte un bit pentru fiecare pereche de pixeli vecini pe orizontală.
+    Pozele aproape identice (alt unghi minor, altă compresie) dau hash-uri apropiate.
+    """
+    small = image.convert("L").resize((size + 1, size), Image.BILINEAR)
+    px = list(small.getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (px[offset + col] > px[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(h: int):
+    return [(h >> (i * BAND_BITS)) & BAND_MASK for i in range(BANDS)]
+
+
+def _to_signed(h: int) -> int:
+    # SQLite stochează INTEGER pe 64 de biți cu semn
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def _to_unsigned(h: int) -> int:
+    return h + (1 << 64) if h < 0 else h
+
+
+# ------------------------------------------------------------
+# 🔹 Cache: LRU în memorie + nivel opțional SQLite (chef_gpt.db)
+# ------------------------------------------------------------
+class DetectionCache:
+    """
+    Cache pentru rezultatele YOLO, cheiat după dHash-ul imaginii micșorate.
+    O imagine nouă e considerată duplicat dacă distanța Hamming față de un hash
+    cunoscut e <= `max_distance`.
+
+    În SQLite, hash-ul e împărțit în 4 benzi indexate de 16 biți: două hash-uri
+    la distanță <= 3 au garantat cel puțin o bandă identică, deci căutarea
+    folosește indexurile în loc să scaneze tabela. De aceea `max_distance` nu
+    poate depăși BANDS - 1: peste, nivelul SQLite ar rata duplicate valide.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, max_distance: int = MAX_DISTANCE,
+                 max_entries: int = MAX_ENTRIES, use_sqlite: bool = USE_SQLITE):
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.use_sqlite = use_sqlite
+        if use_sqlite and max_distance > BANDS - 1:
+            print(f"⚠️ DETECTION_CACHE_DISTANCE={max_distance} e prea mare pentru {BANDS} benzi; folosesc {BANDS - 1}")
+            self.max_distance = BANDS - 1
+        self._lru = OrderedDict()  # hash -> list[str]
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits_memory = 0
+        self.hits_sqlite = 0
+        self.misses = 0
+        if self.use_sqlite:
+            self._init_table()
+
+    # --- SQLite (conexiuni din pool-ul db.py) ---
+    def _init_table(self):
+        with db.transaction(self.db_path) as conn:
+            c = conn.cursor()
+            c.execute('''CREATE TABLE IF NOT EXISTS detection_cache (
+                            phash INTEGER PRIMARY KEY,
+                            b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER,
+                            ingredients_json TEXT NOT NULL,
+                            created_at REAL NOT NULL
+                        )''')
+            for i in range(BANDS):
+                c.execute(f'CREATE INDEX IF NOT EXISTS idx_detection_cache_b{i} ON detection_cache(b{i})')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_detection_cache_created ON detection_cache(created_at)')
+
+    def _sqlite_get(self, h: int):
+        rows = db.fetchall('SELECT phash, ingredients_json FROM detection_cache WHERE b0=? OR b1=? OR b2=? OR b3=?',
+                           _bands(h), path=self.db_path)
+        best = None
+        for phash, payload in rows:
+            d = hamming(h, _to_unsigned(phash))
+            if d <= self.max_distance and (best is None or d < best[0]):
+                best = (d, payload)
+        return json.loads(best[1]) if best else None
+
+    def _sqlite_put(self, h: int, ingredients):
+        with self._lock:
+            self._writes += 1
+            cleanup = self._writes % CLEANUP_EVERY == 0
+        with db.transaction(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute('INSERT OR REPLACE INTO detection_cache (phash, b0, b1, b2, b3, ingredients_json, created_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        [_to_signed(h), *_bands(h), json.dumps(ingredients), time.time()])
+            if not cleanup:
+                return
+            # Evicție: păstrăm doar cele mai noi SQLITE_MAX_ROWS intrări
+            cur.execute('DELETE FROM detection_cache WHERE phash IN ('
+                        'SELECT phash FROM detection_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                        (SQLITE_MAX_ROWS,))
+
+    # --- API ---
+    def _memory_get(self, h: int):
+        best = None
+        for key in self._lru:
+            d = hamming(h, key)
+            if d <= self.max_distance and (best is None or d < best[0]):
+                best = (d, key)
+                if d == 0:
+                    break
+        if best is None:
+            return None
+        self._lru.move_to_end(best[1])
+        return self._lru[best[1]]
+
+    def _memory_put(self, h: int, ingredients):
+        self._lru[h] = list(ingredients)
+        self._lru.move_to_end(h)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get(self, h: int):
+        with self._lock:
+            found = self._memory_get(h)
+            if found is not None:
+                self.hits_memory += 1
+                return list(found)
+        if self.use_sqlite:
+            try:
+                found = self._sqlite_get(h)
+            except sqlite3.Error:
+                found = None
+            if found is not None:
+                with self._lock:
+                    self.hits_sqlite += 1
+                    self._memory_put(h, found)
+                return list(found)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, h: int, ingredients):
+        with self._lock:
+            self._memory_put(h, ingredients)
+        if self.use_sqlite:
+            try:
+                self._sqlite_put(h, ingredients)
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_sqlite + self.misses
+            hits = self.hits_memory + self.hits_sqlite
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_sqlite": self.hits_sqlite,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "entries_memory": len(self._lru),
+                "max_distance": self.max_distance,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DetectionCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DetectionCache()
+    return _cache
@@ -1,7 +1,200 @@
-import pyttsx3
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+import metrics
+
+# ------------------------------------------------------------
+# 🔹 Configurare TTS (override din .env)
+# ------------------------------------------------------------
+AUDIO_DIR = os.getenv("TTS_AUDIO_DIR", os.path.join("static", "audio"))
+TTS_RATE = int(os.getenv("TTS_RATE", "180"))
+TTS_VOICE = os.getenv("TTS_VOICE", "")                   # id-ul vocii pyttsx3; gol = vocea implicită
+QUEUE_SIZE = int(os.getenv("TTS_QUEUE_SIZE", "64"))      # joburi în așteptare; peste, cererea rămâne fără audio
+MAX_FILES = int(os.getenv("TTS_CACHE_FILES", "500"))     # fișiere păstrate în AUDIO_DIR (cele mai vechi pleacă)
+WAIT_S = float(os.getenv("TTS_WAIT", "10"))              # cât așteaptă cererea pentru fișier până renunță
+CLEANUP_EVERY = 20   # la câte randări verificăm dimensiunea cache-ului
+
+
+def audio_key(text: str, voice: str = TTS_VOICE, rate: int = TTS_RATE) -> str:
+    """Cheia fișierului audio: aceeași frază, voce și viteză -> același fișier."""
+    raw = json.dumps([text, voice, rate], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+# ------------------------------------------------------------
+# 🔹 Serviciu TTS: un singur engine pyttsx3, pe thread-ul lui, cu coadă de joburi
+# ------------------------------------------------------------
+class TTSService:
+    """
+    Cererea primește imediat cheia fișierului; randarea (save_to_file, nu redare pe
+    difuzorul serverului) se face în fundal. Fișierele sunt adresate după conținut,
+    deci o frază deja randată e servită direct de pe disc, inclusiv de alte procese.
+
+    pyttsx3 nu e thread-safe și init() e lent, așa că engine-ul e creat o singură
+    dată, pe thread-ul worker-ului, și folosit doar de acolo.
+    """
+
+    def __init__(self, audio_dir: str = AUDIO_DIR, queue_size: int = QUEUE_SIZE, max_files: int = MAX_FILES):
+        self.audio_dir = audio_dir
+        self.max_files = max_files
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = {}   # cheie -> threading.Event, setat când fișierul e gata (sau randarea a eșuat)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._broken = None  # motivul, dacă engine-ul nu poate porni
+        self.hits = 0
+        self.rendered = 0
+        self.failed = 0
+        self.dropped = 0
+        os.makedirs(audio_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.audio_dir, f"{key}.wav")
+
+    def _tmp_path(self, key: str) -> str:
+        return os.path.join(self.audio_dir, f".{key}.tmp.wav")
+
+    def submit(self, text: str, voice: str = None, rate: int = None):
+        """Pune fraza la randat și întoarce cheia (sau None dacă serviciul nu poate randa)."""
+        voice = TTS_VOICE if voice is None else voice
+        rate = TTS_RATE if rate is None else rate
+        key = audio_key(text, voice, rate)
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # există deja; ordinea de evicție urmează ultima folosire
+            with self._lock:
+                self.hits += 1
+            return key
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            if self._broken:
+                return None
+            if key in self._pending:
+                return key
+            done = threading.Event()
+            self._pending[key] = done
+            self._ensure_worker()
+        try:
+            self._queue.put_nowait((key, text, voice, rate))
+        except queue.Full:
+            with self._lock:
+                self._pending.pop(key, None)
+                self.dropped += 1
+            done.set()
+            return None
+        return key
+
+    def wait(self, key: str, timeout: float = WAIT_S):
+        """
+        Calea fișierului când e gata, sau None după `timeout` secunde. O cheie pe
+        care nu o randează nimeni (nici acest proces, nici altul) întoarce None imediat.
+        """
+        path = self.path_for(key)
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(path):
+            with self._lock:
+                done = self._pending.get(key)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if done is not None:
+                done.wait(remaining)
+                if not os.path.exists(path):
+                    return None
+            elif os.path.exists(self._tmp_path(key)):
+                time.sleep(min(0.1, remaining))  # randarea e în curs în alt proces
+            else:
+                return None
+        return path
+
+    # --- worker ---
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="tts", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+        except Exception as e:
+            print(f"⚠️ TTS indisponibil: {e}")
+            with self._lock:
+                self._broken = str(e)
+                pending, self._pending = self._pending, {}
+            for done in pending.values():
+                done.set()
+            return
+        while True:
+            key, text, voice, rate = self._queue.get()
+            path = self.path_for(key)
+            tmp = self._tmp_path(key)
+            t0 = time.perf_counter()
+            try:
+                engine.setProperty('rate', rate)
+                if voice:
+                    engine.setProperty('voice', voice)
+                engine.save_to_file(text, tmp)
+                engine.runAndWait()
+                os.replace(tmp, path)  # atomic: cititorii nu văd niciodată un fișier pe jumătate scris
+                metrics.record("tts", time.perf_counter() - t0)
+                with self._lock:
+                    self.rendered += 1
+                    cleanup = self.rendered % CLEANUP_EVERY == 0
+                if cleanup:
+                    self._evict()
+            except Exception as e:
+                print(f"⚠️ Randarea TTS a eșuat: {e}")
+                with self._lock:
+                    self.failed += 1
+            finally:
+                with self._lock:
+                    done = self._pending.pop(key, None)
+                if done is not None:
+                    done.set()
+
+    def _evict(self):
+        files = [os.path.join(self.audio_dir, f) for f in os.listdir(self.audio_dir)
+                 if f.endswith(".wav") and not f.startswith(".")]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[:len(files) - self.max_files]:
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "queued": self._queue.qsize(),
+                "available": self._broken is None,
+            }
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> TTSService:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = TTSService()
+    return _service
+
 
 def speak(text):
-    engine = pyttsx3.init()
-    engine.setProperty('rate', 180)
-    engine.say(text)
-    engine.runAndWait()
+    """Nu mai blochează: întoarce cheia fișierului audio (gata imediat dacă e în cache)."""
+    return get_service().submit(text)